@@ -137,6 +137,8 @@ class DatabaseInitializer:
         if 'references' in column_def:
             ref_table, ref_column = column_def['references'].split('.')
             constraints.append(f'REFERENCES {ref_table}({ref_column})')
+            if 'on_delete' in column_def:
+                constraints.append(f"ON DELETE {column_def['on_delete']}")
         
         return ' '.join(constraints)
     
@@ -225,6 +227,7 @@ class DatabaseInitializer:
             'NFT_ACCESS',
             'CONVERSATIONS',
             'MESSAGES',
+            'CONVERSATION_MESSAGES',
             'FLOWBUILDER_BLOCKS'
         ]
         
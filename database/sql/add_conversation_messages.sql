@@ -0,0 +1,65 @@
+-- Store v2 conversation messages as rows instead of one growing JSONB document
+-- Safe to run more than once; conversations that already have rows are skipped
+
+-- Denormalized summary read by the conversation list
+ALTER TABLE conversations
+ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+
+ALTER TABLE conversations
+ADD COLUMN IF NOT EXISTS last_message JSONB;
+
+COMMENT ON COLUMN conversations.message_count IS 'Number of messages, also the seq of the last message';
+COMMENT ON COLUMN conversations.last_message IS 'Content, role and timestamp of the last message';
+
+-- One row per message, keyed by its position in the conversation
+CREATE TABLE IF NOT EXISTS conversation_messages (
+    conversation_id UUID NOT NULL REFERENCES conversations(conversation_id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    message_id VARCHAR(64) NOT NULL,
+    message JSONB NOT NULL,
+    PRIMARY KEY (conversation_id, seq)
+);
+
+CREATE INDEX IF NOT EXISTS idx_conversation_messages_message_id
+ON conversation_messages(conversation_id, message_id);
+
+COMMENT ON TABLE conversation_messages IS 'Messages of v2 conversations, appended without rewriting the others';
+COMMENT ON COLUMN conversation_messages.message IS 'Message document, same format as the entries of conversation_content';
+
+-- Migrate messages from conversation_content
+BEGIN;
+
+INSERT INTO conversation_messages (conversation_id, seq, message_id, message)
+SELECT c.conversation_id,
+       m.seq,
+       COALESCE(m.message->>'id', 'msg_migrated_' || m.seq),
+       m.message
+FROM conversations c
+CROSS JOIN LATERAL jsonb_array_elements(c.conversation_content->'messages') WITH ORDINALITY AS m(message, seq)
+WHERE jsonb_typeof(c.conversation_content->'messages') = 'array'
+AND NOT EXISTS (
+    SELECT 1 FROM conversation_messages cm WHERE cm.conversation_id = c.conversation_id
+);
+
+UPDATE conversations c
+SET message_count = s.message_count,
+    last_message = s.last_message
+FROM (
+    SELECT cm.conversation_id,
+           COUNT(*) AS message_count,
+           (ARRAY_AGG(jsonb_build_object(
+               'content', cm.message->'content',
+               'role', cm.message->'role',
+               'timestamp', cm.message->'timestamp'
+           ) ORDER BY cm.seq DESC))[1] AS last_message
+    FROM conversation_messages cm
+    GROUP BY cm.conversation_id
+) s
+WHERE c.conversation_id = s.conversation_id
+AND c.message_count <> s.message_count;
+
+COMMIT;
+
+-- conversation_content is no longer written by the v2 API and can be emptied
+-- once the migration has been verified:
+-- UPDATE conversations SET conversation_content = '{"messages": []}'::jsonb;
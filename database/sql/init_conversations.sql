@@ -28,6 +28,8 @@ CREATE TABLE IF NOT EXISTS messages (
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_conversations_user_id ON conversations(user_id);
 CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_agent_updated ON conversations(user_id, agent_id, updated_at DESC, conversation_id DESC);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_updated ON conversations(user_id, updated_at DESC, conversation_id DESC);
 CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages(conversation_id);
 CREATE INDEX IF NOT EXISTS idx_messages_parent_message_id ON messages(parent_message_id);
 CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp);
@@ -285,16 +285,25 @@ const ChatPage = () => {
       console.log('🔌 WebSocket closed:', data.code, data.reason);
     });
     
-    // Get conversation history for this chat (excluding the current message)
-    const conversationHistory = messages.map(msg => ({
-      role: msg.role,
-      content: msg.content,
-      timestamp: msg.timestamp,
-      metadata: {
-        message_id: msg.id,
-        model: msg.model || null
-      }
-    }));
+    // Saved conversations are loaded by the backend, up to the current message;
+    // only unsaved chats send their history (excluding the current message)
+    const conversationId = simulateThinking.conversationId;
+    const historyOptions = conversationId
+      ? {
+          conversation_id: conversationId,
+          message_id: messageId
+        }
+      : {
+          conversation_history: messages.map(msg => ({
+            role: msg.role,
+            content: msg.content,
+            timestamp: msg.timestamp,
+            metadata: {
+              message_id: msg.id,
+              model: msg.model || null
+            }
+          }))
+        };
     
     try {
       // Connect with payment flow
@@ -302,9 +311,7 @@ const ChatPage = () => {
         agentId,
         walletAddress || 'anonymous',
         userMessage,
-        {
-          conversation_history: conversationHistory
-        }
+        historyOptions
       );
     } catch (error) {
       console.error('Failed to connect to backend:', error);
@@ -5,7 +5,10 @@ import uvicorn
 import json
 
 # Import routes
-from routes import execute_flow, execute_flow_websocket, health_check, log_requests
+from routes import execute_flow, execute_flow_websocket, execute_flow_websocket_request, parse_execute_request, execute_flow_channel, health_check, flow_cache_stats, llm_cache_stats, streaming_stats, get_flow_results, log_requests
+from services.sandbox import get_sandbox_pool, close_sandbox_pools
+from services.llm.stream_bridge import close_stream_executor
+from config import settings
 
 app = FastAPI(title="Flow Executor Backend")
 
@@ -18,11 +21,36 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+@app.on_event("startup")
+async def start_sandbox_pool():
+    # Start custom code workers before the first request needs one
+    if settings.allow_custom_code:
+        get_sandbox_pool().start()
+
+@app.on_event("shutdown")
+async def stop_sandbox_pools():
+    close_sandbox_pools()
+
+@app.on_event("shutdown")
+async def stop_stream_executor():
+    close_stream_executor()
+
 # Register HTTP routes
 app.post("/execute")(execute_flow)
 app.get("/health")(health_check)
+app.get("/metrics/flow-cache")(flow_cache_stats)
+app.get("/metrics/streaming")(streaming_stats)
+app.get("/metrics/llm-cache")(llm_cache_stats)
+app.get("/flows/{flow_id}/results")(get_flow_results)
+app.get("/flows/{flow_id}/results/{element_id}")(get_flow_results)
 app.middleware("http")(log_requests)
 
+# Register the multiplexed channel used by long-lived backend connections
+@app.websocket("/ws/channel")
+async def channel_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    await execute_flow_channel(websocket)
+
 # Register WebSocket route with two-phase communication
 @app.websocket("/ws/execute/{flow_id}")
 async def websocket_endpoint(websocket: WebSocket, flow_id: str):
@@ -35,6 +63,13 @@ async def websocket_endpoint(websocket: WebSocket, flow_id: str):
         # Receive the flow definition as a separate message
         flow_definition_str = await websocket.receive_text()
         
+        # Single-shot protocol: the first message carries the flow reference, inputs and config.
+        # Such clients send it right after connecting and skip the status messages.
+        request = parse_execute_request(flow_definition_str)
+        if request is not None:
+            await execute_flow_websocket_request(websocket, flow_id, request)
+            return
+        
         # Acknowledge receipt and ask for initial inputs
         await websocket.send_text(json.dumps({"status": "received_flow", "message": "Send initial_inputs as JSON"}))
         
@@ -16,10 +16,28 @@ class Settings(BaseSettings):
     aws_region: str                         = os.getenv("AWS_REGION", "us-east-1")
     aws_access_key_id: Optional[str]        = os.getenv("AWS_ACCESS_KEY_ID")
     aws_secret_access_key: Optional[str]    = os.getenv("AWS_SECRET_ACCESS_KEY")
+    bedrock_max_pool_connections: int       = int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "50"))  # Shared client HTTP pool size
+    bedrock_stream_threads: int             = int(os.getenv("BEDROCK_STREAM_THREADS", "50"))  # Concurrent model streams per node
+    
+    # Embedding settings
+    embedding_cache_size: int               = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))  # In-memory entries
+    embedding_cache_dir: Optional[str]      = os.getenv("EMBEDDING_CACHE_DIR")  # Enables the memory-mapped disk tier
+    embedding_max_concurrency: int          = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "8"))
+    
+    # Vector index settings
+    vector_index_dir: str                   = os.getenv("VECTOR_INDEX_DIR", "vector_indexes")
+    vector_index_ivf_threshold: int         = int(os.getenv("VECTOR_INDEX_IVF_THRESHOLD", "20000"))  # Brute force below this size
+    vector_index_n_probe: int               = int(os.getenv("VECTOR_INDEX_N_PROBE", "8"))
+    vector_index_cache_size: int            = int(os.getenv("VECTOR_INDEX_CACHE_SIZE", "64"))  # Loaded indexes kept in memory
     
     # Default model settings
     default_model_id: str                   = os.getenv("DEFAULT_MODEL_ID", "us.deepseek.r1-v1:0")
     
+    # Context window settings
+    context_summary_model_id: Optional[str] = os.getenv("CONTEXT_SUMMARY_MODEL_ID")  # Defaults to the element's model
+    context_summary_max_tokens: int         = int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "512"))
+    context_summary_cache_size: int         = int(os.getenv("CONTEXT_SUMMARY_CACHE_SIZE", "1024"))  # Rolling summaries kept
+    
     # Aptos blockchain settings
     aptos_node_url: str                     = os.getenv("APTOS_NODE_URL", "https://testnet.aptoslabs.com")
     aptos_private_key: Optional[str]        = os.getenv("APTOS_PRIVATE_KEY")
@@ -33,10 +51,18 @@ class Settings(BaseSettings):
     log_level: str                          = os.getenv("LOG_LEVEL", "INFO")
     max_execution_time: int                 = int(os.getenv("MAX_EXECUTION_TIME", "300"))  # 5 minutes default
     
+    # Flow scheduling settings
+    flow_scheduler: str                     = os.getenv("FLOW_SCHEDULER", "sequential")  # "sequential" or "concurrent"
+    flow_max_concurrency: int               = int(os.getenv("FLOW_MAX_CONCURRENCY", "8"))
+    flow_cache_size: int                    = int(os.getenv("FLOW_CACHE_SIZE", "128"))  # Compiled flow blueprints kept in memory
+    
     # Custom code execution settings
     allow_custom_code: bool                 = os.getenv("ALLOW_CUSTOM_CODE", "false").lower() == "true"
     custom_code_max_memory_mb: int          = int(os.getenv("CUSTOM_CODE_MAX_MEMORY_MB", "100"))
     custom_code_max_cpu_seconds: int        = int(os.getenv("CUSTOM_CODE_MAX_CPU_SECONDS", "10"))
+    sandbox_pool_size: int                  = int(os.getenv("SANDBOX_POOL_SIZE", "4"))  # Warm custom code workers
+    sandbox_max_runs_per_worker: int        = int(os.getenv("SANDBOX_MAX_RUNS_PER_WORKER", "100"))  # Recycle after N runs
+    custom_code_cache_size: int             = int(os.getenv("CUSTOM_CODE_CACHE_SIZE", "256"))  # Compiled code objects kept
     
     # Akash Chat API settings
     akash_api_key: Optional[str]            = os.getenv("AKASH_API_KEY")
@@ -46,8 +72,25 @@ class Settings(BaseSettings):
     enable_blockchain: bool                 = os.getenv("ENABLE_BLOCKCHAIN", "true").lower() == "true"
     enable_llm_caching: bool                = os.getenv("ENABLE_LLM_CACHING", "false").lower() == "true"
     
+    # LLM response cache settings (used when enable_llm_caching is on)
+    llm_cache_size: int                     = int(os.getenv("LLM_CACHE_SIZE", "1024"))  # In-memory responses
+    llm_cache_ttl_seconds: int              = int(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+    llm_cache_redis_url: Optional[str]      = os.getenv("LLM_CACHE_REDIS_URL")  # Enables the shared Redis tier
+    llm_cache_redis_ttl_seconds: int        = int(os.getenv("LLM_CACHE_REDIS_TTL_SECONDS", "86400"))
+    llm_cache_redis_timeout_seconds: float  = float(os.getenv("LLM_CACHE_REDIS_TIMEOUT_SECONDS", "0.5"))  # Redis reads/writes slower than this count as misses
+    
     # Streaming settings
-    streaming_chunk_size: int               = int(os.getenv("STREAMING_CHUNK_SIZE", "20"))
+    streaming_chunk_size: int               = int(os.getenv("STREAMING_CHUNK_SIZE", "20"))  # Characters per coalesced llm_chunk
+    streaming_flush_interval_ms: int        = int(os.getenv("STREAMING_FLUSH_INTERVAL_MS", "50"))  # Max delay of a pending chunk
+    stream_buffer_size: int                 = int(os.getenv("STREAM_BUFFER_SIZE", "256"))  # Pending messages per flow
+    stream_serializer: str                  = os.getenv("STREAM_SERIALIZER", "auto")  # "auto", "orjson", "msgspec" or "json"
+    
+    # Event payload settings
+    element_event_max_bytes: int            = int(os.getenv("ELEMENT_EVENT_MAX_BYTES", "16384"))  # element_completed budget
+    flow_event_max_bytes: int               = int(os.getenv("FLOW_EVENT_MAX_BYTES", "65536"))  # flow_completed / flow_error budget
+    event_preview_chars: int                = int(os.getenv("EVENT_PREVIEW_CHARS", "200"))
+    result_store_max_flows: int             = int(os.getenv("RESULT_STORE_MAX_FLOWS", "256"))
+    result_store_ttl_seconds: int           = int(os.getenv("RESULT_STORE_TTL_SECONDS", "600"))
     max_reconnect_attempts: int             = int(os.getenv("MAX_RECONNECT_ATTEMPTS", "5"))
     
     class Config:
@@ -73,7 +116,8 @@ runtime_config = {
         "read_contract",  # Allow both generic and specific names
         "ChatAPI", "chat_api", "akash_chat",  # Akash Chat API
         "Titan", "titan",  # AWS Titan embeddings
-        "Nova", "nova"  # AWS Nova chat and RAG
+        "Nova", "nova",  # AWS Nova chat and RAG
+        "VectorRetrieval", "vector_retrieval"  # Local vector index retrieval
     ]
 }
 
@@ -35,32 +35,12 @@ class ElementBase(ABC):
         self.downwards_execute = True  # Controls forward flow
         self.connections = []  # Downstream elements
         self.dependencies = []  # Upstream elements
-        self.output_map = []  # output_map[dependencie_element_id][output_variable][input_variable]
         
     def connect(self, element: 'ElementBase'):
         """Connect this element to another element downstream."""
         self.connections.append(element)
         element.dependencies.append(self)
     
-    # def map_output_to_input(self, dependency_element_id: str, output_variable: str, input_variable: str):
-        
-    #     self.input_map.setdefault(dependency_element_id, {})
-        
-    #     self.input_map[dependency_element_id].setdefault(output_variable, [])
-        
-    #     self.input_map[dependency_element_id][output_variable].append(input_variable)
-    
-    def map_output_to_input(self, dependent_element: 'ElementBase', output_variable: str, input_variable: str):
-        
-        """Map an output variable from a dependency to an input variable."""
-        self.output_map.append({
-            "dependent_element": dependent_element,
-            "output_variable": output_variable,
-            "input_variable": input_variable
-        })
-
-    
-    
     def set_input(self, input_name: str, value: Any):
         """Set an input value."""
         self.inputs[input_name] = value
@@ -74,6 +54,10 @@ class ElementBase(ABC):
         """Execute the element logic."""
         pass
     
+    def prepare(self):
+        """Do one-off work (e.g. compiling code) when the flow plan is built; raise to reject the flow."""
+        pass
+    
     def validate_inputs(self) -> bool:
         """Validate that all required inputs are provided."""
         for name, schema in self.input_schema.items():
@@ -1,14 +1,16 @@
 # core/executor.py
 import asyncio
-import json
 from typing import Dict, Any, List, Optional
 from uuid import uuid4
 import time
 
 from .element_base import ElementBase
 from .schema import ConnectionType, Connection
+from .plan import FlowPlan, build_flow_plan
+from .result_store import FlowResultStore
 from utils.logger import logger
-from services.streaming import WebSocketStreamManager
+from services.streaming import WebSocketStreamManager, ChunkCoalescer
+from utils.payloads import EventPayloadPolicy
 
 class FlowExecutor:
     """Main class for executing flows."""
@@ -17,7 +19,8 @@ class FlowExecutor:
                  start_element_id: str,
                  connections: List[Connection] = None,
                  stream_manager: Optional[WebSocketStreamManager] = None,
-                 config: Dict[str, Any] = None):
+                 config: Dict[str, Any] = None,
+                 result_store: Optional[FlowResultStore] = None):
         self.elements = elements
         self.start_element_id = start_element_id
         self.connections = connections or []
@@ -26,6 +29,35 @@ class FlowExecutor:
         self.stream_manager = stream_manager
         self.config = config or {}
         self.flow_id = str(uuid4())
+        self.result_store = result_store
+        
+        # Scheduler mode: "sequential" walks control connections one at a time,
+        # "concurrent" dispatches every element whose dependencies are resolved
+        self.scheduler = self.config.get("flow_scheduler", "sequential")
+        self.max_concurrency = max(1, int(self.config.get("flow_max_concurrency", 8)))
+        self._element_tasks: Dict[str, asyncio.Task] = {}
+        self._element_backtracking: Dict[str, bool] = {}
+        self._branch_tasks: Dict[str, asyncio.Task] = {}
+        self._concurrency_limiter: Optional[asyncio.Semaphore] = None
+        
+        # Per-token llm_chunk events are merged before they reach the stream
+        self._chunk_coalescer = ChunkCoalescer(
+            stream_manager.send_event,
+            max_size=int(self.config.get("streaming_chunk_size", 20)),
+            flush_interval_ms=int(self.config.get("streaming_flush_interval_ms", 50))
+        ) if stream_manager else None
+        
+        # Large outputs are streamed as previews; full values are fetched from the result store
+        element_budget = int(self.config.get("element_event_max_bytes", 16384))
+        flow_budget = int(self.config.get("flow_event_max_bytes", 65536))
+        self.payload_policy = EventPayloadPolicy(
+            budgets={
+                "element_completed": element_budget,
+                "flow_completed": flow_budget,
+                "flow_error": flow_budget
+            },
+            preview_chars=int(self.config.get("event_preview_chars", 200))
+        )
         
         # Setup connections between elements
         self._setup_connections()
@@ -34,6 +66,10 @@ class FlowExecutor:
         """Execute the entire flow starting from the start element."""
         start_time = time.time()
         
+        # Expose outputs for on-demand fetching while and after the flow runs
+        if self.result_store:
+            self.result_store.register(self.flow_id, self.output_cache)
+        
         # Set initial inputs to respective elements
         if initial_inputs:
             for element_id, inputs in initial_inputs.items():
@@ -55,7 +91,10 @@ class FlowExecutor:
         
         # Execute the start element
         try:
-            result = await self._execute_element(start_element)
+            if self.scheduler == "concurrent":
+                result = await self._execute_concurrent(start_element)
+            else:
+                result = await self._execute_element(start_element)
             
             # Prepare final result
             final_result = {
@@ -170,19 +209,123 @@ class FlowExecutor:
             logger.error(f"Error executing element {element_id}: {str(e)}")
             raise
     
+    async def _execute_concurrent(self, start_element: ElementBase) -> Dict[str, Any]:
+        """Execute the flow, running independent branches in parallel."""
+        self._concurrency_limiter = asyncio.Semaphore(self.max_concurrency)
+        try:
+            return await self._start_branch(start_element)
+        finally:
+            # Cancel sibling branches still running after a failure
+            pending = [task for task in list(self._element_tasks.values()) + list(self._branch_tasks.values())
+                       if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
+    def _schedule_element(self, element: ElementBase, backtracking=False) -> asyncio.Task:
+        """Get the task executing an element, creating it on first request."""
+        task = self._element_tasks.get(element.element_id)
+        if task is None:
+            task = asyncio.create_task(self._execute_element_concurrent(element, backtracking))
+            self._element_tasks[element.element_id] = task
+            self._element_backtracking[element.element_id] = backtracking
+        return task
+    
+    def _start_branch(self, element: ElementBase) -> asyncio.Task:
+        """Get the task following control flow from an element, creating it on first request."""
+        task = self._branch_tasks.get(element.element_id)
+        if task is None:
+            # Register the element itself before the branch starts so a shared child
+            # is not first scheduled as another branch's dependency
+            self._schedule_element(element)
+            task = asyncio.create_task(self._execute_branch(element))
+            self._branch_tasks[element.element_id] = task
+        return task
+    
+    async def _execute_branch(self, element: ElementBase) -> Dict[str, Any]:
+        """Wait for an element, then dispatch every downstream element concurrently."""
+        outputs = await self._schedule_element(element)
+        
+        # Elements first reached as a dependency do not continue control flow
+        if self._element_backtracking.get(element.element_id) or not element.downwards_execute:
+            return outputs
+        
+        downstream = [self._start_branch(self.elements[conn_id])
+                      for conn_id in self._get_control_connections(element.element_id)
+                      if conn_id in self.elements]
+        if downstream:
+            await asyncio.gather(*downstream)
+        
+        return outputs
+    
+    async def _execute_element_concurrent(self, element: ElementBase, backtracking=False) -> Dict[str, Any]:
+        """Execute a single element as soon as all of its dependencies are resolved."""
+        element_id = element.element_id
+        
+        if element.executed and element_id in self.output_cache:
+            return self.output_cache[element_id]
+        
+        # Wait for every upstream element; unscheduled ones run in backtracking mode
+        pending_dependencies = [self._schedule_element(dep, backtracking=True)
+                                for dep in element.dependencies if not dep.executed]
+        if pending_dependencies:
+            await asyncio.gather(*pending_dependencies)
+        
+        async with self._concurrency_limiter:
+            await self._stream_event("element_started", {
+                "flow_id": self.flow_id,
+                "element_id": element_id,
+                "element_type": element.element_type,
+                "element_name": element.name,
+                "backtracking": backtracking
+            })
+            
+            try:
+                outputs = await element.execute(self, backtracking)
+                
+                element.executed = True
+                self.output_cache[element_id] = outputs
+                self.execution_order.append(element_id)
+                
+                await self._stream_event("element_completed", {
+                    "flow_id": self.flow_id,
+                    "element_id": element_id,
+                    "element_type": element.element_type,
+                    "element_name": element.name,
+                    "outputs": outputs,
+                    "backtracking": backtracking
+                })
+                
+                await self._transfer_data(element, outputs)
+                
+                return outputs
+                
+            except Exception as e:
+                await self._stream_event("element_error", {
+                    "flow_id": self.flow_id,
+                    "element_id": element_id,
+                    "element_type": element.element_type,
+                    "element_name": element.name,
+                    "error": str(e),
+                    "backtracking": backtracking
+                })
+                logger.error(f"Error executing element {element_id}: {str(e)}")
+                raise
+    
     async def _stream_event(self, event_type: str, data: Dict[str, Any]):
         """Stream execution events to Backend 2."""
         if self.stream_manager:
             event = {
                 "type": event_type,
                 "timestamp": time.time(),
-                "data": data
+                "data": self.payload_policy.apply(event_type, data)
             }
-            await self.stream_manager.send_message(json.dumps(event))
+            await self._chunk_coalescer.send(event)
             logger.debug(f"Streamed event: {event_type}")
     
     def _setup_connections(self):
-        """Setup connections between elements based on connection definitions."""
+        """Setup connections between elements and compile the flow plan."""
         for conn in self.connections:
             from_element = self.elements.get(conn.from_id)
             to_element = self.elements.get(conn.to_id)
@@ -194,76 +337,21 @@ class FlowExecutor:
             # Setup control flow connections
             if conn.connection_type in [ConnectionType.CONTROL, ConnectionType.BOTH]:
                 from_element.connect(to_element)
-            
-            # Setup data mappings
-            if conn.connection_type in [ConnectionType.DATA, ConnectionType.BOTH]:
-                if conn.from_output and conn.to_input:
-                    # Parse the variable references
-                    from_parts = conn.from_output.split(":")
-                    to_parts = conn.to_input.split(":")
-                    
-                    if len(from_parts) == 2 and len(to_parts) == 2:
-                        from_elem_id, from_var = from_parts
-                        to_elem_id, to_var = to_parts
-                        
-                        # Map the output to input
-                        if from_elem_id == conn.from_id and to_elem_id == conn.to_id:
-                            from_element.map_output_to_input(to_element, from_var, to_var)
+        
+        # Precompute adjacency indexes so execution only does dictionary lookups
+        self.plan: FlowPlan = build_flow_plan(self.elements, self.connections)
     
     def _get_control_connections(self, element_id: str) -> List[str]:
         """Get elements connected via control flow from the given element."""
-        connected_elements = []
-        for conn in self.connections:
-            if (conn.from_id == element_id and 
-                conn.connection_type in [ConnectionType.CONTROL, ConnectionType.BOTH]):
-                connected_elements.append(conn.to_id)
-        return connected_elements
+        return list(self.plan.get_control_targets(element_id))
     
     async def _transfer_data(self, element: ElementBase, outputs: Dict[str, Any]):
         """Transfer data from element outputs to connected element inputs."""
         element_id = element.element_id
-        logger.info(f"🔗 _transfer_data called for element {element_id} with outputs: {outputs}")
-        
-        # Use the existing output_map mechanism
-        for output_mapping in element.output_map:
-            if (output_mapping["dependent_element"] in element.connections 
-                and output_mapping["output_variable"] in outputs 
-                and output_mapping["input_variable"] in output_mapping["dependent_element"].input_schema):
-                
-                output_mapping["dependent_element"].set_input(
-                    output_mapping["input_variable"], outputs[output_mapping["output_variable"]])
-                logger.info(f"🔗 Used output_map to transfer {output_mapping['output_variable']} -> {output_mapping['input_variable']}")
         
-        # Also check for data connections in the connections list
-        logger.info(f"🔗 Checking {len(self.connections)} connections for data transfer from {element_id}")
-        for conn in self.connections:
-            logger.info(f"🔗 Connection: {conn.from_id} -> {conn.to_id}, type: {conn.connection_type}, from_output: {conn.from_output}, to_input: {conn.to_input}")
-            
-            if (conn.from_id == element_id and 
-                conn.connection_type in [ConnectionType.DATA, ConnectionType.BOTH]):
-                
-                to_element = self.elements.get(conn.to_id)
-                logger.info(f"🔗 Found data connection from {element_id} to {conn.to_id}, to_element exists: {to_element is not None}")
-                
-                if to_element and conn.from_output and conn.to_input:
-                    # Parse variable references
-                    from_parts = conn.from_output.split(":")
-                    to_parts = conn.to_input.split(":")
-                    
-                    logger.info(f"🔗 Parsing connection: from_parts={from_parts}, to_parts={to_parts}")
-                    
-                    if len(from_parts) == 2 and len(to_parts) == 2:
-                        _, from_var = from_parts
-                        _, to_var = to_parts
-                        
-                        logger.info(f"🔗 Looking for {from_var} in outputs {list(outputs.keys())}")
-                        
-                        if from_var in outputs:
-                            logger.info(f"🔗 ✅ Transferring data: {from_var}='{outputs[from_var]}' -> {to_var} on element {conn.to_id}")
-                            to_element.set_input(to_var, outputs[from_var])
-                        else:
-                            logger.warning(f"🔗 ❌ Output variable {from_var} not found in outputs {list(outputs.keys())}")
-                    else:
-                        logger.warning(f"🔗 ❌ Invalid connection format: from_output={conn.from_output}, to_input={conn.to_input}")
-                else:
-                    logger.warning(f"🔗 ❌ Cannot transfer data: to_element={to_element is not None}, from_output={conn.from_output}, to_input={conn.to_input}")
+        for to_element, from_var, to_var in self.plan.get_data_edges(element_id):
+            if from_var in outputs:
+                logger.debug(f"🔗 Transferring data: {element_id}:{from_var} -> {to_element.element_id}:{to_var}")
+                to_element.set_input(to_var, outputs[from_var])
+            else:
+                logger.warning(f"🔗 ❌ Output variable {from_var} not found in outputs {list(outputs.keys())}")
@@ -0,0 +1,108 @@
+# core/flow_cache.py
+import copy
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, Optional, Tuple, Type
+
+from .element_base import ElementBase
+from .schema import Connection
+from utils.logger import logger
+
+def compute_flow_hash(flow_definition: Dict[str, Any]) -> str:
+    """
+    Compute a content hash of a raw flow definition.
+    
+    Keys are sorted so the hash does not depend on how the client serialized the JSON.
+    The encoding is a protocol contract shared with the backend, defined under
+    "Flow Hash" in Doc/code_executor.md; it must not change on one side only.
+    
+    Args:
+        flow_definition: Flow definition as parsed JSON
+    
+    Returns:
+        Hex md5 digest of the canonical JSON encoding
+    """
+    canonical = json.dumps(flow_definition, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.md5(canonical.encode()).hexdigest()
+
+@dataclass(frozen=True)
+class ElementBlueprint:
+    """Validated constructor arguments for one element of a flow."""
+    element_id: str
+    element_class: Type[ElementBase]
+    params: Dict[str, Any]
+    
+    def instantiate(self) -> ElementBase:
+        """Create a fresh element instance; params are copied so instances never share state."""
+        return self.element_class(**copy.deepcopy(self.params))
+
+@dataclass(frozen=True)
+class FlowBlueprint:
+    """Compiled, validated form of a flow definition that can be instantiated repeatedly."""
+    flow_hash: Optional[str]
+    elements: Tuple[ElementBlueprint, ...]
+    connections: Tuple[Connection, ...]
+    start_element_id: str
+    
+    def instantiate_elements(self) -> Dict[str, ElementBase]:
+        """Create fresh element instances for a single execution."""
+        return {blueprint.element_id: blueprint.instantiate() for blueprint in self.elements}
+
+class FlowCompileCache:
+    """Bounded LRU cache of compiled flow blueprints keyed by flow hash."""
+    
+    def __init__(self, max_size: int = 128):
+        self.max_size = max(0, max_size)
+        self._entries: "OrderedDict[str, FlowBlueprint]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, flow_hash: str) -> Optional[FlowBlueprint]:
+        """Get a cached blueprint, recording a hit or miss."""
+        blueprint = self._entries.get(flow_hash)
+        if blueprint is None:
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(flow_hash)
+        self.hits += 1
+        return blueprint
+    
+    def put(self, flow_hash: str, blueprint: FlowBlueprint):
+        """Store a blueprint, evicting the least recently used entries beyond max_size."""
+        if self.max_size == 0:
+            return
+        
+        self._entries[flow_hash] = blueprint
+        self._entries.move_to_end(flow_hash)
+        while len(self._entries) > self.max_size:
+            evicted_hash, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            logger.debug(f"Evicted compiled flow {evicted_hash} from cache")
+    
+    def get_or_compile(self, flow_hash: str, compile_fn: Callable[[], FlowBlueprint]) -> FlowBlueprint:
+        """Get a cached blueprint or compile and store it on a miss."""
+        blueprint = self.get(flow_hash)
+        if blueprint is None:
+            blueprint = compile_fn()
+            self.put(flow_hash, blueprint)
+        return blueprint
+    
+    def clear(self):
+        """Drop all cached blueprints."""
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss metrics for the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
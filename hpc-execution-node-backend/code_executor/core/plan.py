@@ -0,0 +1,75 @@
+# core/plan.py
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple
+
+from .element_base import ElementBase
+from .schema import ConnectionType, Connection
+from utils.logger import logger
+
+# (target element, output variable on the source, input variable on the target)
+DataEdge = Tuple[ElementBase, str, str]
+
+@dataclass(frozen=True)
+class FlowPlan:
+    """Immutable adjacency indexes derived once from a flow's connections."""
+    control_edges: Mapping[str, Tuple[str, ...]]
+    data_edges: Mapping[str, Tuple[DataEdge, ...]]
+    
+    def get_control_targets(self, element_id: str) -> Tuple[str, ...]:
+        """Elements connected via control flow from the given element."""
+        return self.control_edges.get(element_id, ())
+    
+    def get_data_edges(self, element_id: str) -> Tuple[DataEdge, ...]:
+        """Pre-parsed data mappings leaving the given element."""
+        return self.data_edges.get(element_id, ())
+
+def _parse_variable_reference(reference: str) -> Tuple[str, str]:
+    """Split an "element_id:variable" reference, returning empty strings if malformed."""
+    parts = reference.split(":")
+    if len(parts) != 2:
+        return "", ""
+    return parts[0], parts[1]
+
+def build_flow_plan(elements: Dict[str, ElementBase], connections: List[Connection]) -> FlowPlan:
+    """
+    Build the flow plan for a set of elements and connections.
+    
+    Args:
+        elements: Element instances keyed by element ID
+        connections: Connection definitions between the elements
+    
+    Returns:
+        FlowPlan with per-element control edges and data edges
+    """
+    control_edges: Dict[str, List[str]] = {}
+    data_edges: Dict[str, List[DataEdge]] = {}
+    
+    # Surface element errors such as custom code syntax errors before anything executes
+    for element in elements.values():
+        element.prepare()
+    
+    for conn in connections:
+        if conn.connection_type in [ConnectionType.CONTROL, ConnectionType.BOTH]:
+            # Unknown targets are kept so the executor can skip them as before
+            control_edges.setdefault(conn.from_id, []).append(conn.to_id)
+        
+        if conn.connection_type in [ConnectionType.DATA, ConnectionType.BOTH]:
+            to_element = elements.get(conn.to_id)
+            if not to_element or not conn.from_output or not conn.to_input:
+                logger.warning(f"Cannot plan data transfer: to_element={to_element is not None}, "
+                               f"from_output={conn.from_output}, to_input={conn.to_input}")
+                continue
+            
+            _, from_var = _parse_variable_reference(conn.from_output)
+            _, to_var = _parse_variable_reference(conn.to_input)
+            if not from_var or not to_var:
+                logger.warning(f"Invalid connection format: from_output={conn.from_output}, to_input={conn.to_input}")
+                continue
+            
+            data_edges.setdefault(conn.from_id, []).append((to_element, from_var, to_var))
+    
+    return FlowPlan(
+        control_edges=MappingProxyType({k: tuple(v) for k, v in control_edges.items()}),
+        data_edges=MappingProxyType({k: tuple(v) for k, v in data_edges.items()})
+    )
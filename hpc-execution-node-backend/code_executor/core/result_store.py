@@ -0,0 +1,61 @@
+# core/result_store.py
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from utils.logger import logger
+
+class FlowResultStore:
+    """
+    Bounded store of full element outputs per flow execution.
+    
+    Streamed events only carry previews of large outputs; clients fetch the full
+    values from here by flow ID and element ID. Entries expire after ``ttl_seconds``
+    and the oldest flows are evicted beyond ``max_flows``.
+    """
+    
+    def __init__(self, max_flows: int = 256, ttl_seconds: int = 600):
+        self.max_flows = max(1, max_flows)
+        self.ttl_seconds = ttl_seconds
+        # flow_id -> (created_at, outputs keyed by element ID)
+        self._flows: "OrderedDict[str, tuple]" = OrderedDict()
+    
+    def register(self, flow_id: str, outputs: Dict[str, Any]):
+        """
+        Register a flow's output dict.
+        
+        The dict is stored by reference, so outputs added while the flow runs are
+        visible without copying.
+        """
+        self._expire()
+        self._flows[flow_id] = (time.time(), outputs)
+        self._flows.move_to_end(flow_id)
+        while len(self._flows) > self.max_flows:
+            evicted_id, _ = self._flows.popitem(last=False)
+            logger.debug(f"Evicted results of flow {evicted_id} from result store")
+    
+    def get(self, flow_id: str, element_id: Optional[str] = None) -> Optional[Any]:
+        """Get all outputs of a flow, or the outputs of one element; None if unknown or expired."""
+        self._expire()
+        entry = self._flows.get(flow_id)
+        if entry is None:
+            return None
+        outputs = entry[1]
+        if element_id is None:
+            return outputs
+        return outputs.get(element_id)
+    
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        while self._flows:
+            flow_id, (created_at, _) = next(iter(self._flows.items()))
+            if created_at >= cutoff:
+                break
+            self._flows.popitem(last=False)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "flows": len(self._flows),
+            "max_flows": self.max_flows,
+            "ttl_seconds": self.ttl_seconds
+        }
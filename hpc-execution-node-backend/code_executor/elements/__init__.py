@@ -43,6 +43,7 @@ from .akash.chat_api import ChatAPI
 # AWS
 from .aws.titan import Titan
 from .aws.nova import Nova
+from .aws.retrieval import VectorRetrieval
 
 
 # Registry of element types to their classes
@@ -87,4 +88,6 @@ element_registry = {
     "titan": Titan,
     "Nova": Nova,
     "nova": Nova,
+    "VectorRetrieval": VectorRetrieval,
+    "vector_retrieval": VectorRetrieval,
 }
\ No newline at end of file
@@ -5,6 +5,7 @@ import json
 from core.element_base import ElementBase
 from core.schema import HyperparameterSchema, AccessLevel
 from services.bedrock import BedrockService
+from services.llm_cache import with_response_cache
 from utils.logger import logger
 
 class LLMStructured(ElementBase):
@@ -190,13 +191,13 @@ class LLMStructured(ElementBase):
         if model is None:
             model = config.get("default_model_id", "arn:aws:bedrock:us-east-2:559050205657:inference-profile/us.deepseek.r1-v1:0")
         
-        bedrock_service = BedrockService(
+        bedrock_service = with_response_cache(BedrockService(
             region_name=config.get("aws_region", "us-west-2"),
             aws_access_key_id=config.get("aws_access_key_id"),
             aws_secret_access_key=config.get("aws_secret_access_key"),
             model_id=model
-        )
-                                        
+        ), config)
+        
         # Generate structured output
         try:
             structured_output = await bedrock_service.generate_structured_output(
@@ -5,6 +5,8 @@ import json
 from core.element_base import ElementBase
 from core.schema import HyperparameterSchema, AccessLevel
 from services.bedrock import BedrockService
+from services.llm_cache import with_response_cache
+from services.context_window import pack_messages, message_tokens, is_summary
 from utils.logger import logger
 
 class LLMText(ElementBase):
@@ -27,7 +29,8 @@ class LLMText(ElementBase):
                  model: str = None, 
                  temperature: float = 0.65,
                  max_tokens: int = 1000, 
-                 wrapper_prompt: str = ""):
+                 wrapper_prompt: str = "",
+                 context_token_budget: int = 0):
         
         # Set default parameters if not provided
         if parameters is None:
@@ -35,7 +38,8 @@ class LLMText(ElementBase):
                 "model": model,
                 "temperature": temperature,
                 "max_tokens": max_tokens,
-                "wrapper_prompt": wrapper_prompt
+                "wrapper_prompt": wrapper_prompt,
+                "context_token_budget": context_token_budget
             }
         
         # Default hyperparameters for LLM Text element
@@ -75,6 +79,11 @@ class LLMText(ElementBase):
                     access_level=AccessLevel.L2,
                     display_name="Wrapper Prompt",
                     description="Template to wrap user prompts"
+                ),
+                "parameters.context_token_budget": HyperparameterSchema(
+                    access_level=AccessLevel.L3,
+                    display_name="Context Token Budget",
+                    description="Maximum tokens of conversation context in the prompt, 0 for no limit"
                 )
             }
         
@@ -108,6 +117,14 @@ class LLMText(ElementBase):
                     "description": "Template to wrap prompts. Use {prompt}, {context}, {additional_data} placeholders",
                     "default": "",
                     "required": False
+                },
+                "context_token_budget": {
+                    "type": "int",
+                    "description": "Maximum estimated tokens of context messages in the prompt, 0 for no limit",
+                    "default": 0,
+                    "required": False,
+                    "min": 0,
+                    "max": 200000
                 }
             }
         
@@ -155,6 +172,17 @@ class LLMText(ElementBase):
         temperature = self.parameters.get("temperature", 0.65)
         max_tokens = self.parameters.get("max_tokens", 1000)
         wrapper_prompt = self.parameters.get("wrapper_prompt", "")
+        context_token_budget = int(self.parameters.get("context_token_budget") or 0)
+        
+        # Fall back to the configured default model
+        config = executor.config
+        
+        if model is None:
+            model = config.get("default_model_id", "arn:aws:bedrock:us-east-2:559050205657:inference-profile/us.deepseek.r1-v1:0")
+        
+        # Drop the oldest context messages that do not fit the budget, keeping a leading summary
+        if context_token_budget > 0 and isinstance(context, list):
+            context = self._fit_context(context, model, context_token_budget)
         
         # Format the prompt with wrapper and context
         formatted_prompt = self._format_prompt(prompt, context, additional_data, wrapper_prompt)
@@ -169,17 +197,12 @@ class LLMText(ElementBase):
         })
         
         # Initialize Bedrock service from config
-        config = executor.config
-        
-        if model is None:
-            model = config.get("default_model_id", "arn:aws:bedrock:us-east-2:559050205657:inference-profile/us.deepseek.r1-v1:0")
-        
-        bedrock_service = BedrockService(
+        bedrock_service = with_response_cache(BedrockService(
             region_name=config.get("aws_region", "us-west-2"),
             aws_access_key_id=config.get("aws_access_key_id"),
             aws_secret_access_key=config.get("aws_secret_access_key"),
             model_id=model
-        )
+        ), config)
         
         # Stream the generation to Backend 2
         llm_output = ""
@@ -229,6 +252,16 @@ class LLMText(ElementBase):
         
         return self.outputs
     
+    def _fit_context(self, context: List[Any], model: str, token_budget: int) -> List[Any]:
+        """Keep the most recent context messages that fit the token budget."""
+        summary = context[:1] if context and is_summary(context[0]) else []
+        if summary:
+            token_budget -= message_tokens(summary[0], model)
+        kept, dropped = pack_messages(context[len(summary):], model, max(0, token_budget))
+        if dropped:
+            logger.info(f"Context over budget: dropped {len(dropped)} older messages from the prompt")
+        return summary + kept
+    
     def _format_prompt(self, prompt: str, context: List[Any], additional_data: Dict[str, Any], wrapper_prompt: str) -> str:
         """Format the prompt with wrapper, context, and additional data."""
         # Format context as string
@@ -5,6 +5,7 @@ import json
 from core.element_base import ElementBase
 from core.schema import HyperparameterSchema, AccessLevel
 from services.akash import AkashService
+from services.llm_cache import with_response_cache
 from utils.logger import logger
 
 
@@ -169,11 +170,11 @@ class ChatAPI(ElementBase):
         })
         
         # Initialize Akash service
-        akash_service = AkashService(
+        akash_service = with_response_cache(AkashService(
             model_id=model,
             api_key=None,  # Will use env var from config
             base_url=None  # Will use default
-        )
+        ), executor.config)
         
         # Stream the generation
         llm_output = ""
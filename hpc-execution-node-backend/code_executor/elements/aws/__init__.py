@@ -1,5 +1,6 @@
 # elements/aws/__init__.py
 from .titan import Titan
 from .nova import Nova
+from .retrieval import VectorRetrieval
 
-__all__ = ["Titan", "Nova"]
\ No newline at end of file
+__all__ = ["Titan", "Nova", "VectorRetrieval"]
\ No newline at end of file
@@ -4,6 +4,7 @@ from typing import Dict, Any, List, Optional
 from core.element_base import ElementBase
 from core.schema import HyperparameterSchema, AccessLevel
 from services.bedrock import BedrockService
+from services.llm_cache import with_response_cache
 from utils.logger import logger
 from config import settings
 
@@ -162,17 +163,31 @@ class Nova(ElementBase):
         context = self.inputs.get("context", [])
         embedding = self.inputs.get("embedding", None)
         source_text = self.inputs.get("source_text", "")
+        retrieved_context = self.inputs.get("retrieved_context", None)
         
         # Get parameters
         model_id = self.parameters.get("model_id", "us.amazon.nova-lite-v1:0")
         temperature = self.parameters.get("temperature", 0.7)
         max_tokens = self.parameters.get("max_tokens", 1000)
+        similarity_threshold = self.parameters.get("similarity_threshold", 0.7)
+        top_k_contexts = self.parameters.get("top_k_contexts", 3)
         
         # Prepare context for RAG if embedding is provided
         rag_context = ""
         used_contexts = []
         
-        if embedding and source_text:
+        if retrieved_context:
+            # Chunks ranked by a Vector Retrieval element; keep the best ones above the threshold
+            for item in retrieved_context:
+                if isinstance(item, dict):
+                    if item.get("score", 1.0) >= similarity_threshold:
+                        used_contexts.append(item.get("text", ""))
+                else:
+                    used_contexts.append(str(item))
+            used_contexts = [text for text in used_contexts if text][:top_k_contexts]
+            rag_context = "\n\n".join(used_contexts)
+            logger.info(f"RAG mode: Using {len(used_contexts)} retrieved chunks as context")
+        elif embedding and source_text:
             logger.info(f"RAG mode: Using provided embedding and source text")
             # Simply use the provided source text as context
             rag_context = source_text
@@ -210,12 +225,12 @@ Please provide an accurate answer based on the given context. If the context doe
         
         try:
             # Initialize Bedrock service
-            bedrock_service = BedrockService(
+            bedrock_service = with_response_cache(BedrockService(
                 region_name=settings.aws_region,
                 aws_access_key_id=settings.aws_access_key_id,
                 aws_secret_access_key=settings.aws_secret_access_key,
                 model_id=model_id
-            )
+            ), executor.config)
             
             # Format messages for BedrockService
             # The service expects a simple prompt, so we'll convert messages to text
@@ -0,0 +1,233 @@
+# elements/aws/retrieval.py
+from typing import Dict, Any, List, Optional
+
+from core.element_base import ElementBase
+from core.schema import HyperparameterSchema, AccessLevel
+from services.bedrock import get_bedrock_client
+from services.embeddings import TitanEmbeddingService
+from services.vector_index import RetrievalService
+from utils.logger import logger
+from config import settings
+
+class VectorRetrieval(ElementBase):
+    """Vector Retrieval Element backed by a local Titan embedding index."""
+    
+    def __init__(self,
+                 element_id: str,
+                 name: str,
+                 description: str,
+                 input_schema: Dict[str, Any],
+                 output_schema: Dict[str, Any],
+                 node_description: Optional[str] = None,
+                 processing_message: Optional[str] = None,
+                 tags: Optional[List[str]] = None,
+                 layer: int = 1,
+                 parameters: Optional[Dict[str, Any]] = None,
+                 hyperparameters: Optional[Dict[str, HyperparameterSchema]] = None,
+                 parameter_schema_structure: Optional[Dict[str, Any]] = None,
+                 # Retrieval specific parameters
+                 index_name: str = "default",
+                 top_k: int = 3,
+                 chunk_size: int = 800,
+                 chunk_overlap: int = 100,
+                 model_id: str = "amazon.titan-embed-text-v2:0"):
+        
+        # Set default parameters if not provided
+        if parameters is None:
+            parameters = {
+                "index_name": index_name,
+                "top_k": top_k,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "model_id": model_id
+            }
+        
+        # Default hyperparameters for Vector Retrieval element
+        if hyperparameters is None:
+            hyperparameters = {
+                "name": HyperparameterSchema(
+                    access_level=AccessLevel.L2,
+                    display_name="Element Name",
+                    description="Display name for this element"
+                ),
+                "description": HyperparameterSchema(
+                    access_level=AccessLevel.L2,
+                    display_name="Description",
+                    description="Description of this element"
+                ),
+                "index_name": HyperparameterSchema(
+                    access_level=AccessLevel.L2,
+                    display_name="Index Name",
+                    description="Name of the vector index to search and add documents to"
+                ),
+                "top_k": HyperparameterSchema(
+                    access_level=AccessLevel.L2,
+                    display_name="Top K",
+                    description="Number of chunks to retrieve"
+                ),
+                "chunk_size": HyperparameterSchema(
+                    access_level=AccessLevel.L3,
+                    display_name="Chunk Size",
+                    description="Maximum characters per indexed chunk"
+                ),
+                "chunk_overlap": HyperparameterSchema(
+                    access_level=AccessLevel.L3,
+                    display_name="Chunk Overlap",
+                    description="Characters shared between consecutive chunks"
+                ),
+                "model_id": HyperparameterSchema(
+                    access_level=AccessLevel.L2,
+                    display_name="Model ID",
+                    description="Titan embedding model ID"
+                )
+            }
+        
+        # Default parameter schema structure
+        if parameter_schema_structure is None:
+            parameter_schema_structure = {
+                "index_name": {
+                    "type": "string",
+                    "description": "Name of the vector index",
+                    "default": "default",
+                    "required": False
+                },
+                "top_k": {
+                    "type": "int",
+                    "description": "Number of chunks to retrieve",
+                    "default": 3,
+                    "required": False,
+                    "min": 1,
+                    "max": 50
+                },
+                "chunk_size": {
+                    "type": "int",
+                    "description": "Maximum characters per indexed chunk",
+                    "default": 800,
+                    "required": False,
+                    "min": 100,
+                    "max": 8000
+                },
+                "chunk_overlap": {
+                    "type": "int",
+                    "description": "Characters shared between consecutive chunks",
+                    "default": 100,
+                    "required": False,
+                    "min": 0,
+                    "max": 2000
+                },
+                "model_id": {
+                    "type": "string",
+                    "description": "Titan embedding model ID",
+                    "default": "amazon.titan-embed-text-v2:0",
+                    "required": False
+                }
+            }
+        
+        super().__init__(
+            element_id=element_id,
+            name=name,
+            element_type="VectorRetrieval",
+            description=description,
+            node_description=node_description or "Retrieves the most relevant document chunks from a local vector index",
+            processing_message=processing_message or "Retrieving relevant context...",
+            tags=tags or ["aws", "titan", "retrieval", "rag", "vector-search"],
+            layer=layer,
+            input_schema=input_schema,
+            output_schema=output_schema,
+            parameters=parameters,
+            hyperparameters=hyperparameters,
+            parameter_schema_structure=parameter_schema_structure
+        )
+    
+    async def execute(self,
+                      executor,
+                      backtracking=False) -> Dict[str, Any]:
+        """Index any provided documents, then retrieve the top-k chunks for the query."""
+        
+        # Stream processing message
+        if executor.stream_manager:
+            await executor._stream_event("processing", {
+                "element_id": self.element_id,
+                "message": self.processing_message
+            })
+        
+        # Get inputs
+        query = self.inputs.get("query", "")
+        query_embedding = self.inputs.get("query_embedding", None)
+        documents = self.inputs.get("documents", [])
+        if isinstance(documents, str):
+            documents = [documents]
+        
+        if not query and not query_embedding:
+            raise ValueError("Either query or query_embedding must be provided for Vector Retrieval element")
+        
+        # Get parameters
+        index_name = self.parameters.get("index_name", "default")
+        top_k = self.parameters.get("top_k", 3)
+        chunk_size = self.parameters.get("chunk_size", 800)
+        chunk_overlap = self.parameters.get("chunk_overlap", 100)
+        model_id = self.parameters.get("model_id", "amazon.titan-embed-text-v2:0")
+        
+        try:
+            retrieval_service = RetrievalService(
+                embedding_service=TitanEmbeddingService(
+                    client=get_bedrock_client(
+                        region_name=settings.aws_region,
+                        aws_access_key_id=settings.aws_access_key_id,
+                        aws_secret_access_key=settings.aws_secret_access_key
+                    ),
+                    model_id=model_id
+                ),
+                # Indexes belong to the caller's namespace; executions without one only see their own
+                namespace=executor.config.get("index_namespace") or f"flow_{executor.flow_id}"
+            )
+            
+            # Index new documents before searching
+            chunks_indexed = 0
+            if documents:
+                chunks_indexed = await retrieval_service.index_documents(
+                    index_name, [str(document) for document in documents if document],
+                    chunk_size=chunk_size, chunk_overlap=chunk_overlap
+                )
+            
+            results = await retrieval_service.retrieve(
+                index_name,
+                query=query,
+                query_embedding=query_embedding,
+                top_k=top_k
+            )
+            
+            logger.info(f"Retrieved {len(results)} chunks from index '{index_name}'")
+            
+            # Set outputs
+            self.outputs = {
+                "retrieved_context": results,
+                "context_text": "\n\n".join(result["text"] for result in results),
+                "chunks_indexed": chunks_indexed
+            }
+            
+            # Stream success
+            if executor.stream_manager:
+                await executor._stream_event("output", {
+                    "element_id": self.element_id,
+                    "outputs": {
+                        "chunks_retrieved": len(results),
+                        "chunks_indexed": chunks_indexed,
+                        "top_score": results[0]["score"] if results else None
+                    }
+                })
+            
+            return self.outputs
+        
+        except Exception as e:
+            error_msg = f"Error retrieving context: {str(e)}"
+            logger.error(error_msg)
+            
+            # Stream error
+            if executor.stream_manager:
+                await executor._stream_event("error", {
+                    "element_id": self.element_id,
+                    "error": error_msg
+                })
+            
+            raise RuntimeError(error_msg)
@@ -4,7 +4,8 @@ import json
 
 from core.element_base import ElementBase
 from core.schema import HyperparameterSchema, AccessLevel
-from services.bedrock import BedrockService
+from services.bedrock import get_bedrock_client
+from services.embeddings import TitanEmbeddingService
 from utils.logger import logger
 from config import settings
 
@@ -124,66 +125,74 @@ class Titan(ElementBase):
         input_text = self.inputs.get("input_text", "")
         param_text = self.parameters.get("param_text", "")
         
-        # Merge texts
-        texts_to_merge = []
-        if input_text:
-            texts_to_merge.append(input_text.strip())
-        if param_text:
-            texts_to_merge.append(param_text.strip())
+        # A list of texts is embedded item by item (batch mode)
+        batch_mode = isinstance(input_text, list)
+        input_texts = input_text if batch_mode else [input_text]
         
-        if not texts_to_merge:
-            raise ValueError("At least one text input must be provided (either from input or parameters)")
+        # Merge each text with the parameter text; blank items stay as None so outputs line up with the inputs
+        merged_texts = []
+        for text in input_texts:
+            texts_to_merge = []
+            if text and str(text).strip():
+                texts_to_merge.append(str(text).strip())
+            if param_text and param_text.strip():
+                texts_to_merge.append(param_text.strip())
+            # Merge with space separator
+            merged_texts.append(" ".join(texts_to_merge) if texts_to_merge else None)
         
-        # Merge with space separator
-        merged_text = " ".join(texts_to_merge)
+        texts_to_embed = [text for text in merged_texts if text is not None]
+        if not texts_to_embed:
+            raise ValueError("At least one text input must be provided (either from input or parameters)")
         
-        logger.info(f"Generating embedding for merged text (length: {len(merged_text)} chars)")
+        logger.info(f"Generating embeddings for {len(texts_to_embed)} text(s) "
+                    f"(total length: {sum(len(text) for text in texts_to_embed)} chars)")
         
         # Get model parameters
         model_id = self.parameters.get("model_id", "amazon.titan-embed-text-v2:0")
         
         try:
-            # Initialize Bedrock service
-            bedrock_service = BedrockService(
-                region_name=settings.aws_region,
-                aws_access_key_id=settings.aws_access_key_id,
-                aws_secret_access_key=settings.aws_secret_access_key,
+            # Embeddings are served from the shared cache where possible
+            embedding_service = TitanEmbeddingService(
+                client=get_bedrock_client(
+                    region_name=settings.aws_region,
+                    aws_access_key_id=settings.aws_access_key_id,
+                    aws_secret_access_key=settings.aws_secret_access_key
+                ),
                 model_id=model_id
             )
             
-            # Prepare request body for Titan embeddings
-            request_body = {
-                "inputText": merged_text
-            }
-            
-            # Invoke the model directly for embeddings
-            response = bedrock_service.client.invoke_model(
-                modelId=model_id,
-                body=json.dumps(request_body),
-                contentType="application/json",
-                accept="application/json"
-            )
-            
-            # Parse response
-            response_body = json.loads(response['body'].read())
-            
-            # Extract embedding
-            embedding = response_body.get("embedding", [])
-            token_count = response_body.get("inputTextTokenCount", 0)
+            results = iter(await embedding_service.embed_many(texts_to_embed))
+            embeddings = []
+            token_count = 0
+            for text in merged_texts:
+                if text is None:
+                    embeddings.append(None)
+                    continue
+                embedding, count = next(results)
+                embeddings.append(embedding)
+                token_count += count
             
             # Get actual embedding dimension
-            embedding_dimension = len(embedding)
+            embedding_dimension = len(next(embedding for embedding in embeddings if embedding is not None))
             
             # Log success
-            logger.info(f"Successfully generated embedding with dimension: {embedding_dimension}")
+            logger.info(f"Successfully generated {len(texts_to_embed)} embedding(s) with dimension: {embedding_dimension}")
             
             # Set outputs
-            self.outputs = {
-                "embedding": embedding,
-                "source_text": merged_text,
-                "embedding_dimension": embedding_dimension,
-                "token_count": token_count
-            }
+            if batch_mode:
+                self.outputs = {
+                    "embedding": embeddings,
+                    "source_text": merged_texts,
+                    "embedding_dimension": embedding_dimension,
+                    "token_count": token_count
+                }
+            else:
+                self.outputs = {
+                    "embedding": embeddings[0],
+                    "source_text": merged_texts[0],
+                    "embedding_dimension": embedding_dimension,
+                    "token_count": token_count
+                }
             
             # Stream success
             if executor.stream_manager:
@@ -192,6 +201,7 @@ class Titan(ElementBase):
                     "outputs": {
                         # "source_text": merged_text[:100] + "..." if len(merged_text) > 100 else merged_text,
                         "embedding_dimension": embedding_dimension,
+                        "embedding_count": len(texts_to_embed),
                         "token_count": token_count,
                         # "embedding": f"[{embedding_dimension}-dimensional vector]"  # Don't stream full vector
                     }
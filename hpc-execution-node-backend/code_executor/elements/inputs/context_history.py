@@ -4,6 +4,7 @@ from datetime import datetime
 
 from core.element_base import ElementBase
 from core.schema import HyperparameterSchema, AccessLevel
+from services.context_window import pack_messages, message_tokens, get_summary_cache
 from utils.logger import logger
 
 class ContextHistory(ElementBase):
@@ -29,7 +30,10 @@ class ContextHistory(ElementBase):
                 "max_messages": 10,
                 "include_system": False,
                 "format": "full",
-                "filter_by_role": "all"
+                "filter_by_role": "all",
+                "token_budget": 0,
+                "summarize_overflow": True,
+                "model": None
             }
         
         # Default hyperparameters for Context History element
@@ -53,7 +57,7 @@ class ContextHistory(ElementBase):
                 "parameters.max_messages": HyperparameterSchema(
                     access_level=AccessLevel.L2,
                     display_name="Max Messages",
-                    description="Maximum number of messages to retrieve"
+                    description="Maximum number of messages to retrieve, or to keep verbatim next to a summary"
                 ),
                 "parameters.include_system": HyperparameterSchema(
                     access_level=AccessLevel.L2,
@@ -69,6 +73,21 @@ class ContextHistory(ElementBase):
                     access_level=AccessLevel.L2,
                     display_name="Filter By Role",
                     description="Filter messages by role"
+                ),
+                "parameters.token_budget": HyperparameterSchema(
+                    access_level=AccessLevel.L2,
+                    display_name="Token Budget",
+                    description="Maximum tokens of history passed on, 0 for no limit"
+                ),
+                "parameters.summarize_overflow": HyperparameterSchema(
+                    access_level=AccessLevel.L2,
+                    display_name="Summarize Overflow",
+                    description="Summarize the messages that do not fit the token budget"
+                ),
+                "parameters.model": HyperparameterSchema(
+                    access_level=AccessLevel.L3,
+                    display_name="Model ID",
+                    description="Model the history is sized for, also used for summaries"
                 )
             }
         
@@ -77,7 +96,7 @@ class ContextHistory(ElementBase):
             parameter_schema_structure = {
                 "max_messages": {
                     "type": "int",
-                    "description": "Maximum number of messages to retrieve",
+                    "description": "Maximum number of messages to retrieve, or to keep verbatim next to a summary",
                     "default": 10,
                     "required": False,
                     "min": 1,
@@ -102,6 +121,26 @@ class ContextHistory(ElementBase):
                     "enum": ["all", "user", "assistant", "system"],
                     "default": "all",
                     "required": False
+                },
+                "token_budget": {
+                    "type": "int",
+                    "description": "Maximum estimated tokens of history, 0 for no limit",
+                    "default": 0,
+                    "required": False,
+                    "min": 0,
+                    "max": 200000
+                },
+                "summarize_overflow": {
+                    "type": "bool",
+                    "description": "Fold messages that do not fit the token budget into a rolling summary",
+                    "default": True,
+                    "required": False
+                },
+                "model": {
+                    "type": "string",
+                    "description": "Model ID or ARN of the model reading the history, used to count tokens",
+                    "default": None,
+                    "required": False
                 }
             }
         
@@ -138,9 +177,13 @@ class ContextHistory(ElementBase):
         include_system = self.parameters.get("include_system", False)
         format_type = self.parameters.get("format", "full")
         filter_by_role = self.parameters.get("filter_by_role", "all")
+        token_budget = int(self.parameters.get("token_budget") or 0)
+        summarize_overflow = self.parameters.get("summarize_overflow", True)
+        model = self.parameters.get("model") or executor.config.get("default_model_id")
         
         # Get conversation history from session context or inputs
-        # Priority: inputs -> session context -> create sample/default
+        # Priority: inputs -> session context -> empty history
+        # The backend sends only the recent messages this element can use, not the whole conversation
         conversation_history = []
         
         # Try to get from inputs first
@@ -150,26 +193,9 @@ class ContextHistory(ElementBase):
                 conversation_history = input_history
             else:
                 conversation_history = [str(input_history)]
-        else:
+        elif hasattr(executor, 'session_context') and executor.session_context:
             # Try to get from executor/session context (if available)
-            if hasattr(executor, 'session_context') and executor.session_context:
-                conversation_history = executor.session_context.get('conversation_history', [])
-            else:
-                # Create sample conversation history for demonstration
-                conversation_history = [
-                    {
-                        "role": "user",
-                        "content": "Hello, I need help with my account",
-                        "timestamp": datetime.now().isoformat(),
-                        "metadata": {"message_id": "msg_001", "session_id": "demo_session"}
-                    },
-                    {
-                        "role": "assistant", 
-                        "content": "I'd be happy to help you with your account. What specific issue are you experiencing?",
-                        "timestamp": datetime.now().isoformat(),
-                        "metadata": {"message_id": "msg_002", "session_id": "demo_session"}
-                    }
-                ]
+            conversation_history = executor.session_context.get('conversation_history', [])
         
         # Apply filtering by role
         if filter_by_role != "all":
@@ -186,10 +212,20 @@ class ContextHistory(ElementBase):
                 if not (isinstance(msg, dict) and msg.get("role") == "system")
             ]
         
-        # Limit number of messages
-        if len(conversation_history) > max_messages:
+        # Limit number of messages; with a rolling summary the limit only caps the messages kept
+        # verbatim, so older ones are folded into the summary rather than cut off before it
+        if len(conversation_history) > max_messages and not (token_budget > 0 and summarize_overflow):
             conversation_history = conversation_history[-max_messages:]  # Get most recent messages
         
+        # Keep the most recent messages that fit the token budget; older ones become a summary
+        summarized_messages = 0
+        if token_budget > 0:
+            conversation_history = await self._fit_budget(
+                conversation_history, executor, model, token_budget, max_messages, summarize_overflow
+            )
+            if conversation_history and isinstance(conversation_history[0], dict):
+                summarized_messages = (conversation_history[0].get("metadata") or {}).get("summarized_messages", 0)
+        
         # Format output based on format parameter
         formatted_history = self._format_history(conversation_history, format_type)
         
@@ -202,11 +238,40 @@ class ContextHistory(ElementBase):
             "history": formatted_history,
             "message_count": len(formatted_history),
             "format": format_type,
-            "filter_by_role": filter_by_role
+            "filter_by_role": filter_by_role,
+            "token_budget": token_budget,
+            "summarized_messages": summarized_messages
         })
         
         return self.outputs
     
+    async def _fit_budget(self, history: List[Any], executor, model: str, token_budget: int,
+                          max_messages: int, summarize_overflow: bool) -> List[Any]:
+        """Pack the most recent messages into the token budget, summarizing the rest if enabled."""
+        kept, overflow = pack_messages(history, model, token_budget, max_messages)
+        if not overflow:
+            return kept
+        if not summarize_overflow:
+            logger.info(f"Context history over budget: dropped {len(overflow)} older messages")
+            return kept
+        
+        # Make room for the summary, then fold everything older than the window into it
+        config = executor.config
+        summary_tokens = min(int(config.get("context_summary_max_tokens", 512)), token_budget // 2)
+        kept, overflow = pack_messages(history, model, token_budget - summary_tokens, max_messages)
+        summary = await get_summary_cache().summarize(
+            overflow,
+            model_id=config.get("context_summary_model_id") or model,
+            config=config,
+            max_tokens=summary_tokens
+        )
+        if summary is None:
+            return kept
+        if message_tokens(summary, model) > summary_tokens:
+            # The model overran its limit; shorten the window rather than the summary
+            kept, _ = pack_messages(kept, model, token_budget - message_tokens(summary, model))
+        return [summary] + kept
+    
     def _format_history(self, history: List[Any], format_type: str) -> List[Any]:
         """Format conversation history based on the specified format."""
         if format_type == "text_only":
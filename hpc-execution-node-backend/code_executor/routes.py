@@ -1,20 +1,32 @@
-from fastapi import FastAPI, HTTPException, Request, WebSocket, BackgroundTasks
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi.responses import StreamingResponse, Response
+from pydantic import BaseModel, ValidationError
 import asyncio
 import json
 from typing import Optional, Dict, Any, List
 
 from config import settings
 from core.executor import FlowExecutor
+from core.flow_cache import FlowCompileCache, FlowBlueprint, ElementBlueprint, compute_flow_hash
+from core.result_store import FlowResultStore
 from core.schema import Connection as ConnectionSchema, ConnectionType, FlowDefinition, NodeDefinition
-from services.streaming import WebSocketStreamManager, DirectResponseStreamManager, SSEStreamManager
+from services.streaming import WebSocketStreamManager, DirectResponseStreamManager, ChannelStreamManager, SSEStreamManager, get_stream_metrics
+from services.llm_cache import get_llm_cache
 from utils.logger import logger
+from utils.serialization import dumps_bytes
 from elements import element_registry  # Import from app.py
 
+# Compiled flow blueprints shared across requests, keyed by flow definition hash
+flow_compile_cache = FlowCompileCache(max_size=settings.flow_cache_size)
+
+# Full element outputs of recent executions, fetched on demand by clients
+flow_result_store = FlowResultStore(max_flows=settings.result_store_max_flows,
+                                    ttl_seconds=settings.result_store_ttl_seconds)
+
 class ExecuteFlowRequest(BaseModel):
     flow_id: str
-    flow_definition: FlowDefinition
+    # Kept as the raw JSON so it hashes like the WebSocket transports; validated on compile
+    flow_definition: Dict[str, Any]
     initial_inputs: dict | None = None
     backend2_ws_url: Optional[str] = None  # Make this optional
     stream_mode: str = "sse"  # Options: "sse", "ws", "backend2"
@@ -38,12 +50,12 @@ async def execute_flow(request: ExecuteFlowRequest, background_tasks: Background
             stream_manager = SSEStreamManager()
         # The "ws" mode will be handled separately in the WebSocket endpoint
         
-        # Parse the flow definition
-        flow_def = request.flow_definition
+        # Reuse the compiled blueprint when this flow definition was seen before
+        blueprint = resolve_flow_blueprint({"flow_definition": request.flow_definition})
         
         # Create element instances and setup the flow executor
-        # elements, executor = await setup_flow_executor(flow_def, stream_manager, request.config)
-        elements, executor = await setup_flow_executor(flow_def, stream_manager)
+        # elements, executor = await setup_flow_executor(blueprint, stream_manager, request.config)
+        elements, executor = await setup_flow_executor(blueprint, stream_manager)
         
         
         # Execute the flow in the background
@@ -74,6 +86,9 @@ async def execute_flow(request: ExecuteFlowRequest, background_tasks: Background
             "message": f"Flow execution started in {request.stream_mode} mode"
         }
     
+    except ValidationError as e:
+        # Reported like request body validation, which the flow definition used to go through
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
     except Exception as e:
         logger.error(f"Error executing flow: {str(e)}")
         # Try to notify about the error if stream_manager exists
@@ -88,7 +103,7 @@ async def execute_flow(request: ExecuteFlowRequest, background_tasks: Background
                 }))
             except Exception as ws_error:
                 logger.error(f"Failed to send error to stream: {str(ws_error)}")
-                
+        
         raise HTTPException(status_code=500, detail=str(e))
 
 async def execute_flow_websocket(websocket: WebSocket, flow_id: str, flow_definition_str: str, 
@@ -97,75 +112,245 @@ async def execute_flow_websocket(websocket: WebSocket, flow_id: str, flow_defini
     
     try:
         # Parse the JSON strings
-        flow_definition = json.loads(flow_definition_str)
-        initial_inputs  = json.loads(initial_inputs_str) if initial_inputs_str else None
-        config          = json.loads(config_str) if config_str else None
-        
-        # Create flow definition model - handle both old and new formats
-        logger.info(f"Received flow_definition type: {type(flow_definition)}")
-        logger.info(f"Received flow_definition keys: {list(flow_definition.keys()) if isinstance(flow_definition, dict) else 'not a dict'}")
-        
-        # Preprocess flow definition to ensure compatibility
-        processed_flow = flow_definition.copy()
-        
-        # If nodes exist, preprocess them
-        if "nodes" in processed_flow:
-            for node_id, node_data in processed_flow["nodes"].items():
-                # Ensure node data has all required fields
-                if not isinstance(node_data, dict):
-                    continue
-                    
-                # Don't add element_id and name to node_data anymore
-                # We'll handle these separately in setup_flow_executor
-                
-                # Fix tags field - convert empty dict to empty list
-                if "tags" in node_data and isinstance(node_data["tags"], dict) and not node_data["tags"]:
-                    node_data["tags"] = []
-                elif "tags" not in node_data:
-                    node_data["tags"] = []
-                    
-                # Ensure input_schema and output_schema are present
-                if "input_schema" not in node_data:
-                    node_data["input_schema"] = {}
-                if "output_schema" not in node_data:
-                    node_data["output_schema"] = {}
-                    
-        # Create flow definition
-        try:
-            flow_def = FlowDefinition(**processed_flow)
-            logger.info("Successfully created FlowDefinition")
-        except Exception as e:
-            logger.error(f"Failed to create FlowDefinition: {str(e)}")
-            logger.error(f"Processed flow data: {json.dumps(processed_flow, indent=2)}")
-            raise
+        request = {
+            "flow_definition": json.loads(flow_definition_str),
+            "initial_inputs": json.loads(initial_inputs_str) if initial_inputs_str else None,
+            "config": json.loads(config_str) if config_str else None
+        }
+    except Exception as e:
+        await send_websocket_flow_error(websocket, flow_id, e)
+        return
+    
+    await execute_flow_websocket_request(websocket, flow_id, request)
+
+def parse_execute_request(message: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse a single-shot execute request, or return None for any other message.
+    
+    A request is ``{"type": "execute", "flow_hash" | "flow_definition": ..., "initial_inputs": ..., "config": ...}``.
+    """
+    try:
+        request = json.loads(message)
+    except ValueError:
+        return None
+    if isinstance(request, dict) and request.get("type") == "execute":
+        return request
+    return None
+
+def resolve_flow_blueprint(request: Dict[str, Any]) -> Optional[FlowBlueprint]:
+    """
+    Get the compiled blueprint for an execute request.
+    
+    The request either carries the flow inline as ``flow_definition`` (compiled on the
+    first sight of its hash) or references an already compiled flow by ``flow_hash``.
+    
+    Returns:
+        The blueprint, or None if the referenced hash is not in the compile cache
+    """
+    flow_definition = request.get("flow_definition")
+    if flow_definition is not None:
+        # Validate and compile the flow only the first time this definition is seen
+        flow_hash = compute_flow_hash(flow_definition)
+        return flow_compile_cache.get_or_compile(
+            flow_hash, lambda: compile_flow_definition(flow_definition, flow_hash))
+    
+    flow_hash = request.get("flow_hash")
+    if not flow_hash:
+        raise ValueError("Execute request needs a flow_definition or a flow_hash")
+    return flow_compile_cache.get(flow_hash)
+
+def unknown_flow_event(flow_id: str, flow_hash: Optional[str]) -> Dict[str, Any]:
+    """Event asking the client to resend a request with the full flow definition."""
+    return {
+        "type": "unknown_flow",
+        "data": {
+            "flow_id": flow_id,
+            "flow_hash": flow_hash
+        }
+    }
+
+async def execute_flow_websocket_request(websocket: WebSocket, flow_id: str, request: Dict[str, Any]):
+    """
+    Execute a flow from one request message and stream its events over the WebSocket.
+    
+    If the request references a flow hash this node has not compiled, an unknown_flow
+    event is sent and one retry carrying the full definition is read from the socket.
+    """
+    try:
+        blueprint = resolve_flow_blueprint(request)
+        if blueprint is None:
+            await websocket.send_text(json.dumps(unknown_flow_event(flow_id, request.get("flow_hash"))))
+            request = parse_execute_request(await websocket.receive_text())
+            if request is None:
+                raise ValueError("Expected an execute request with the flow definition")
+            blueprint = resolve_flow_blueprint(request)
+            if blueprint is None:
+                raise ValueError(f"Unknown flow hash: {request.get('flow_hash')}")
         
         # Create a direct WebSocket stream manager
         stream_manager = DirectResponseStreamManager(websocket)
         
         # Setup the flow executor
-        elements, executor = await setup_flow_executor(flow_def, stream_manager, config)
+        elements, executor = await setup_flow_executor(blueprint, stream_manager, request.get("config"))
         
         # Execute the flow
-        await execute_flow_task(executor, initial_inputs, flow_id, stream_manager)
-        
+        await execute_flow_task(executor, request.get("initial_inputs"), flow_id, stream_manager)
+    
     except Exception as e:
-        error_msg = f"Error executing flow via WebSocket: {str(e)}"
-        logger.error(error_msg)
-        try:
-            await websocket.send_text(json.dumps({
-                "type": "flow_error",
-                "data": {
-                    "flow_id": flow_id,
-                    "error": str(e)
-                }
-            }))
-        except Exception:
-            pass
+        await send_websocket_flow_error(websocket, flow_id, e)
 
-async def setup_flow_executor(flow_def: FlowDefinition, stream_manager, user_config: Optional[Dict[str, Any]] = None):
-    """Setup the flow executor with elements and connections."""
-    # Create element instances
-    elements = {}
+async def send_websocket_flow_error(websocket: WebSocket, flow_id: str, error: Exception):
+    """Report a flow that could not be started to the WebSocket client."""
+    logger.error(f"Error executing flow via WebSocket: {str(error)}")
+    try:
+        await websocket.send_text(json.dumps({
+            "type": "flow_error",
+            "data": {
+                "flow_id": flow_id,
+                "error": str(error)
+            }
+        }))
+    except Exception:
+        pass
+
+async def execute_flow_channel(websocket: WebSocket):
+    """
+    Multiplexed WebSocket channel: many flows over one long-lived connection.
+    
+    Each client frame is a complete request, e.g.
+    ``{"type": "execute", "flow_id": ..., "flow_hash" | "flow_definition": ..., "initial_inputs": ..., "config": ...}``,
+    and execution starts on receipt. A flow hash this node has not compiled is answered
+    with an unknown_flow event. ``{"type": "cancel", "flow_id": ...}`` stops a running
+    flow. Outgoing frames are tagged with the flow ID they belong to.
+    """
+    send_lock = asyncio.Lock()
+    flow_tasks: Dict[str, asyncio.Task] = {}
+    
+    try:
+        while True:
+            message = await websocket.receive_text()
+            # A bad frame is dropped on its own; only a disconnect ends the channel and its flows
+            try:
+                frame = json.loads(message)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Ignoring malformed channel frame: {str(e)}")
+                continue
+            if not isinstance(frame, dict) or not isinstance(frame.get("flow_id", ""), str):
+                logger.warning(f"Ignoring channel frame that is not a request object: {message[:200]}")
+                continue
+            
+            try:
+                frame_type = frame.get("type")
+                flow_id = frame.get("flow_id")
+                
+                if frame_type == "execute" and flow_id:
+                    if flow_id in flow_tasks:
+                        logger.warning(f"Flow {flow_id} is already running on this channel, ignoring request")
+                        continue
+                    stream_manager = ChannelStreamManager(websocket, flow_id, send_lock)
+                    # Resolve before starting the task so a resent request never finds the flow still registered
+                    try:
+                        blueprint = resolve_flow_blueprint(frame)
+                    except Exception as e:
+                        logger.error(f"Error preparing flow {flow_id} from channel: {str(e)}")
+                        await stream_manager.send_event({
+                            "type": "flow_error",
+                            "data": {
+                                "flow_id": flow_id,
+                                "error": str(e)
+                            }
+                        })
+                        await stream_manager.disconnect()
+                        continue
+                    if blueprint is None:
+                        await stream_manager.send_event(unknown_flow_event(flow_id, frame.get("flow_hash")))
+                        await stream_manager.disconnect()
+                        continue
+                    task = asyncio.create_task(execute_channel_flow(blueprint, stream_manager, frame))
+                    flow_tasks[flow_id] = task
+                    task.add_done_callback(lambda _, flow_id=flow_id: flow_tasks.pop(flow_id, None))
+                elif frame_type == "cancel" and flow_id in flow_tasks:
+                    logger.info(f"Cancelling flow {flow_id} at client request")
+                    flow_tasks[flow_id].cancel()
+                else:
+                    logger.warning(f"Ignoring unsupported channel frame: {frame_type}")
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(f"Error handling channel frame {frame.get('type')} for flow {frame.get('flow_id')}: {str(e)}")
+    except WebSocketDisconnect:
+        logger.info("Flow channel disconnected")
+    except Exception as e:
+        logger.error(f"Flow channel failed: {str(e)}")
+    finally:
+        for task in list(flow_tasks.values()):
+            task.cancel()
+
+async def execute_channel_flow(blueprint: FlowBlueprint, stream_manager: ChannelStreamManager, frame: Dict[str, Any]):
+    """Run one flow requested over a multiplexed channel."""
+    flow_id = frame["flow_id"]
+    
+    try:
+        elements, executor = await setup_flow_executor(blueprint, stream_manager, frame.get("config"))
+    except Exception as e:
+        logger.error(f"Error preparing flow {flow_id} from channel: {str(e)}")
+        await stream_manager.send_event({
+            "type": "flow_error",
+            "data": {
+                "flow_id": flow_id,
+                "error": str(e)
+            }
+        })
+        await stream_manager.disconnect()
+        return
+    
+    await execute_flow_task(executor, frame.get("initial_inputs"), flow_id, stream_manager)
+
+def compile_flow_definition(flow_definition: Dict[str, Any], flow_hash: Optional[str] = None) -> FlowBlueprint:
+    """Preprocess and validate a raw flow definition, then compile it into a blueprint."""
+    # Create flow definition model - handle both old and new formats
+    logger.info(f"Received flow_definition type: {type(flow_definition)}")
+    logger.info(f"Received flow_definition keys: {list(flow_definition.keys()) if isinstance(flow_definition, dict) else 'not a dict'}")
+    
+    # Preprocess flow definition to ensure compatibility
+    processed_flow = flow_definition.copy()
+    
+    # If nodes exist, preprocess them
+    if "nodes" in processed_flow:
+        for node_id, node_data in processed_flow["nodes"].items():
+            # Ensure node data has all required fields
+            if not isinstance(node_data, dict):
+                continue
+            
+            # Don't add element_id and name to node_data anymore
+            # We'll handle these separately in compile_flow_blueprint
+            
+            # Fix tags field - convert empty dict to empty list
+            if "tags" in node_data and isinstance(node_data["tags"], dict) and not node_data["tags"]:
+                node_data["tags"] = []
+            elif "tags" not in node_data:
+                node_data["tags"] = []
+            
+            # Ensure input_schema and output_schema are present
+            if "input_schema" not in node_data:
+                node_data["input_schema"] = {}
+            if "output_schema" not in node_data:
+                node_data["output_schema"] = {}
+    
+    # Create flow definition
+    try:
+        flow_def = FlowDefinition(**processed_flow)
+        logger.info("Successfully created FlowDefinition")
+    except Exception as e:
+        logger.error(f"Failed to create FlowDefinition: {str(e)}")
+        logger.error(f"Processed flow data: {json.dumps(processed_flow, indent=2)}")
+        raise
+    
+    return compile_flow_blueprint(flow_def, flow_hash)
+
+def compile_flow_blueprint(flow_def: FlowDefinition, flow_hash: Optional[str] = None) -> FlowBlueprint:
+    """Derive element constructor params and connections from a validated flow definition."""
+    element_blueprints = []
     nodes = flow_def.nodes or flow_def.elements
     if not nodes:
         raise HTTPException(status_code=400, detail="No nodes/elements found in flow definition")
@@ -239,17 +424,14 @@ async def setup_flow_executor(flow_def: FlowDefinition, stream_manager, user_con
         if duplicate_keys:
             logger.warning(f"Duplicate keys found: {duplicate_keys}")
         
-        # Create the element instance
-        try:
-            # Merge params, with common_params taking precedence
-            all_params = {**additional_params, **common_params}
-            logger.info(f"All params keys: {list(all_params.keys())}")
-            elements[elem_id] = ElementClass(**all_params)
-        except Exception as e:
-            logger.error(f"Failed to create element {elem_id}: {str(e)}")
-            logger.error(f"ElementClass: {ElementClass}")
-            logger.error(f"All params: {all_params}")
-            raise
+        # Merge params, with common_params taking precedence
+        all_params = {**additional_params, **common_params}
+        logger.info(f"All params keys: {list(all_params.keys())}")
+        element_blueprints.append(ElementBlueprint(
+            element_id=elem_id,
+            element_class=ElementClass,
+            params=all_params
+        ))
     
     # Convert connections to schema objects
     connections = []
@@ -262,7 +444,30 @@ async def setup_flow_executor(flow_def: FlowDefinition, stream_manager, user_con
             to_input=conn.to_input
         )
         connections.append(connection)
+    
+    start_element = flow_def.start_element or flow_def.start_element_id
+    if not start_element:
+        raise HTTPException(status_code=400, detail="No start element specified in flow definition")
+    
+    return FlowBlueprint(
+        flow_hash=flow_hash,
+        elements=tuple(element_blueprints),
+        connections=tuple(connections),
+        start_element_id=start_element
+    )
 
+async def setup_flow_executor(blueprint: FlowBlueprint, stream_manager, user_config: Optional[Dict[str, Any]] = None):
+    """Setup the flow executor with fresh element instances from a compiled blueprint."""
+    # Create element instances
+    elements = {}
+    for element_blueprint in blueprint.elements:
+        try:
+            elements[element_blueprint.element_id] = element_blueprint.instantiate()
+        except Exception as e:
+            logger.error(f"Failed to create element {element_blueprint.element_id}: {str(e)}")
+            logger.error(f"ElementClass: {element_blueprint.element_class}")
+            logger.error(f"All params: {element_blueprint.params}")
+            raise
     
     # Merge configuration
     config = {}
@@ -272,17 +477,17 @@ async def setup_flow_executor(flow_def: FlowDefinition, stream_manager, user_con
     if user_config:
         config.update(user_config)
     
-    # Create the flow executor
-    start_element = flow_def.start_element or flow_def.start_element_id
-    if not start_element:
-        raise HTTPException(status_code=400, detail="No start element specified in flow definition")
+    # Vector indexes are private to the namespace the caller sends, or to the flow
+    if not config.get("index_namespace") and blueprint.flow_hash:
+        config["index_namespace"] = f"flow_{blueprint.flow_hash}"
     
     executor = FlowExecutor(
         elements=elements,
-        start_element_id=start_element,
-        connections=connections,
+        start_element_id=blueprint.start_element_id,
+        connections=list(blueprint.connections),
         stream_manager=stream_manager,
-        config=config
+        config=config,
+        result_store=flow_result_store
     )
     
     return elements, executor
@@ -293,7 +498,7 @@ async def execute_flow_task(executor: FlowExecutor, initial_inputs, flow_id, str
         # Execute the flow
         result = await executor.execute_flow(initial_inputs)
         logger.info(f"Flow {flow_id} execution completed successfully")
-        
+    
     except Exception as e:
         logger.error(f"Error during flow {flow_id} execution: {str(e)}")
         # Try to notify about the error
@@ -318,6 +523,26 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+async def flow_cache_stats():
+    """Compiled flow cache metrics endpoint."""
+    return flow_compile_cache.stats()
+
+async def llm_cache_stats():
+    """LLM response cache metrics endpoint."""
+    return get_llm_cache().stats()
+
+async def get_flow_results(flow_id: str, element_id: Optional[str] = None):
+    """Full outputs of a flow execution, or of one of its elements."""
+    outputs = flow_result_store.get(flow_id, element_id)
+    if outputs is None:
+        target = f"element {element_id} of flow {flow_id}" if element_id else f"flow {flow_id}"
+        raise HTTPException(status_code=404, detail=f"No results found for {target}")
+    return Response(content=dumps_bytes(outputs), media_type="application/json")
+
+async def streaming_stats():
+    """Stream buffer depth and overflow metrics endpoint."""
+    return get_stream_metrics()
+
 async def log_requests(request: Request, call_next):
     """Middleware to log all requests."""
     start_time = asyncio.get_event_loop().time()
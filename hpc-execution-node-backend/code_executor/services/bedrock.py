@@ -1,10 +1,60 @@
+import threading
 import boto3
-from typing import Any, AsyncGenerator, Dict, Optional
+from botocore.config import Config
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple
 
 from .llm.anthropic import AnthropicModel
 from .llm.deepseek import DeepSeekModel
 from .llm.general import GeneralModel
 from .llm.nova import NovaModel
+from config import settings
+from utils.logger import logger
+
+# Process-wide bedrock-runtime clients keyed by (region, credentials, client config).
+# boto3 clients are thread-safe, so one client (and its connection pool) serves every flow.
+_client_registry: Dict[Tuple, Any] = {}
+_client_registry_lock = threading.Lock()
+
+def get_bedrock_client(region_name: str,
+                       aws_access_key_id: Optional[str] = None,
+                       aws_secret_access_key: Optional[str] = None,
+                       max_pool_connections: Optional[int] = None):
+    """
+    Get a shared bedrock-runtime client, creating it on first use.
+    
+    Args:
+        region_name: AWS region name
+        aws_access_key_id: AWS access key ID
+        aws_secret_access_key: AWS secret access key
+        max_pool_connections: HTTP connection pool size (defaults to settings)
+        
+    Returns:
+        boto3 bedrock-runtime client
+    """
+    max_pool_connections = max_pool_connections or settings.bedrock_max_pool_connections
+    key = (region_name, aws_access_key_id, aws_secret_access_key, max_pool_connections)
+    
+    client = _client_registry.get(key)
+    if client is not None:
+        return client
+    
+    with _client_registry_lock:
+        client = _client_registry.get(key)
+        if client is None:
+            # boto3 sessions are not thread-safe, so they are only created under the lock
+            session = boto3.Session(
+                region_name=region_name,
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key
+            )
+            client = session.client(
+                'bedrock-runtime',
+                config=Config(max_pool_connections=max_pool_connections)
+            )
+            _client_registry[key] = client
+            logger.info(f"Created shared bedrock-runtime client for region {region_name} "
+                        f"(max_pool_connections={max_pool_connections})")
+    return client
 
 
 class BedrockService:
@@ -23,12 +73,11 @@ class BedrockService:
             aws_secret_access_key: AWS secret access key
             model_id: AWS Bedrock model ID (default is Claude 3 Haiku)
         """
-        session = boto3.Session(
+        self.client = get_bedrock_client(
             region_name=region_name,
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key
         )
-        self.client = session.client('bedrock-runtime')
         self.model_id = model_id
         
         # Initialize the appropriate model based on the model ID
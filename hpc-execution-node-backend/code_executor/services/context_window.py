@@ -0,0 +1,214 @@
+import hashlib
+import json
+import math
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from services.bedrock import BedrockService
+from utils.logger import logger
+
+# Approximate UTF-8 bytes per token of each model family's tokenizer, matched against the model ID
+_BYTES_PER_TOKEN = (
+    ("anthropic", 3.5),
+    ("claude", 3.5),
+    ("deepseek", 3.3),
+    ("llama", 3.8),
+    ("mistral", 3.6),
+    ("nova", 4.0),
+    ("titan", 4.0),
+)
+_DEFAULT_BYTES_PER_TOKEN = 4.0
+
+# Role markers and separators added around each message in the prompt
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Longest message excerpt folded into a summary, so one huge message cannot blow up the summary prompt
+_SUMMARY_MESSAGE_CHARS = 4000
+
+_SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an assistant.
+{previous}Fold the following messages into the summary. Keep names, numbers, decisions, open questions and user preferences; drop small talk. Answer with the updated summary only.
+
+Messages:
+{messages}"""
+
+def bytes_per_token(model_id: Optional[str]) -> float:
+    """Approximate tokenizer density of the model family of a model ID or ARN."""
+    model_id = (model_id or "").lower()
+    for family, ratio in _BYTES_PER_TOKEN:
+        if family in model_id:
+            return ratio
+    return _DEFAULT_BYTES_PER_TOKEN
+
+def count_tokens(text: str, model_id: Optional[str] = None) -> int:
+    """Estimate the number of tokens of a text for a model.
+    
+    UTF-8 length is used rather than characters so that scripts taking several
+    bytes per character, which also take more tokens, are not undercounted.
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text.encode("utf-8")) / bytes_per_token(model_id))
+
+def message_tokens(message: Any, model_id: Optional[str] = None) -> int:
+    """Estimate the prompt tokens of one context message, including its role marker."""
+    content = message.get("content", "") if isinstance(message, dict) else message
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    return count_tokens(content, model_id) + MESSAGE_OVERHEAD_TOKENS
+
+def is_summary(message: Any) -> bool:
+    """Whether a context message is a rolling summary of older messages."""
+    return isinstance(message, dict) and bool((message.get("metadata") or {}).get("summary"))
+
+def pack_messages(messages: List[Any], model_id: Optional[str], token_budget: int,
+                  max_messages: Optional[int] = None) -> Tuple[List[Any], List[Any]]:
+    """Split messages into the most recent ones that fit a token budget and the older rest.
+    
+    Messages are kept contiguously from the newest backwards, so the split only
+    moves forward as a conversation grows. At most ``max_messages`` are kept if given.
+    
+    Returns:
+        (kept, overflow), both oldest first
+    """
+    used = 0
+    start = len(messages)
+    min_start = len(messages) - max_messages if max_messages is not None else 0
+    while start > max(0, min_start):
+        tokens = message_tokens(messages[start - 1], model_id)
+        if used + tokens > token_budget:
+            break
+        used += tokens
+        start -= 1
+    return messages[start:], messages[:start]
+
+def message_key(message: Any) -> str:
+    """Stable identity of a context message, from its ID when the backend provides one."""
+    if isinstance(message, dict):
+        metadata = message.get("metadata") or {}
+        identity = [metadata.get("message_id"), message.get("role"), message.get("content"), message.get("timestamp")]
+    else:
+        identity = [None, None, str(message), None]
+    return hashlib.sha256(json.dumps(identity, default=str).encode()).hexdigest()
+
+class RollingSummaryCache:
+    """
+    LRU cache of conversation summaries, keyed by the last message each one covers.
+    
+    A summary is only extended with the messages that fell out of the window since
+    it was made, so each message is summarized once however long the conversation gets.
+    """
+    
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max(1, max_entries)
+        # (summary model, key of the last summarized message) -> (summary, summarized message count)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, int]]" = OrderedDict()
+        self.hits = 0
+        self.extensions = 0
+        self.misses = 0
+    
+    def find(self, model_id: str, overflow: List[Any]) -> Tuple[Optional[Tuple[str, int]], List[Any]]:
+        """Find the latest cached summary within the overflow.
+        
+        Returns:
+            (summary entry or None, overflow messages it does not cover yet)
+        """
+        for index in range(len(overflow) - 1, -1, -1):
+            key = (model_id, message_key(overflow[index]))
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry, overflow[index + 1:]
+        return None, overflow
+    
+    def put(self, model_id: str, last_message: Any, summary: str, message_count: int):
+        """Store the summary covering messages up to and including last_message."""
+        key = (model_id, message_key(last_message))
+        self._entries[key] = (summary, message_count)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    async def summarize(self, overflow: List[Any], model_id: str, config: Dict[str, Any],
+                        max_tokens: int) -> Optional[Dict[str, Any]]:
+        """Get the summary of the messages that no longer fit the context window.
+        
+        Args:
+            overflow: Messages older than the packed window, oldest first
+            model_id: Bedrock model ID used to write the summary
+            config: Executor configuration with the AWS credentials
+            max_tokens: Maximum length of the summary
+        
+        Returns:
+            A system message holding the summary, or None if it could not be generated
+        """
+        if not overflow:
+            return None
+        
+        entry, new_messages = self.find(model_id, overflow)
+        if entry is not None and not new_messages:
+            self.hits += 1
+            summary, message_count = entry
+        else:
+            if entry is not None:
+                self.extensions += 1
+            else:
+                self.misses += 1
+            previous, previous_count = entry if entry is not None else (None, 0)
+            prompt = _SUMMARY_PROMPT.format(
+                previous=f"Current summary:\n{previous}\n\n" if previous else "",
+                messages="\n".join(self._format_message(message) for message in new_messages)
+            )
+            
+            try:
+                bedrock_service = BedrockService(
+                    region_name=config.get("aws_region", "us-west-2"),
+                    aws_access_key_id=config.get("aws_access_key_id"),
+                    aws_secret_access_key=config.get("aws_secret_access_key"),
+                    model_id=model_id
+                )
+                summary = (await bedrock_service.generate_text(prompt=prompt, temperature=0.2, max_tokens=max_tokens)).strip()
+            except Exception as e:
+                logger.warning(f"Could not summarize {len(new_messages)} context messages: {str(e)}")
+                summary = ""
+            if not summary:
+                return None
+            
+            message_count = previous_count + len(new_messages)
+            self.put(model_id, overflow[-1], summary, message_count)
+        
+        last_message = overflow[-1]
+        return {
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{summary}",
+            "timestamp": last_message.get("timestamp") if isinstance(last_message, dict) else None,
+            "metadata": {"summary": True, "summarized_messages": message_count}
+        }
+    
+    @staticmethod
+    def _format_message(message: Any) -> str:
+        if isinstance(message, dict):
+            content = message.get("content", "")
+            if not isinstance(content, str):
+                content = json.dumps(content, default=str)
+            return f"{message.get('role', 'unknown')}: {content[:_SUMMARY_MESSAGE_CHARS]}"
+        return str(message)[:_SUMMARY_MESSAGE_CHARS]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss metrics for the cache."""
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "extensions": self.extensions,
+            "misses": self.misses
+        }
+
+_summary_cache: Optional[RollingSummaryCache] = None
+
+def get_summary_cache() -> RollingSummaryCache:
+    """Get the process-wide rolling summary cache configured from settings."""
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache = RollingSummaryCache(max_entries=settings.context_summary_cache_size)
+    return _summary_cache
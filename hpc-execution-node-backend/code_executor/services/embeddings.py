@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import settings
+from utils.logger import logger
+
+def normalize_text(text: str) -> str:
+    """Normalize text for cache lookups by trimming and collapsing whitespace."""
+    return re.sub(r"\s+", " ", text).strip()
+
+def embedding_cache_key(model_id: str, text: str) -> str:
+    """Content-addressed cache key for an embedding of a text by a model."""
+    return hashlib.sha256(f"{model_id}\x00{normalize_text(text)}".encode()).hexdigest()
+
+class DiskEmbeddingStore:
+    """
+    Append-only on-disk store of float32 embedding vectors.
+    
+    Vectors of each dimension live in one flat ``vectors_<dim>.f32`` file that is
+    memory-mapped for reads; ``index.jsonl`` maps cache keys to rows in those files.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, "index.jsonl")
+        self._index: Dict[str, Tuple[int, int, int]] = {}  # key -> (dimension, row, token_count)
+        self._row_counts: Dict[int, int] = {}
+        self._maps: Dict[int, np.memmap] = {}
+        self._lock = threading.Lock()
+        self._load_index()
+    
+    def _vectors_path(self, dimension: int) -> str:
+        return os.path.join(self.directory, f"vectors_{dimension}.f32")
+    
+    def _load_index(self):
+        """Load the key index, ignoring entries whose vectors were never fully written."""
+        for filename in os.listdir(self.directory):
+            match = re.fullmatch(r"vectors_(\d+)\.f32", filename)
+            if match:
+                dimension = int(match.group(1))
+                path = self._vectors_path(dimension)
+                rows = os.path.getsize(path) // (4 * dimension)
+                # Drop a partially written trailing vector so appends stay row-aligned
+                os.truncate(path, rows * 4 * dimension)
+                self._row_counts[dimension] = rows
+        
+        if not os.path.exists(self._index_path):
+            return
+        
+        with open(self._index_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry["row"] < self._row_counts.get(entry["dimension"], 0):
+                    self._index[entry["key"]] = (entry["dimension"], entry["row"], entry.get("token_count", 0))
+        
+        logger.info(f"Loaded {len(self._index)} cached embeddings from {self.directory}")
+    
+    def _get_map(self, dimension: int) -> Optional[np.memmap]:
+        """Get a read-only memory map of the vectors file, remapping after appends."""
+        rows = self._row_counts.get(dimension, 0)
+        if rows == 0:
+            return None
+        vectors = self._maps.get(dimension)
+        if vectors is None or vectors.shape[0] != rows:
+            vectors = np.memmap(self._vectors_path(dimension), dtype=np.float32, mode="r", shape=(rows, dimension))
+            self._maps[dimension] = vectors
+        return vectors
+    
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, int]]:
+        """Get a vector and its token count, or None if not stored."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            dimension, row, token_count = entry
+            vectors = self._get_map(dimension)
+            if vectors is None:
+                return None
+            return np.array(vectors[row]), token_count
+    
+    def put(self, key: str, vector: np.ndarray, token_count: int = 0):
+        """Append a vector to the store."""
+        vector = np.asarray(vector, dtype=np.float32)
+        dimension = int(vector.shape[0])
+        with self._lock:
+            if key in self._index:
+                return
+            row = self._row_counts.get(dimension, 0)
+            # Vectors are written before the index so a crash never indexes a missing row
+            with open(self._vectors_path(dimension), "ab") as f:
+                f.write(vector.tobytes())
+            with open(self._index_path, "a") as f:
+                f.write(json.dumps({"key": key, "dimension": dimension, "row": row, "token_count": token_count}) + "\n")
+            self._row_counts[dimension] = row + 1
+            self._index[key] = (dimension, row, token_count)
+    
+    def __len__(self) -> int:
+        return len(self._index)
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-memory LRU in front of an optional disk store."""
+    
+    def __init__(self, max_entries: int = 10000, disk_store: Optional[DiskEmbeddingStore] = None):
+        self.max_entries = max(0, max_entries)
+        self.disk_store = disk_store
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, int]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+    
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, int]]:
+        """Get a cached (vector, token_count), promoting disk hits into memory."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        
+        if self.disk_store is not None:
+            entry = self.disk_store.get(key)
+            if entry is not None:
+                self.disk_hits += 1
+                self._remember(key, entry)
+                return entry
+        
+        self.misses += 1
+        return None
+    
+    def put(self, key: str, vector: List[float], token_count: int = 0):
+        """Store an embedding in memory and, if configured, on disk."""
+        entry = (np.asarray(vector, dtype=np.float32), token_count)
+        self._remember(key, entry)
+        if self.disk_store is not None:
+            self.disk_store.put(key, entry[0], token_count)
+    
+    def _remember(self, key: str, entry: Tuple[np.ndarray, int]):
+        if self.max_entries == 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss metrics for the cache."""
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_size": len(self.disk_store) if self.disk_store is not None else 0,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses
+        }
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the process-wide embedding cache configured from settings."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        disk_store = DiskEmbeddingStore(settings.embedding_cache_dir) if settings.embedding_cache_dir else None
+        _embedding_cache = EmbeddingCache(max_entries=settings.embedding_cache_size, disk_store=disk_store)
+    return _embedding_cache
+
+class TitanEmbeddingService:
+    """Generate Titan text embeddings with caching and bounded parallelism."""
+    
+    def __init__(self, client, model_id: str = "amazon.titan-embed-text-v2:0",
+                 cache: Optional[EmbeddingCache] = None,
+                 max_concurrency: Optional[int] = None):
+        """
+        Initialize the embedding service.
+        
+        Args:
+            client: bedrock-runtime client
+            model_id: Titan embedding model ID
+            cache: Embedding cache (defaults to the process-wide cache)
+            max_concurrency: Maximum concurrent invoke_model calls (defaults to settings)
+        """
+        self.client = client
+        self.model_id = model_id
+        self.cache = cache if cache is not None else get_embedding_cache()
+        self.max_concurrency = max(1, max_concurrency or settings.embedding_max_concurrency)
+    
+    def _invoke(self, text: str) -> Tuple[List[float], int]:
+        """Blocking invoke_model call for a single text."""
+        response = self.client.invoke_model(
+            modelId=self.model_id,
+            body=json.dumps({"inputText": text}),
+            contentType="application/json",
+            accept="application/json"
+        )
+        response_body = json.loads(response['body'].read())
+        return response_body.get("embedding", []), response_body.get("inputTextTokenCount", 0)
+    
+    async def embed(self, text: str) -> Tuple[List[float], int]:
+        """Embed a single text, returning (embedding, token_count)."""
+        return (await self.embed_many([text]))[0]
+    
+    async def embed_many(self, texts: List[str]) -> List[Tuple[List[float], int]]:
+        """
+        Embed a list of texts, returning (embedding, token_count) per text in order.
+        
+        Duplicate texts and cached texts are only sent to Bedrock once.
+        """
+        keys = [embedding_cache_key(self.model_id, text) for text in texts]
+        results: Dict[str, Tuple[List[float], int]] = {}
+        missing: Dict[str, str] = {}
+        
+        for key, text in zip(keys, texts):
+            if key in results or key in missing:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[key] = (cached[0].tolist(), cached[1])
+            else:
+                missing[key] = text
+        
+        if missing:
+            logger.info(f"Embedding {len(missing)} of {len(texts)} texts with {self.model_id} "
+                        f"({len(texts) - len(missing)} served from cache or duplicates)")
+            loop = asyncio.get_event_loop()
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            
+            async def embed_missing(key: str, text: str):
+                async with semaphore:
+                    embedding, token_count = await loop.run_in_executor(None, self._invoke, text)
+                self.cache.put(key, embedding, token_count)
+                results[key] = (embedding, token_count)
+            
+            await asyncio.gather(*(embed_missing(key, text) for key, text in missing.items()))
+        
+        return [results[key] for key in keys]
@@ -3,6 +3,7 @@ import asyncio
 from typing import Any, AsyncGenerator, Dict
 
 from .base import BaseModel
+from .stream_bridge import iterate_blocking_stream
 
 class GeneralModel(BaseModel):
     """General model for interacting with other models on AWS Bedrock."""
@@ -58,7 +59,7 @@ class GeneralModel(BaseModel):
             yield ""
             return
         
-        for event in stream:
+        async for event in iterate_blocking_stream(stream):
             if 'chunk' in event:
                 chunk_bytes = event['chunk']['bytes']
                 chunk_data = json.loads(chunk_bytes)
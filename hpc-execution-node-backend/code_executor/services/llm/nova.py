@@ -1,8 +1,11 @@
 """Nova model implementation for AWS Bedrock."""
 
 from typing import Any, AsyncGenerator, Dict
+import asyncio
 import json
 
+from .stream_bridge import iterate_blocking_stream
+
 class NovaModel:
     """Nova model implementation using Converse API."""
     
@@ -14,18 +17,22 @@ class NovaModel:
         """Generate text using Nova model with Converse API."""
         
         # Use Converse API for Nova models
-        response = self.client.converse(
-            modelId=self.model_id,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [{"text": prompt}]
+        loop = asyncio.get_event_loop()
+        response = await loop.run_in_executor(
+            None,
+            lambda: self.client.converse(
+                modelId=self.model_id,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [{"text": prompt}]
+                    }
+                ],
+                inferenceConfig={
+                    "maxTokens": max_tokens,
+                    "temperature": temperature
                 }
-            ],
-            inferenceConfig={
-                "maxTokens": max_tokens,
-                "temperature": temperature
-            }
+            )
         )
         
         # Extract text from response
@@ -35,22 +42,26 @@ class NovaModel:
         """Generate text with streaming using Nova model with ConverseStream API."""
         
         # Use ConverseStream API for Nova models
-        response = self.client.converse_stream(
-            modelId=self.model_id,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [{"text": prompt}]
+        loop = asyncio.get_event_loop()
+        response = await loop.run_in_executor(
+            None,
+            lambda: self.client.converse_stream(
+                modelId=self.model_id,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [{"text": prompt}]
+                    }
+                ],
+                inferenceConfig={
+                    "maxTokens": max_tokens,
+                    "temperature": temperature
                 }
-            ],
-            inferenceConfig={
-                "maxTokens": max_tokens,
-                "temperature": temperature
-            }
+            )
         )
         
         # Stream the response
-        for event in response["stream"]:
+        async for event in iterate_blocking_stream(response["stream"]):
             if "contentBlockDelta" in event:
                 delta = event["contentBlockDelta"]["delta"]
                 if "text" in delta:
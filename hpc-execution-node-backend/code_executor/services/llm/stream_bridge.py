@@ -0,0 +1,111 @@
+"""Bridge blocking boto3 event streams onto the asyncio event loop."""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Iterable, Optional
+
+from config import settings
+from utils.logger import logger
+
+# Maximum number of events read ahead of the consumer
+DEFAULT_STREAM_BUFFER_SIZE = 64
+
+# How often a worker blocked on a full buffer re-checks for cancellation (seconds)
+_SLOT_POLL_INTERVAL = 0.1
+
+_EVENT = "event"
+_ERROR = "error"
+_DONE = "done"
+
+# Stream pumps hold their thread for a whole generation, so they get their own pool
+# instead of starving the default executor used by other blocking Bedrock calls
+_stream_executor: Optional[ThreadPoolExecutor] = None
+_stream_executor_lock = threading.Lock()
+
+
+def get_stream_executor() -> ThreadPoolExecutor:
+    """Get the process-wide thread pool that pumps model streams."""
+    global _stream_executor
+    if _stream_executor is None:
+        with _stream_executor_lock:
+            if _stream_executor is None:
+                _stream_executor = ThreadPoolExecutor(max_workers=max(1, settings.bedrock_stream_threads),
+                                                      thread_name_prefix="bedrock-stream")
+    return _stream_executor
+
+
+def close_stream_executor():
+    """Stop the stream thread pool; called on application shutdown."""
+    global _stream_executor
+    with _stream_executor_lock:
+        if _stream_executor is not None:
+            _stream_executor.shutdown(wait=False, cancel_futures=True)
+            _stream_executor = None
+
+
+async def iterate_blocking_stream(stream: Iterable[Any],
+                                  max_buffer: int = DEFAULT_STREAM_BUFFER_SIZE) -> AsyncGenerator[Any, None]:
+    """
+    Iterate a blocking stream (e.g. a botocore EventStream) without blocking the event loop.
+    
+    A thread of the stream pool pumps events into an asyncio.Queue; once all
+    ``BEDROCK_STREAM_THREADS`` threads are busy, new streams wait for a free one. At most ``max_buffer`` events are
+    read ahead of the consumer; when the consumer stops early (closed generator, cancelled
+    task, disconnected client) the worker stops reading and the stream is closed.
+    
+    Args:
+        stream: Blocking iterable of events
+        max_buffer: Maximum number of buffered events
+    
+    Yields:
+        Events from the stream, in order
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(max(1, max_buffer))
+    stop = threading.Event()
+    
+    def deliver(kind: str, payload: Any = None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (kind, payload))
+        except RuntimeError:
+            # Event loop already closed; nobody is listening anymore
+            stop.set()
+    
+    def pump():
+        try:
+            for event in stream:
+                while not slots.acquire(timeout=_SLOT_POLL_INTERVAL):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                deliver(_EVENT, event)
+        except Exception as e:
+            if not stop.is_set():
+                deliver(_ERROR, e)
+            return
+        deliver(_DONE)
+    
+    worker = loop.run_in_executor(get_stream_executor(), pump)
+    
+    try:
+        while True:
+            kind, payload = await queue.get()
+            if kind == _DONE:
+                break
+            if kind == _ERROR:
+                raise payload
+            slots.release()
+            yield payload
+    finally:
+        stop.set()
+        if not worker.done():
+            # Closing the underlying response unblocks a worker waiting on the network
+            close = getattr(stream, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    logger.debug(f"Error closing event stream: {str(e)}")
@@ -0,0 +1,227 @@
+import copy
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple
+
+from config import settings
+from utils.logger import logger
+
+_REDIS_KEY_PREFIX = "llm_cache:"
+
+def llm_cache_key(kind: str, provider: str, model_id: str, prompt: str, temperature: float,
+                  max_tokens: int, output_schema: Optional[Dict[str, Any]] = None) -> str:
+    """Content-addressed cache key of an LLM call and every parameter that changes its answer."""
+    identity = [kind, provider, model_id, prompt, float(temperature), int(max_tokens), output_schema]
+    return hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()
+
+class LLMResponseCache:
+    """
+    Two-tier LLM response cache: in-memory LRU in front of an optional Redis tier.
+    
+    The Redis tier is shared by every node using the same Redis, so a response
+    generated once is reused across processes; its errors are logged and treated
+    as misses so the cache can never fail a generation.
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 redis_url: Optional[str] = None, redis_ttl_seconds: int = 86400,
+                 redis_timeout_seconds: float = 0.5):
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.redis_url = redis_url
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self.redis_timeout_seconds = redis_timeout_seconds
+        self._redis = None
+        # key -> (expires_at, response)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+    
+    def _get_redis(self):
+        if self._redis is None and self.redis_url:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                logger.warning("LLM_CACHE_REDIS_URL is set but the redis package is not installed")
+                self.redis_url = None
+                return None
+            # A slow Redis must not hold up generation longer than calling the model would
+            self._redis = redis.Redis.from_url(self.redis_url,
+                                               socket_timeout=self.redis_timeout_seconds,
+                                               socket_connect_timeout=self.redis_timeout_seconds)
+        return self._redis
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached response, promoting Redis hits into memory."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] >= time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+        
+        client = self._get_redis()
+        if client is not None:
+            try:
+                data = await client.get(_REDIS_KEY_PREFIX + key)
+                response = json.loads(data) if data is not None else None
+            except Exception as e:
+                logger.warning(f"LLM cache Redis read failed: {str(e)}")
+                response = None
+            if response is not None:
+                self.redis_hits += 1
+                self._remember(key, response)
+                return response
+        
+        self.misses += 1
+        return None
+    
+    async def put(self, key: str, response: Dict[str, Any]):
+        """Store a response in memory and, if configured, in Redis."""
+        self._remember(key, response)
+        client = self._get_redis()
+        if client is not None:
+            try:
+                await client.set(_REDIS_KEY_PREFIX + key, json.dumps(response), ex=self.redis_ttl_seconds)
+            except Exception as e:
+                logger.warning(f"LLM cache Redis write failed: {str(e)}")
+    
+    def _remember(self, key: str, response: Dict[str, Any]):
+        if self.max_entries == 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss metrics for the cache."""
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "redis": bool(self.redis_url),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses
+        }
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+def get_llm_cache() -> LLMResponseCache:
+    """Get the process-wide LLM response cache configured from settings."""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMResponseCache(
+            max_entries=settings.llm_cache_size,
+            ttl_seconds=settings.llm_cache_ttl_seconds,
+            redis_url=settings.llm_cache_redis_url,
+            redis_ttl_seconds=settings.llm_cache_redis_ttl_seconds,
+            redis_timeout_seconds=settings.llm_cache_redis_timeout_seconds
+        )
+    return _llm_cache
+
+class CachedLLMService:
+    """
+    Wrapper of a BedrockService or AkashService that answers repeated calls from the response cache.
+    
+    Only calls with temperature 0 are cached, unless the flow opts in to caching
+    sampled responses too. A streamed response is stored as the chunks it arrived
+    in and replayed chunk by chunk, so streaming clients see the same events.
+    """
+    
+    def __init__(self, service, cache: LLMResponseCache, cache_sampled: bool = False):
+        self.service = service
+        self.model_id = service.model_id
+        self.cache = cache
+        self.cache_sampled = cache_sampled
+        self._provider = type(service).__name__
+    
+    def _key(self, kind: str, prompt: str, temperature: float, max_tokens: int,
+             output_schema: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        if not self.cache_sampled and temperature != 0:
+            return None
+        return llm_cache_key(kind, self._provider, self.model_id, prompt, temperature, max_tokens, output_schema)
+    
+    async def generate_text(self,
+                          prompt: str,
+                          temperature: float = 0.7,
+                          max_tokens: int = 1000) -> str:
+        """Generate text from the model (non-streaming), or return the cached text."""
+        key = self._key("text", prompt, temperature, max_tokens)
+        if key is None:
+            return await self.service.generate_text(prompt, temperature, max_tokens)
+        
+        response = await self.cache.get(key)
+        if response is not None:
+            return "".join(response["chunks"])
+        
+        text = await self.service.generate_text(prompt, temperature, max_tokens)
+        if text:
+            await self.cache.put(key, {"chunks": [text]})
+        return text
+    
+    async def generate_text_stream(self,
+                                 prompt: str,
+                                 temperature: float = 0.7,
+                                 max_tokens: int = 1000) -> AsyncGenerator[str, None]:
+        """Generate text from the model with streaming, or replay the cached chunks."""
+        key = self._key("text", prompt, temperature, max_tokens)
+        if key is None:
+            async for chunk in self.service.generate_text_stream(prompt, temperature, max_tokens):
+                yield chunk
+            return
+        
+        response = await self.cache.get(key)
+        if response is not None:
+            for chunk in response["chunks"]:
+                yield chunk
+            return
+        
+        # Only a stream read to the end is stored; an interrupted one never reaches put()
+        chunks = []
+        async for chunk in self.service.generate_text_stream(prompt, temperature, max_tokens):
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            await self.cache.put(key, {"chunks": chunks})
+    
+    async def generate_structured_output(self,
+                                       prompt: str,
+                                       output_schema: Dict[str, Any],
+                                       temperature: float = 0.3,
+                                       max_tokens: int = 1000) -> Dict[str, Any]:
+        """Generate structured output according to a schema, or return the cached output."""
+        key = self._key("structured", prompt, temperature, max_tokens, output_schema)
+        if key is None:
+            return await self.service.generate_structured_output(prompt, output_schema, temperature, max_tokens)
+        
+        response = await self.cache.get(key)
+        if response is not None:
+            # Cached outputs are shared, so callers get their own copy to modify
+            return copy.deepcopy(response["output"])
+        
+        output = await self.service.generate_structured_output(prompt, output_schema, temperature, max_tokens)
+        # Unparseable answers are reported as {"error": ..., "raw_response": ...}; retrying may do better
+        if not (isinstance(output, dict) and "error" in output):
+            await self.cache.put(key, {"output": copy.deepcopy(output)})
+        return output
+
+def with_response_cache(service, config: Dict[str, Any]):
+    """Put the response cache in front of an LLM service if caching is enabled.
+    
+    Args:
+        service: BedrockService or AkashService
+        config: Executor configuration; ``enable_llm_caching`` turns the cache on and
+                ``cache_llm_responses`` makes a flow cache calls with temperature above 0
+    
+    Returns:
+        The service, or a CachedLLMService wrapping it
+    """
+    if not config.get("enable_llm_caching"):
+        return service
+    return CachedLLMService(service, get_llm_cache(), cache_sampled=bool(config.get("cache_llm_responses")))
@@ -0,0 +1,440 @@
+# services/sandbox.py
+import asyncio
+import base64
+import collections
+import datetime
+import hashlib
+import itertools
+import json
+import marshal
+import math
+import multiprocessing
+import re
+import resource
+import signal
+import statistics
+import threading
+import urllib.parse
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+from RestrictedPython import compile_restricted, safe_globals, safe_builtins
+
+from config import settings
+from utils.logger import logger
+
+_MB = 1024 * 1024
+
+# Builtins and modules exposed to custom code, as per documentation
+_SAFE_FUNCTIONS = [
+    abs, min, max, sum, round, len, sorted, range, list, dict, set, tuple,
+    str, int, float, bool, enumerate, zip, map, filter, all, any, isinstance, type
+]
+_SAFE_MODULES = {
+    "math": math,
+    "statistics": statistics,
+    "json": json,
+    "datetime": datetime,
+    "re": re,
+    "collections": collections,
+    "itertools": itertools,
+    "hashlib": hashlib,
+    "base64": base64,
+    "urllib": {"parse": urllib.parse}  # Only URL parsing
+}
+
+def build_restricted_globals() -> Dict[str, Any]:
+    """Build the RestrictedPython globals shared by every run in a worker."""
+    restricted_globals = safe_globals.copy()
+    restricted_globals["__builtins__"] = safe_builtins
+    restricted_globals["_getiter_"] = iter  # For list comprehensions
+    restricted_globals["_iter_unpack_sequence_"] = iter  # For unpacking
+    for function in _SAFE_FUNCTIONS:
+        restricted_globals[function.__name__] = function
+    restricted_globals.update(_SAFE_MODULES)
+    return restricted_globals
+
+class CompiledCodeCache:
+    """
+    Bounded LRU cache of RestrictedPython code objects keyed by a hash of the source.
+    
+    Entries hold marshalled bytecode so they can be sent to sandbox workers as-is.
+    """
+    
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def compile(self, source: str) -> Tuple[str, bytes]:
+        """
+        Get the compiled bytecode for restricted source code, compiling it on a miss.
+        
+        Returns:
+            Tuple of (source hash, marshalled code object)
+        
+        Raises:
+            ValueError: If the code does not compile under RestrictedPython
+        """
+        code_hash = hashlib.sha256(source.encode()).hexdigest()
+        with self._lock:
+            bytecode = self._entries.get(code_hash)
+            if bytecode is not None:
+                self._entries.move_to_end(code_hash)
+                self.hits += 1
+                return code_hash, bytecode
+            self.misses += 1
+        
+        try:
+            compiled = compile_restricted(source, '<inline>', 'exec')
+        except SyntaxError as e:
+            raise ValueError(f"Code compilation errors: {str(e)}")
+        if hasattr(compiled, 'errors') and compiled.errors:
+            raise ValueError(f"Code compilation errors: {compiled.errors}")
+        bytecode = marshal.dumps(compiled)
+        
+        with self._lock:
+            self._entries[code_hash] = bytecode
+            self._entries.move_to_end(code_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return code_hash, bytecode
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+_code_cache: Optional[CompiledCodeCache] = None
+
+def get_code_cache() -> CompiledCodeCache:
+    """Get the process-wide compiled code cache."""
+    global _code_cache
+    if _code_cache is None:
+        _code_cache = CompiledCodeCache(max_entries=settings.custom_code_cache_size)
+    return _code_cache
+
+def _apply_memory_limit(max_memory_mb: int):
+    """Cap the worker's address space at its current size plus max_memory_mb."""
+    baseline = psutil.Process().memory_info().vms
+    limit = baseline + max_memory_mb * _MB
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+def _apply_cpu_limit(max_cpu_seconds: int):
+    """Allow the next run max_cpu_seconds of CPU time on top of what the worker already used."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    limit = int(math.ceil(usage.ru_utime + usage.ru_stime)) + max(1, int(max_cpu_seconds))
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+def _run_job(job: Dict[str, Any], base_globals: Dict[str, Any], code_objects: "OrderedDict",
+             max_code_objects: int, max_memory_mb: int) -> Dict[str, Any]:
+    """Execute one job inside a worker process."""
+    # Collect print outputs
+    printed_lines: List[str] = []
+    
+    def safe_print(*args, **kwargs):
+        """Capture print statements for debugging."""
+        printed_lines.append(' '.join(str(arg) for arg in args))
+    
+    restricted_globals = dict(base_globals)
+    restricted_globals["_print_"] = safe_print  # Capture prints
+    restricted_globals["print"] = safe_print  # Direct print access
+    
+    local_vars = {
+        "inputs": job["inputs"],
+        "output": {},
+        "parameters": {
+            "hyperparameters": job["hyperparameters"],
+            "constants": job["constants"]
+        }
+    }
+    
+    _apply_cpu_limit(job["max_cpu_seconds"])
+    try:
+        # Code objects are unmarshalled once per worker; the parent only sends bytecode
+        # for hashes this worker has not seen (or has evicted)
+        code_hash = job["code_hash"]
+        if job.get("bytecode") is not None:
+            code_objects[code_hash] = marshal.loads(job["bytecode"])
+        compiled = code_objects.get(code_hash)
+        if compiled is None:
+            raise ValueError("Compiled code is not available in the sandbox worker")
+        code_objects.move_to_end(code_hash)
+        while len(code_objects) > max_code_objects:
+            code_objects.popitem(last=False)
+        
+        # Execute the compiled code
+        exec(compiled, restricted_globals, local_vars)
+        
+        result = {
+            "status": "success",
+            "output": local_vars.get("output", {})
+        }
+        if printed_lines:
+            result["prints"] = printed_lines
+        return result
+    except MemoryError:
+        return {
+            "status": "error",
+            "message": f"Memory limit exceeded ({max_memory_mb} MB)",
+            "output": {},
+            "recycle": True
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Execution failed: {str(e)}",
+            "output": {}
+        }
+
+def _worker_main(conn, max_memory_mb: int, max_code_objects: int):
+    """Worker process loop: receive jobs over the pipe and send back results."""
+    # Shutdown is driven by the parent closing the pipe, not by terminal signals
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    
+    _apply_memory_limit(max_memory_mb)
+    base_globals = build_restricted_globals()
+    code_objects: "OrderedDict[str, Any]" = OrderedDict()
+    
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        
+        result = _run_job(job, base_globals, code_objects, max_code_objects, max_memory_mb)
+        try:
+            conn.send(result)
+        except MemoryError:
+            conn.send({"status": "error", "message": f"Memory limit exceeded ({max_memory_mb} MB)",
+                       "output": {}, "recycle": True})
+        except Exception as e:
+            conn.send({"status": "error", "message": f"Output is not serializable: {str(e)}", "output": {}})
+
+class SandboxWorker:
+    """Parent-side handle to one warm sandbox process."""
+    
+    def __init__(self, context, max_memory_mb: int, max_code_objects: int):
+        self.conn, child_conn = context.Pipe(duplex=True)
+        self.process = context.Process(target=_worker_main, args=(child_conn, max_memory_mb, max_code_objects),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.runs = 0
+        # Mirror of the worker's code object LRU, kept in the same order as the worker's
+        self.max_code_objects = max_code_objects
+        self.known_code: "OrderedDict[str, None]" = OrderedDict()
+    
+    def prepare_job(self, job: Dict[str, Any], bytecode: bytes) -> Dict[str, Any]:
+        """Attach bytecode to a job only if the worker does not already hold the code object."""
+        code_hash = job["code_hash"]
+        job["bytecode"] = None if code_hash in self.known_code else bytecode
+        self.known_code[code_hash] = None
+        self.known_code.move_to_end(code_hash)
+        while len(self.known_code) > self.max_code_objects:
+            self.known_code.popitem(last=False)
+        return job
+    
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+    
+    async def _wait_readable(self, timeout: float):
+        """Wait until the worker has written to the pipe without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        fd = self.conn.fileno()
+        loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        try:
+            await asyncio.wait_for(readable, timeout)
+        finally:
+            loop.remove_reader(fd)
+    
+    async def run(self, job: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """Send a job to the worker and wait for its result."""
+        self.runs += 1
+        # Large inputs fill the pipe buffer, so the blocking send runs off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self.conn.send, job)
+        await self._wait_readable(timeout)
+        return self.conn.recv()
+    
+    def close(self, kill: bool = False):
+        """Stop the worker process; a busy worker (kill=True) is killed right away."""
+        if not kill:
+            try:
+                self.conn.send(None)
+            except Exception:
+                pass
+        self.conn.close()
+        if not kill:
+            self.process.join(timeout=0.5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=0.5)
+
+class SandboxPool:
+    """
+    Pool of warm sandbox processes for custom code.
+    
+    Workers keep the restricted globals loaded and run under an RLIMIT_AS memory cap;
+    each run gets an RLIMIT_CPU budget. A worker is recycled after ``max_runs_per_worker``
+    runs, on a limit violation or on a timeout.
+    """
+    
+    def __init__(self, size: int, max_memory_mb: int, max_runs_per_worker: int,
+                 code_cache: Optional[CompiledCodeCache] = None):
+        self.size = max(1, size)
+        self.max_memory_mb = max_memory_mb
+        self.max_runs_per_worker = max(1, max_runs_per_worker)
+        self.code_cache = code_cache or get_code_cache()
+        self.max_code_objects = self.code_cache.max_entries
+        # Workers come from a single-threaded fork server, so they inherit neither this process's
+        # sockets nor locks held by its threads. It preloads the main module once, so workers do not
+        # re-import it, and this module, so they start with RestrictedPython imported
+        self._context = multiprocessing.get_context("forkserver")
+        self._context.set_forkserver_preload(["__main__", __name__])
+        self._idle: List[SandboxWorker] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.recycled = 0
+    
+    def _new_worker(self) -> SandboxWorker:
+        return SandboxWorker(self._context, self.max_memory_mb, self.max_code_objects)
+    
+    def start(self):
+        """Start idle workers up to the pool size."""
+        while len(self._idle) < self.size:
+            self._idle.append(self._new_worker())
+        logger.info(f"Started sandbox pool with {len(self._idle)} workers (max_memory_mb={self.max_memory_mb})")
+    
+    def _retire_worker(self, worker: SandboxWorker, kill: bool = False):
+        """Stop a worker in the background; joining it can take up to a second."""
+        asyncio.get_running_loop().run_in_executor(None, worker.close, kill)
+    
+    async def _acquire_worker(self) -> SandboxWorker:
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.is_alive():
+                return worker
+            self._retire_worker(worker)
+        return await asyncio.get_running_loop().run_in_executor(None, self._new_worker)
+    
+    async def _release_worker(self, worker: SandboxWorker, recycle: bool, busy: bool = False):
+        if recycle or busy or worker.runs >= self.max_runs_per_worker or not worker.is_alive():
+            self._retire_worker(worker, kill=busy)
+            self.recycled += 1
+            # Keep the pool warm for the next run
+            worker = await asyncio.get_running_loop().run_in_executor(None, self._new_worker)
+        self._idle.append(worker)
+    
+    async def run(self, code: str, inputs: Dict[str, Any], hyperparameters: Dict[str, Any],
+                  constants: Dict[str, Any], max_cpu_seconds: int) -> Dict[str, Any]:
+        """
+        Execute custom code in a pooled worker.
+        
+        Args:
+            code: Custom Python code
+            inputs: Input data dictionary
+            hyperparameters: Hyperparameters dictionary
+            constants: Constants dictionary
+            max_cpu_seconds: CPU time limit, also used as the wall-clock timeout
+        
+        Returns:
+            Dict with status and output or error message
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        
+        try:
+            code_hash, bytecode = self.code_cache.compile(code)
+        except ValueError as e:
+            return {"status": "error", "message": f"Execution failed: {str(e)}", "output": {}}
+        
+        job = {
+            "code_hash": code_hash,
+            "inputs": inputs,
+            "hyperparameters": hyperparameters,
+            "constants": constants,
+            "max_cpu_seconds": max_cpu_seconds
+        }
+        
+        async with self._slots:
+            worker = await self._acquire_worker()
+            recycle = True
+            # Until a result arrives the worker may still be running user code
+            busy = True
+            try:
+                result = await worker.run(worker.prepare_job(job, bytecode), timeout=max_cpu_seconds)
+                busy = False
+                recycle = result.pop("recycle", False)
+                return result
+            except asyncio.TimeoutError:
+                return {
+                    "status": "error",
+                    "message": f"Time limit exceeded ({max_cpu_seconds} seconds)",
+                    "output": {}
+                }
+            except (EOFError, OSError):
+                await asyncio.get_running_loop().run_in_executor(None, worker.process.join, 0.5)
+                if worker.process.exitcode == -signal.SIGXCPU:
+                    message = f"CPU time limit exceeded ({max_cpu_seconds} seconds)"
+                else:
+                    message = "Process terminated without result"
+                return {"status": "error", "message": message, "output": {}}
+            finally:
+                await self._release_worker(worker, recycle, busy)
+    
+    def close(self):
+        """Stop all idle workers."""
+        while self._idle:
+            self._idle.pop().close()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "recycled": self.recycled,
+            "max_memory_mb": self.max_memory_mb
+        }
+
+# Process-wide pools keyed by memory limit
+_pools: Dict[int, SandboxPool] = {}
+_pools_lock = threading.Lock()
+
+def get_sandbox_pool(max_memory_mb: Optional[int] = None) -> SandboxPool:
+    """Get the shared sandbox pool for a memory limit, creating it on first use."""
+    max_memory_mb = max_memory_mb or settings.custom_code_max_memory_mb
+    pool = _pools.get(max_memory_mb)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(max_memory_mb)
+            if pool is None:
+                pool = SandboxPool(
+                    size=settings.sandbox_pool_size,
+                    max_memory_mb=max_memory_mb,
+                    max_runs_per_worker=settings.sandbox_max_runs_per_worker
+                )
+                _pools[max_memory_mb] = pool
+    return pool
+
+def close_sandbox_pools():
+    """Stop every sandbox worker; called on application shutdown."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -1,11 +1,248 @@
 # services/streaming.py
-import json
 import asyncio
-from typing import Dict, Any, Optional, AsyncGenerator, List
+import weakref
+from collections import deque
+from typing import Dict, Any, Optional, AsyncGenerator, Awaitable, Callable, List, Set, Union
 import websockets
 from abc import ABC, abstractmethod
 from fastapi import WebSocket
+from config import settings
 from utils.logger import logger
+from utils.serialization import get_serializer, as_text
+
+# Overflow policies applied when a stream buffer is full
+OVERFLOW_BLOCK = "block"        # Wait until the consumer makes room
+OVERFLOW_COALESCE = "coalesce"  # Merge into the element's pending chunk event
+OVERFLOW_DROP = "drop"          # Discard the event
+
+# Event types not listed here use OVERFLOW_BLOCK
+DEFAULT_OVERFLOW_POLICIES = {
+    "llm_chunk": OVERFLOW_COALESCE,
+    "processing": OVERFLOW_DROP
+}
+
+# Live buffers and cumulative counters reported by get_stream_metrics()
+_active_buffers: "weakref.WeakSet[StreamBuffer]" = weakref.WeakSet()
+_stream_totals: Dict[str, Any] = {"dropped_events": {}, "coalesced_events": 0, "blocked_sends": 0}
+
+class StreamBuffer:
+    """
+    Bounded per-flow buffer of outgoing stream messages.
+    
+    Events stay as dicts until they are taken from the buffer so a pending llm_chunk
+    event can still absorb later chunks; raw messages are queued as given, either
+    as strings or as pre-encoded UTF-8 JSON bytes.
+    """
+    
+    def __init__(self, max_size: Optional[int] = None,
+                 overflow_policies: Optional[Dict[str, str]] = None):
+        self.max_size = max(1, max_size or settings.stream_buffer_size)
+        self.overflow_policies = DEFAULT_OVERFLOW_POLICIES if overflow_policies is None else overflow_policies
+        # Entries are [event_type, element_id, event dict or None, message or None]
+        self._entries: deque = deque()
+        self._changed = asyncio.Condition()
+        self.closed = False
+        self.max_depth = 0
+        self.dropped: Dict[str, int] = {}
+        self.coalesced = 0
+        self.blocked = 0
+        _active_buffers.add(self)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    async def put_message(self, message: Union[str, bytes]) -> bool:
+        """Queue a pre-serialized message; always uses the block policy."""
+        return await self._put(None, None, None, message)
+    
+    async def put_event(self, event: Dict[str, Any]) -> bool:
+        """Queue an event envelope, applying the overflow policy for its type when full."""
+        data = event.get("data")
+        element_id = data.get("element_id") if isinstance(data, dict) else None
+        return await self._put(event.get("type"), element_id, event, None)
+    
+    async def _put(self, event_type: Optional[str], element_id: Optional[str],
+                   event: Optional[Dict[str, Any]], message: Optional[Union[str, bytes]]) -> bool:
+        if self.closed:
+            return False
+        
+        if len(self._entries) >= self.max_size:
+            policy = self.overflow_policies.get(event_type, OVERFLOW_BLOCK)
+            if policy == OVERFLOW_DROP:
+                self.dropped[event_type] = self.dropped.get(event_type, 0) + 1
+                dropped_events = _stream_totals["dropped_events"]
+                dropped_events[event_type] = dropped_events.get(event_type, 0) + 1
+                return False
+            if policy == OVERFLOW_COALESCE and self._coalesce(event_type, element_id, event):
+                self.coalesced += 1
+                _stream_totals["coalesced_events"] += 1
+                return True
+            
+            self.blocked += 1
+            _stream_totals["blocked_sends"] += 1
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.closed or len(self._entries) < self.max_size)
+            if self.closed:
+                return False
+        
+        self._entries.append([event_type, element_id, event, message])
+        self.max_depth = max(self.max_depth, len(self._entries))
+        async with self._changed:
+            self._changed.notify_all()
+        return True
+    
+    def _coalesce(self, event_type: Optional[str], element_id: Optional[str],
+                  event: Optional[Dict[str, Any]]) -> bool:
+        """Append a chunk to the element's most recent pending event if that is a chunk of the same type."""
+        if event is None or element_id is None:
+            return False
+        for entry in reversed(self._entries):
+            if entry[1] != element_id:
+                continue
+            pending = entry[2]
+            if entry[0] != event_type or pending is None:
+                return False
+            # Copy before merging so the caller's dict is never modified
+            data = dict(pending["data"])
+            data["content"] = f"{data.get('content', '')}{event['data'].get('content', '')}"
+            if "metadata" in event["data"]:
+                data["metadata"] = event["data"]["metadata"]
+            entry[2] = {**pending, "data": data}
+            return True
+        return False
+    
+    async def get(self) -> Optional[str]:
+        """Take the next serialized message, or None once the buffer is closed and drained."""
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._entries or self.closed)
+                if not self._entries:
+                    return None
+                event_type, _, event, message = self._entries.popleft()
+                self._changed.notify_all()
+            if event is None:
+                return as_text(message)
+            try:
+                return get_serializer().dumps(event)
+            except Exception as e:
+                # Skip the event rather than failing the writer, which would abort the whole stream
+                logger.error(f"Dropping unserializable {event_type} event: {str(e)}")
+    
+    async def close(self):
+        """Stop accepting messages; queued messages can still be taken."""
+        self.closed = True
+        async with self._changed:
+            self._changed.notify_all()
+    
+    async def abort(self):
+        """Close the buffer and discard queued messages (the consumer is gone)."""
+        self._entries.clear()
+        await self.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": len(self._entries),
+            "max_queue_depth": self.max_depth,
+            "max_size": self.max_size,
+            "dropped_events": dict(self.dropped),
+            "coalesced_events": self.coalesced,
+            "blocked_sends": self.blocked
+        }
+
+def get_stream_metrics() -> Dict[str, Any]:
+    """Get queue depth and overflow metrics across all open stream buffers."""
+    buffers = [buffer for buffer in list(_active_buffers) if not buffer.closed]
+    return {
+        "active_streams": len(buffers),
+        "queued_messages": sum(len(buffer) for buffer in buffers),
+        "max_queue_depth": max((buffer.max_depth for buffer in buffers), default=0),
+        "buffer_size": settings.stream_buffer_size,
+        "dropped_events": dict(_stream_totals["dropped_events"]),
+        "coalesced_events": _stream_totals["coalesced_events"],
+        "blocked_sends": _stream_totals["blocked_sends"]
+    }
+
+class ChunkCoalescer:
+    """
+    Merge per-token llm_chunk events into fewer, larger chunk events.
+    
+    Content is buffered per element and flushed once it reaches ``max_size`` characters
+    or ``flush_interval_ms`` after its first token. Any other event flushes everything
+    pending first, so chunks never arrive after their element's completion event.
+    """
+    
+    def __init__(self, send_event: Callable[[Dict[str, Any]], Awaitable[bool]],
+                 max_size: Optional[int] = None,
+                 flush_interval_ms: Optional[int] = None):
+        self._send_event = send_event
+        self.max_size = max(1, max_size or settings.streaming_chunk_size)
+        interval_ms = settings.streaming_flush_interval_ms if flush_interval_ms is None else flush_interval_ms
+        self.flush_interval = max(0, interval_ms) / 1000
+        # element_id -> {"event": first chunk envelope, "parts": [content, ...], "size": int, "timer": handle}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._flush_tasks: Set[asyncio.Task] = set()
+        # Serializes flushes with other sends so event order is preserved
+        self._lock = asyncio.Lock()
+        self.chunks_in = 0
+        self.chunks_out = 0
+    
+    async def send(self, event: Dict[str, Any]) -> bool:
+        """Send an event, buffering llm_chunk content."""
+        data = event.get("data")
+        element_id = data.get("element_id") if isinstance(data, dict) else None
+        if event.get("type") != "llm_chunk" or element_id is None:
+            async with self._lock:
+                await self._flush_pending()
+                return await self._send_event(event)
+        
+        self.chunks_in += 1
+        content = str(data.get("content", ""))
+        pending = self._pending.get(element_id)
+        if pending is None:
+            pending = {"event": event, "parts": [], "size": 0, "timer": None}
+            self._pending[element_id] = pending
+            if self.flush_interval > 0:
+                pending["timer"] = asyncio.get_running_loop().call_later(
+                    self.flush_interval, self._schedule_flush, element_id)
+        pending["parts"].append(content)
+        pending["size"] += len(content)
+        if "metadata" in data:
+            pending["metadata"] = data["metadata"]
+        
+        if pending["size"] >= self.max_size or self.flush_interval == 0:
+            async with self._lock:
+                await self._flush_pending(element_id)
+        return True
+    
+    def _schedule_flush(self, element_id: str):
+        task = asyncio.create_task(self._flush_locked(element_id))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+    
+    async def _flush_locked(self, element_id: str):
+        async with self._lock:
+            await self._flush_pending(element_id)
+    
+    async def flush(self):
+        """Send everything that is still buffered."""
+        async with self._lock:
+            await self._flush_pending()
+    
+    async def _flush_pending(self, element_id: Optional[str] = None):
+        element_ids = [element_id] if element_id is not None else list(self._pending)
+        for pending_id in element_ids:
+            pending = self._pending.pop(pending_id, None)
+            if pending is None:
+                continue
+            if pending["timer"] is not None:
+                pending["timer"].cancel()
+            event = pending["event"]
+            data = dict(event["data"])
+            data["content"] = "".join(pending["parts"])
+            if "metadata" in pending:
+                data["metadata"] = pending["metadata"]
+            self.chunks_out += 1
+            await self._send_event({**event, "data": data})
 
 class StreamManager(ABC):
     """Abstract base class for streaming data."""
@@ -21,25 +258,77 @@ class StreamManager(ABC):
         pass
     
     @abstractmethod
-    async def send_message(self, message: str) -> bool:
-        """Send a message through the stream."""
+    async def send_message(self, message: Union[str, bytes]) -> bool:
+        """Send a message (text or pre-encoded UTF-8 JSON bytes) through the stream."""
         pass
     
+    async def send_event(self, event: Dict[str, Any]) -> bool:
+        """Send an event envelope through the stream."""
+        return await self.send_message(get_serializer().dumps(event))
+    
     @abstractmethod
-    async def stream_chunks(self, chunk_generator: AsyncGenerator[str, None], 
+    async def stream_chunks(self, chunk_generator: AsyncGenerator[str, None],
                            metadata: Dict[str, Any] = None):
         """Stream chunks from an async generator with metadata."""
         pass
 
-class WebSocketStreamManager(StreamManager):
+class BufferedStreamManager(StreamManager):
+    """Stream manager whose messages go through a bounded buffer drained by a writer task."""
+    
+    def __init__(self):
+        self.buffer = StreamBuffer()
+        self.writer_task: Optional[asyncio.Task] = None
+    
+    @abstractmethod
+    async def _write(self, message: str) -> bool:
+        """Write one message to the underlying connection."""
+        pass
+    
+    def _ensure_writer(self):
+        if self.writer_task is None:
+            self.writer_task = asyncio.create_task(self._drain())
+    
+    async def _drain(self):
+        """Writer task: send buffered messages until the buffer is closed or a write fails."""
+        try:
+            while True:
+                message = await self.buffer.get()
+                if message is None:
+                    break
+                if not await self._write(message):
+                    break
+        except Exception as e:
+            logger.error(f"Stream writer failed: {str(e)}")
+        finally:
+            if not self.buffer.closed or len(self.buffer):
+                await self.buffer.abort()
+    
+    async def _flush(self):
+        """Close the buffer and wait until the writer has sent everything queued."""
+        await self.buffer.close()
+        if self.writer_task:
+            await self.writer_task
+    
+    async def send_message(self, message: Union[str, bytes]) -> bool:
+        """Queue a message for sending; waits only while the buffer is full."""
+        self._ensure_writer()
+        return await self.buffer.put_message(message)
+    
+    async def send_event(self, event: Dict[str, Any]) -> bool:
+        """Queue an event for sending, applying the buffer's overflow policy."""
+        self._ensure_writer()
+        return await self.buffer.put_event(event)
+
+class WebSocketStreamManager(BufferedStreamManager):
     """Manages WebSocket streaming to a remote endpoint."""
     
     def __init__(self, ws_url: str):
+        super().__init__()
         self.ws_url = ws_url
         self.websocket = None
         self.connected = False
         self.reconnect_attempts = 0
-        self.max_reconnect_attempts = 5
+        self.max_reconnect_attempts = settings.max_reconnect_attempts
     
     async def connect(self) -> bool:
         """Connect to the WebSocket endpoint."""
@@ -55,45 +344,45 @@ class WebSocketStreamManager(StreamManager):
             return False
     
     async def disconnect(self):
-        """Disconnect from the WebSocket endpoint."""
+        """Flush pending messages and disconnect from the WebSocket endpoint."""
+        await self._flush()
         if self.websocket and self.connected:
             await self.websocket.close()
             self.connected = False
             logger.info("Disconnected from WebSocket endpoint")
     
-    async def send_message(self, message: str) -> bool:
-        """Send a message over the WebSocket."""
-        if not self.connected:
-            # Try to connect if not already connected
-            if not await self.connect():
-                if self.reconnect_attempts < self.max_reconnect_attempts:
-                    self.reconnect_attempts += 1
-                    logger.warning(f"Reconnection attempt {self.reconnect_attempts}/{self.max_reconnect_attempts}")
-                    await asyncio.sleep(1)  # Wait before retrying
-                    return await self.send_message(message)  # Retry
-                else:
-                    logger.error("Max reconnection attempts reached")
+    async def _wait_before_retry(self) -> bool:
+        """Count a reconnection attempt and wait before it, or give up after the maximum."""
+        if self.reconnect_attempts >= self.max_reconnect_attempts:
+            logger.error("Max reconnection attempts reached")
+            return False
+        self.reconnect_attempts += 1
+        logger.warning(f"Reconnection attempt {self.reconnect_attempts}/{self.max_reconnect_attempts}")
+        await asyncio.sleep(1)  # Wait before retrying
+        return True
+    
+    async def _write(self, message: str) -> bool:
+        """Send a message over the WebSocket, reconnecting if needed."""
+        while True:
+            if not self.connected and not await self.connect():
+                if not await self._wait_before_retry():
                     return False
-        
-        try:
-            await self.websocket.send(message)
-            return True
-        except websockets.exceptions.ConnectionClosed:
-            logger.warning("WebSocket connection closed, attempting to reconnect")
-            self.connected = False
-            if self.reconnect_attempts < self.max_reconnect_attempts:
-                self.reconnect_attempts += 1
-                await asyncio.sleep(1)  # Wait before retrying
-                return await self.send_message(message)  # Retry
-            else:
-                logger.error("Max reconnection attempts reached")
+                continue
+            
+            try:
+                await self.websocket.send(message)
+                return True
+            except websockets.exceptions.ConnectionClosed:
+                logger.warning("WebSocket connection closed, attempting to reconnect")
+                self.connected = False
+                if not await self._wait_before_retry():
+                    return False
+            except Exception as e:
+                logger.error(f"Failed to send message: {str(e)}")
+                self.connected = False
                 return False
-        except Exception as e:
-            logger.error(f"Failed to send message: {str(e)}")
-            self.connected = False
-            return False
     
-    async def stream_chunks(self, chunk_generator: AsyncGenerator[str, None], 
+    async def stream_chunks(self, chunk_generator: AsyncGenerator[str, None],
                            metadata: Dict[str, Any] = None):
         """Stream chunks from an async generator with metadata."""
         try:
@@ -103,10 +392,10 @@ class WebSocketStreamManager(StreamManager):
                     "content": chunk,
                     "metadata": metadata or {}
                 }
-                success = await self.send_message(json.dumps(message))
+                success = await self.send_message(get_serializer().dumps(message))
                 if not success:
                     logger.warning("Failed to stream chunk, continuing...")
-                    
+        
         except Exception as e:
             logger.error(f"Error in stream_chunks: {str(e)}")
             # Send error message
@@ -115,16 +404,15 @@ class WebSocketStreamManager(StreamManager):
                 "content": str(e),
                 "metadata": metadata or {}
             }
-            await self.send_message(json.dumps(error_message))
+            await self.send_message(get_serializer().dumps(error_message))
 
-class DirectResponseStreamManager(StreamManager):
+class DirectResponseStreamManager(BufferedStreamManager):
     """Stream directly to a FastAPI WebSocket connection."""
     
     def __init__(self, websocket: WebSocket):
+        super().__init__()
         self.websocket = websocket
         self.connected = True  # Assume the websocket is already connected by FastAPI
-        self.queue = asyncio.Queue()
-        self.task = None
     
     async def connect(self) -> bool:
         """Already connected through FastAPI websocket."""
@@ -133,17 +421,12 @@ class DirectResponseStreamManager(StreamManager):
         return self.connected
     
     async def disconnect(self):
-        """Disconnect not needed (handled by FastAPI)."""
+        """Flush pending messages; closing the socket is handled by FastAPI."""
+        await self._flush()
         self.connected = False
-        if self.task and not self.task.done():
-            self.task.cancel()
     
-    async def send_message(self, message: str) -> bool:
+    async def _write(self, message: str) -> bool:
         """Send a message to the client."""
-        if not self.connected:
-            logger.warning("Connection already closed")
-            return False
-        
         try:
             await self.websocket.send_text(message)
             return True
@@ -152,7 +435,20 @@ class DirectResponseStreamManager(StreamManager):
             self.connected = False
             return False
     
-    async def stream_chunks(self, chunk_generator: AsyncGenerator[str, None], 
+    async def send_message(self, message: Union[str, bytes]) -> bool:
+        """Queue a message for the client."""
+        if not self.connected:
+            logger.warning("Connection already closed")
+            return False
+        return await super().send_message(message)
+    
+    async def send_event(self, event: Dict[str, Any]) -> bool:
+        """Queue an event for the client."""
+        if not self.connected:
+            return False
+        return await super().send_event(event)
+    
+    async def stream_chunks(self, chunk_generator: AsyncGenerator[str, None],
                            metadata: Dict[str, Any] = None):
         """Stream chunks directly to the client."""
         try:
@@ -162,7 +458,7 @@ class DirectResponseStreamManager(StreamManager):
                     "content": chunk,
                     "metadata": metadata or {}
                 }
-                success = await self.send_message(json.dumps(message))
+                success = await self.send_message(get_serializer().dumps(message))
                 if not success:
                     break
         except Exception as e:
@@ -173,16 +469,33 @@ class DirectResponseStreamManager(StreamManager):
                 "content": str(e),
                 "metadata": metadata or {}
             }
-            await self.send_message(json.dumps(error_message))
+            await self.send_message(get_serializer().dumps(error_message))
+
+class ChannelStreamManager(DirectResponseStreamManager):
+    """
+    Stream one flow's events over a WebSocket channel shared by many flows.
     
-    async def get_messages(self) -> AsyncGenerator[str, None]:
-        """Get messages from the queue as an async generator."""
-        while True:
-            message = await self.queue.get()
-            if message is None:  # None as sentinel to stop
-                break
-            yield message
-            self.queue.task_done()
+    Every frame is wrapped as ``{"flow_id": ..., "event": ...}`` so the client can route
+    it; the encoded event is embedded as-is rather than decoded and re-encoded. Writers
+    of all flows on the channel share ``send_lock`` so frames are never interleaved.
+    """
+    
+    def __init__(self, websocket: WebSocket, flow_id: str, send_lock: asyncio.Lock):
+        super().__init__(websocket)
+        self.flow_id = flow_id
+        self.send_lock = send_lock
+        self._frame_prefix = '{"flow_id":' + get_serializer().dumps(flow_id) + ',"event":'
+    
+    async def _write(self, message: str) -> bool:
+        """Send one flow-tagged frame over the shared channel."""
+        try:
+            async with self.send_lock:
+                await self.websocket.send_text(self._frame_prefix + message + "}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send message for flow {self.flow_id}: {str(e)}")
+            self.connected = False
+            return False
 
 class SSEStreamManager(StreamManager):
     """Manager for Server-Sent Events (SSE) streaming."""
@@ -190,27 +503,32 @@ class SSEStreamManager(StreamManager):
     def __init__(self):
         self.connected = True
         self.messages = []
-        self.queue = asyncio.Queue()
+        self.buffer = StreamBuffer()
     
     async def connect(self) -> bool:
         """Nothing to connect in SSE."""
         return True
     
     async def disconnect(self):
-        """Mark as disconnected."""
+        """Mark as disconnected; queued messages are still delivered."""
         self.connected = False
-        # Add sentinel to queue
-        await self.queue.put(None)
+        await self.buffer.close()
     
-    async def send_message(self, message: str) -> bool:
+    async def send_message(self, message: Union[str, bytes]) -> bool:
         """Queue a message for SSE streaming."""
         if not self.connected:
             return False
         
-        await self.queue.put(message)
-        return True
+        return await self.buffer.put_message(message)
+    
+    async def send_event(self, event: Dict[str, Any]) -> bool:
+        """Queue an event for SSE streaming, applying the buffer's overflow policy."""
+        if not self.connected:
+            return False
+        
+        return await self.buffer.put_event(event)
     
-    async def stream_chunks(self, chunk_generator: AsyncGenerator[str, None], 
+    async def stream_chunks(self, chunk_generator: AsyncGenerator[str, None],
                            metadata: Dict[str, Any] = None):
         """Stream chunks through SSE."""
         try:
@@ -220,7 +538,7 @@ class SSEStreamManager(StreamManager):
                     "content": chunk,
                     "metadata": metadata or {}
                 }
-                await self.send_message(json.dumps(message))
+                await self.send_message(get_serializer().dumps(message))
         except Exception as e:
             logger.error(f"Error in stream_chunks: {str(e)}")
             error_message = {
@@ -228,13 +546,17 @@ class SSEStreamManager(StreamManager):
                 "content": str(e),
                 "metadata": metadata or {}
             }
-            await self.send_message(json.dumps(error_message))
+            await self.send_message(get_serializer().dumps(error_message))
     
     async def get_messages(self) -> AsyncGenerator[str, None]:
         """Get messages as an async generator for SSE streaming."""
-        while True:
-            message = await self.queue.get()
-            if message is None:  # None is a sentinel to stop
-                break
-            yield f"data: {message}\n\n"
-            self.queue.task_done()
\ No newline at end of file
+        try:
+            while True:
+                message = await self.buffer.get()
+                if message is None:  # Buffer closed and drained
+                    break
+                yield f"data: {message}\n\n"
+        finally:
+            # The client went away; unblock the executor instead of buffering for nobody
+            self.connected = False
+            await self.buffer.abort()
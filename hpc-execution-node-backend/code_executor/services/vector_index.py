@@ -0,0 +1,430 @@
+import asyncio
+import contextlib
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import settings
+from services.embeddings import TitanEmbeddingService
+from utils.logger import logger
+
+def chunk_text(text: str, chunk_size: int = 800, chunk_overlap: int = 100) -> List[str]:
+    """
+    Split text into overlapping chunks of roughly chunk_size characters on word boundaries.
+    
+    Args:
+        text: Text to split
+        chunk_size: Target maximum chunk length in characters
+        chunk_overlap: Characters repeated from the end of the previous chunk
+    
+    Returns:
+        List of chunk strings
+    """
+    words = re.split(r"\s+", text.strip())
+    if not words or words == [""]:
+        return []
+    
+    chunks = []
+    current: List[str] = []
+    current_length = 0
+    for word in words:
+        if current and current_length + len(word) + 1 > chunk_size:
+            chunks.append(" ".join(current))
+            # Carry trailing words over as overlap
+            overlap: List[str] = []
+            overlap_length = 0
+            for previous in reversed(current):
+                if overlap_length + len(previous) + 1 > chunk_overlap:
+                    break
+                overlap.insert(0, previous)
+                overlap_length += len(previous) + 1
+            current, current_length = overlap, overlap_length
+        current.append(word)
+        current_length += len(word) + 1
+    
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def _save_array(path: str, array: np.ndarray):
+    """Write an .npy file atomically so live memory maps of the old file stay valid."""
+    temp_path = f"{path}.tmp.npy"
+    np.save(temp_path, np.asarray(array))
+    os.replace(temp_path, path)
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so a dot product equals cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class VectorIndex:
+    """
+    NumPy-backed cosine similarity index over text chunks.
+    
+    An index with a directory is append-only on disk: vectors go to a flat
+    ``vectors_<dim>.f32`` file that is memory-mapped for search and chunk records to
+    ``chunks.jsonl``, so adding documents never rewrites or loads what is already stored.
+    
+    Small indexes are searched brute force. Once an index holds at least
+    ``ivf_threshold`` vectors an inverted-file (IVF) structure is built: vectors are
+    clustered with k-means and a query only scans the ``n_probe`` closest clusters.
+    Later additions join their nearest cluster; k-means only runs again once the
+    index has doubled or a cluster has grown far past the average size.
+    """
+    
+    # A cluster this many times the average size triggers a rebuild
+    IVF_MAX_LIST_SKEW = 4.0
+    
+    def __init__(self, dimension: Optional[int] = None,
+                 ivf_threshold: Optional[int] = None,
+                 n_probe: Optional[int] = None,
+                 directory: Optional[str] = None):
+        self.dimension = dimension
+        # Directory the index is persisted to as it grows; None keeps it in memory only
+        self.directory = directory
+        # Length of chunks.jsonl covering self.chunks
+        self._chunks_bytes = 0
+        self.ivf_threshold = ivf_threshold or settings.vector_index_ivf_threshold
+        self.n_probe = n_probe or settings.vector_index_n_probe
+        self.vectors = np.zeros((0, dimension or 0), dtype=np.float32)
+        self.chunks: List[Dict[str, Any]] = []
+        # IVF structures (centroids, list offsets, list member ids in CSR layout),
+        # swapped in as one tuple so concurrent searches never see a partial update
+        self.ivf: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        # Number of vectors the IVF clusters were computed from
+        self.ivf_built_size = 0
+    
+    def __len__(self) -> int:
+        return len(self.chunks)
+    
+    @property
+    def mode(self) -> str:
+        return "ivf" if self.ivf is not None else "brute_force"
+    
+    def add(self, embeddings: List[List[float]], chunks: List[Dict[str, Any]]):
+        """Add normalized embeddings and their chunk records, rebuilding IVF when needed."""
+        if not embeddings:
+            return
+        new_vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        if self.dimension is None or len(self) == 0:
+            self.dimension = new_vectors.shape[1]
+            self.vectors = np.zeros((0, self.dimension), dtype=np.float32)
+        if new_vectors.shape[1] != self.dimension:
+            raise ValueError(f"Embedding dimension {new_vectors.shape[1]} does not match index dimension {self.dimension}")
+        
+        # Chunks are published before vectors so every visible vector has a chunk record
+        if self.directory is not None:
+            self._append(new_vectors, chunks)
+            vectors = self._map_vectors(len(self) + len(chunks))
+        else:
+            vectors = np.concatenate([self.vectors, new_vectors])
+        self.chunks = self.chunks + chunks
+        self.vectors = vectors
+        
+        if len(self) < self.ivf_threshold:
+            self.ivf = None
+        elif self.ivf is None:
+            self.build_ivf()
+        else:
+            self._assign_to_ivf(new_vectors)
+            if self._ivf_drifted():
+                self.build_ivf()
+        if self.directory is not None:
+            self._save_ivf()
+    
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, f"vectors_{self.dimension}.f32")
+    
+    def _map_vectors(self, rows: int) -> np.ndarray:
+        """Memory-map the first rows of the vectors file read-only."""
+        if rows == 0:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.memmap(self._vectors_path(), dtype=np.float32, mode="r", shape=(rows, self.dimension))
+    
+    def _append(self, new_vectors: np.ndarray, chunks: List[Dict[str, Any]]):
+        """Append vectors and their chunk records to the index files."""
+        os.makedirs(self.directory, exist_ok=True)
+        if len(self) == 0:
+            # A new or emptied index may change dimension; start its files over
+            for filename in os.listdir(self.directory):
+                if re.fullmatch(r"vectors_\d+\.f32|chunks\.jsonl", filename):
+                    os.remove(os.path.join(self.directory, filename))
+        # Vectors are written before chunks and load() only keeps rows that have both. Each file is
+        # first cut back to the rows in memory, dropping whatever an interrupted append left behind.
+        with open(self._vectors_path(), "ab") as f:
+            f.truncate(len(self) * 4 * self.dimension)
+            f.write(new_vectors.astype(np.float32).tobytes())
+        data = "".join(json.dumps(chunk) + "\n" for chunk in chunks).encode()
+        with open(os.path.join(self.directory, "chunks.jsonl"), "ab") as f:
+            f.truncate(self._chunks_bytes)
+            f.write(data)
+        self._chunks_bytes += len(data)
+    
+    def _save_ivf(self):
+        """Persist the IVF arrays, or remove stale ones if the index has no IVF."""
+        if self.ivf is not None:
+            centroids, list_offsets, list_ids = self.ivf
+            _save_array(os.path.join(self.directory, "ivf_centroids.npy"), centroids)
+            _save_array(os.path.join(self.directory, "ivf_list_offsets.npy"), list_offsets)
+            _save_array(os.path.join(self.directory, "ivf_list_ids.npy"), list_ids)
+        else:
+            for filename in ["ivf_centroids.npy", "ivf_list_ids.npy", "ivf_list_offsets.npy"]:
+                path = os.path.join(self.directory, filename)
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def _ivf_drifted(self) -> bool:
+        """Whether the index has doubled since clustering or one cluster has grown too large."""
+        centroids, list_offsets, _ = self.ivf
+        if len(self) >= 2 * max(1, self.ivf_built_size):
+            return True
+        largest_list = int(np.max(np.diff(list_offsets)))
+        return largest_list > self.IVF_MAX_LIST_SKEW * len(self) / len(centroids)
+    
+    def _assign_to_ivf(self, new_vectors: np.ndarray):
+        """Add the newest vectors to the inverted list of their nearest centroid."""
+        centroids, list_offsets, list_ids = self.ivf
+        n_lists = len(centroids)
+        old_count = len(self) - len(new_vectors)
+        
+        # Recover each old vector's list from the CSR layout, then append the new ones
+        assignments = np.empty(len(self), dtype=np.int64)
+        assignments[np.asarray(list_ids)] = np.repeat(np.arange(n_lists), np.diff(list_offsets))
+        assignments[old_count:] = np.argmax(new_vectors @ centroids.T, axis=1)
+        
+        list_ids = np.argsort(assignments, kind="stable").astype(np.int64)
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))]).astype(np.int64)
+        self.ivf = (centroids, list_offsets, list_ids)
+    
+    def build_ivf(self, n_lists: Optional[int] = None, iterations: int = 10, seed: int = 0):
+        """Cluster the vectors with spherical k-means and build the inverted lists."""
+        vectors = self.vectors
+        count = len(vectors)
+        n_lists = min(count, n_lists or max(1, int(np.sqrt(count))))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(count, size=n_lists, replace=False)].copy()
+        
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for list_id in range(n_lists):
+                members = vectors[assignments == list_id]
+                if len(members):
+                    centroids[list_id] = members.mean(axis=0)
+            centroids = _normalize_rows(centroids)
+        
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        list_ids = np.argsort(assignments, kind="stable").astype(np.int64)
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))]).astype(np.int64)
+        
+        self.ivf = (centroids.astype(np.float32), list_offsets, list_ids)
+        self.ivf_built_size = count
+        logger.info(f"Built IVF index with {n_lists} lists over {count} vectors")
+    
+    def search(self, query: List[float], top_k: int = 3) -> List[Tuple[Dict[str, Any], float]]:
+        """Return up to top_k (chunk, cosine similarity) pairs, best first."""
+        # Snapshot the arrays so a concurrent add() cannot change them mid-search
+        vectors, ivf, chunks = self.vectors, self.ivf, self.chunks
+        if len(vectors) == 0:
+            return []
+        query_vector = _normalize_rows(np.asarray([query], dtype=np.float32))[0]
+        
+        if ivf is not None:
+            centroids, list_offsets, list_ids = ivf
+            n_probe = min(self.n_probe, len(centroids))
+            probe_lists = np.argsort(-(centroids @ query_vector))[:n_probe]
+            candidate_ids = np.concatenate([
+                list_ids[list_offsets[list_id]:list_offsets[list_id + 1]]
+                for list_id in probe_lists
+            ])
+        else:
+            candidate_ids = np.arange(len(vectors))
+        
+        top_k = min(top_k, len(candidate_ids))
+        if top_k <= 0:
+            return []
+        scores = vectors[candidate_ids] @ query_vector
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(chunks[int(candidate_ids[i])], float(scores[i])) for i in best]
+    
+    @classmethod
+    def load(cls, directory: str) -> "VectorIndex":
+        """Load a persisted index, memory-mapping its vectors."""
+        vector_files = [match for match in (re.fullmatch(r"vectors_(\d+)\.f32", filename)
+                                            for filename in os.listdir(directory)) if match]
+        if not vector_files:
+            return cls(directory=directory)
+        index = cls(dimension=int(vector_files[0].group(1)), directory=directory)
+        vector_rows = os.path.getsize(index._vectors_path()) // (4 * index.dimension)
+        
+        # Read one chunk per stored vector, stopping at a partially written trailing record
+        chunks_path = os.path.join(directory, "chunks.jsonl")
+        if os.path.exists(chunks_path):
+            with open(chunks_path, "rb") as f:
+                for line in f:
+                    if len(index.chunks) == vector_rows or not line.endswith(b"\n"):
+                        break
+                    try:
+                        index.chunks.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break
+                    index._chunks_bytes += len(line)
+        rows = len(index.chunks)
+        index.vectors = index._map_vectors(rows)
+        
+        centroids_path = os.path.join(directory, "ivf_centroids.npy")
+        if os.path.exists(centroids_path):
+            ivf = (
+                np.load(centroids_path),
+                np.load(os.path.join(directory, "ivf_list_offsets.npy")),
+                np.load(os.path.join(directory, "ivf_list_ids.npy"), mmap_mode="r")
+            )
+            if len(ivf[2]) == rows:
+                index.ivf = ivf
+                # The build size is not stored; the current size only delays the next rebuild
+                index.ivf_built_size = rows
+        if index.ivf is None and rows >= index.ivf_threshold:
+            # The IVF arrays did not match the vectors, e.g. after an interrupted write
+            index.build_ivf()
+            index._save_ivf()
+        return index
+
+def _path_component(value: str) -> str:
+    """Turn a namespace or model ID into a single safe directory name."""
+    component = re.sub(r"[^A-Za-z0-9_.-]", "_", value)
+    return component if component and not component.startswith(".") else f"_{component}"
+
+def validate_index_name(index_name: str) -> str:
+    """Reject index names that could resolve outside their namespace directory."""
+    if not index_name or not index_name.strip():
+        raise ValueError("Vector index name must not be empty")
+    if index_name.startswith(".") or "/" in index_name or "\\" in index_name or "\x00" in index_name:
+        raise ValueError(f"Invalid vector index name '{index_name}': must not start with '.' or contain path separators")
+    return index_name
+
+class _LoadedIndex:
+    """Registry entry of an index, with the lock serializing its loading and writes."""
+    
+    def __init__(self):
+        self.index: Optional[VectorIndex] = None
+        self.lock = asyncio.Lock()
+        # Calls using the entry; an entry in use is never evicted, so an index has one writer
+        self.users = 0
+
+class RetrievalService:
+    """Chunk, embed, index and search documents in named vector indexes."""
+    
+    # LRU of loaded indexes shared by all flows in this process, keyed by index directory
+    _indexes: "OrderedDict[str, _LoadedIndex]" = OrderedDict()
+    
+    def __init__(self, embedding_service: TitanEmbeddingService, namespace: str,
+                 index_dir: Optional[str] = None):
+        """
+        Initialize the retrieval service.
+        
+        Args:
+            embedding_service: Service used to embed chunks and queries
+            namespace: Owner of the indexes (agent and user, or flow); other namespaces are never read
+            index_dir: Root directory for persisted indexes (defaults to settings)
+        """
+        self.embedding_service = embedding_service
+        self.namespace = namespace
+        self.index_dir = index_dir or settings.vector_index_dir
+    
+    def _index_path(self, index_name: str) -> str:
+        # Each embedding model gets its own index, so switching models never mixes dimensions
+        return os.path.join(
+            self.index_dir,
+            _path_component(self.namespace),
+            _path_component(self.embedding_service.model_id),
+            _path_component(validate_index_name(index_name))
+        )
+    
+    @classmethod
+    def _evict(cls):
+        """Drop the least recently used indexes that are not in use beyond the configured size."""
+        for path in list(cls._indexes):
+            if len(cls._indexes) <= settings.vector_index_cache_size:
+                break
+            if cls._indexes[path].users == 0:
+                del cls._indexes[path]
+    
+    @contextlib.asynccontextmanager
+    async def _locked_index(self, index_name: str) -> AsyncIterator[VectorIndex]:
+        """Hold a named index's lock, loading the index from disk on first use."""
+        path = self._index_path(index_name)
+        entry = self._indexes.get(path)
+        if entry is None:
+            entry = self._indexes[path] = _LoadedIndex()
+        self._indexes.move_to_end(path)
+        entry.users += 1
+        try:
+            async with entry.lock:
+                if entry.index is None:
+                    loop = asyncio.get_event_loop()
+                    entry.index = await loop.run_in_executor(None, self._open_index, path, index_name)
+                yield entry.index
+        finally:
+            entry.users -= 1
+            self._evict()
+    
+    @staticmethod
+    def _open_index(path: str, index_name: str) -> VectorIndex:
+        if not os.path.isdir(path):
+            return VectorIndex(directory=path)
+        index = VectorIndex.load(path)
+        logger.info(f"Loaded vector index '{index_name}' with {len(index)} chunks ({index.mode})")
+        return index
+    
+    async def get_index(self, index_name: str) -> VectorIndex:
+        """Get a named index, loading it from disk on first use."""
+        async with self._locked_index(index_name) as index:
+            return index
+    
+    async def index_documents(self, index_name: str, documents: List[str],
+                              chunk_size: int = 800, chunk_overlap: int = 100) -> int:
+        """
+        Chunk, embed and add documents to a named index, skipping chunks already indexed.
+        
+        Returns:
+            Number of chunks added
+        """
+        async with self._locked_index(index_name) as index:
+            known = {chunk["text"] for chunk in index.chunks}
+            
+            new_chunks = []
+            for doc_number, document in enumerate(documents):
+                for chunk in chunk_text(document, chunk_size, chunk_overlap):
+                    if chunk not in known:
+                        known.add(chunk)
+                        new_chunks.append({"text": chunk, "document": doc_number})
+            if not new_chunks:
+                return 0
+            
+            results = await self.embedding_service.embed_many([chunk["text"] for chunk in new_chunks])
+            embeddings = [embedding for embedding, _ in results]
+            
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, index.add, embeddings, new_chunks)
+            logger.info(f"Indexed {len(new_chunks)} chunks into '{index_name}' ({len(index)} total, {index.mode})")
+            return len(new_chunks)
+    
+    async def retrieve(self, index_name: str, query: Optional[str] = None,
+                       query_embedding: Optional[List[float]] = None,
+                       top_k: int = 3) -> List[Dict[str, Any]]:
+        """Return the top_k chunks for a query text or a precomputed query embedding."""
+        if query_embedding is None:
+            if not query:
+                raise ValueError("Either a query or a query embedding must be provided")
+            query_embedding, _ = await self.embedding_service.embed(query)
+        
+        index = await self.get_index(index_name)
+        loop = asyncio.get_event_loop()
+        matches = await loop.run_in_executor(None, index.search, query_embedding, top_k)
+        return [{"text": chunk["text"], "score": score, "document": chunk.get("document")}
+                for chunk, score in matches]
@@ -0,0 +1,143 @@
+# utils/payloads.py
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+def estimate_size(value: Any, limit: Optional[int] = None) -> int:
+    """
+    Estimate the JSON-encoded size of a value in bytes.
+    
+    The walk stops as soon as the estimate passes ``limit``, so checking a large value
+    against a small budget costs time proportional to the budget, not to the value.
+    """
+    return _estimate(value, limit if limit is not None else float("inf"), 0)
+
+def _estimate(value: Any, limit: float, total: int) -> int:
+    if total > limit:
+        return total
+    if isinstance(value, str):
+        return total + len(value) + 2
+    if value is None or isinstance(value, bool):
+        return total + 5
+    if isinstance(value, int):
+        return total + 8
+    if isinstance(value, (float, Decimal)):
+        return total + 20
+    if isinstance(value, dict):
+        total += 2
+        for key, item in value.items():
+            total = _estimate(item, limit, total + len(str(key)) + 4)
+            if total > limit:
+                break
+        return total
+    if isinstance(value, (list, tuple, set, frozenset)):
+        total += 2
+        for item in value:
+            total = _estimate(item, limit, total + 1)
+            if total > limit:
+                break
+        return total
+    return total + len(str(value)) + 2
+
+def _shape(value: Any, depth: int = 3) -> List[int]:
+    """Dimensions of a (nested) list, following the first item at each level."""
+    shape = []
+    while isinstance(value, (list, tuple)) and depth > 0:
+        shape.append(len(value))
+        if not value:
+            break
+        value = value[0]
+        depth -= 1
+    return shape
+
+def make_preview(value: Any, preview_chars: int = 200, preview_items: int = 5) -> Any:
+    """
+    Replace a large value with a small description of it.
+    
+    Previews are dicts marked with ``"_preview": True`` that carry the value type,
+    its length or shape, and a truncated sample.
+    """
+    if isinstance(value, str):
+        return {
+            "_preview": True,
+            "type": "string",
+            "length": len(value),
+            "preview": value[:preview_chars]
+        }
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value) if not isinstance(value, (list, tuple)) else value
+        sample = []
+        for item in items[:preview_items]:
+            if estimate_size(item, preview_chars) > preview_chars:
+                item = make_preview(item, preview_chars, preview_items)
+            sample.append(item)
+        return {
+            "_preview": True,
+            "type": "list",
+            "length": len(items),
+            "shape": _shape(items),
+            "preview": sample
+        }
+    if isinstance(value, dict):
+        return {
+            "_preview": True,
+            "type": "dict",
+            "length": len(value),
+            "keys": [str(key) for key in list(value)[:preview_items * 4]]
+        }
+    text = str(value)
+    return {
+        "_preview": True,
+        "type": type(value).__name__,
+        "length": len(text),
+        "preview": text[:preview_chars]
+    }
+
+def shrink_to_budget(value: Any, budget: int, preview_chars: int = 200, preview_items: int = 5) -> Any:
+    """
+    Fit a value into roughly ``budget`` bytes of JSON.
+    
+    Dicts keep their keys and split the budget between their values; any other value
+    that does not fit is replaced by a preview. Values that fit are returned as-is.
+    """
+    if estimate_size(value, budget) <= budget:
+        return value
+    if isinstance(value, dict) and value:
+        # Small values are kept whole; the rest of the budget is split between the large ones
+        even_share = budget // len(value)
+        sizes = {key: estimate_size(item, even_share) for key, item in value.items()}
+        large = [key for key, size in sizes.items() if size > even_share]
+        remaining = budget - sum(size for key, size in sizes.items() if size <= even_share)
+        share = remaining // max(1, len(large))
+        # Keep structure only while each large value still gets a useful share
+        if share >= preview_chars:
+            return {key: shrink_to_budget(item, share, preview_chars, preview_items) if key in large else item
+                    for key, item in value.items()}
+    return make_preview(value, preview_chars, preview_items)
+
+class EventPayloadPolicy:
+    """Per-event-type size budgets applied to event data before it is streamed."""
+    
+    def __init__(self, budgets: Dict[str, int], preview_chars: int = 200, preview_items: int = 5):
+        """
+        Initialize the policy.
+        
+        Args:
+            budgets: Maximum approximate payload size in bytes, keyed by event type;
+                     event types without a budget are never truncated
+            preview_chars: Characters kept in string previews
+            preview_items: Items kept in list previews
+        """
+        self.budgets = budgets
+        self.preview_chars = preview_chars
+        self.preview_items = preview_items
+    
+    def apply(self, event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the event data, shrunk to its budget; the input is never modified."""
+        budget = self.budgets.get(event_type)
+        if not budget or estimate_size(data, budget) <= budget:
+            return data
+        shrunk = shrink_to_budget(data, budget, self.preview_chars, self.preview_items)
+        if not isinstance(shrunk, dict) or shrunk.get("_preview"):
+            shrunk = {"data": shrunk}
+        shrunk["truncated"] = True
+        return shrunk
@@ -0,0 +1,133 @@
+# utils/serialization.py
+import base64
+import datetime
+import json
+import uuid
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Union
+
+from .logger import logger
+
+def _default(value: Any) -> Any:
+    """Encode types JSON has no representation for; used by every backend."""
+    if isinstance(value, Decimal):
+        # Strings keep the exact value (balances, token amounts)
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode()
+    return str(value)
+
+class Serializer:
+    """Encode stream events to UTF-8 JSON bytes with a pluggable backend."""
+    
+    def __init__(self, name: str, encode: Callable[[Any], bytes]):
+        self.name = name
+        self._encode = encode
+    
+    def dumps_bytes(self, value: Any) -> bytes:
+        """Encode a value as UTF-8 JSON bytes."""
+        return self._encode(value)
+    
+    def dumps(self, value: Any) -> str:
+        """Encode a value as a JSON string."""
+        return self._encode(value).decode()
+
+def _json_encode(value: Any) -> bytes:
+    return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+def _json_serializer() -> Serializer:
+    return Serializer("json", _json_encode)
+
+def _orjson_serializer() -> Optional[Serializer]:
+    try:
+        import orjson
+    except ImportError:
+        return None
+    # orjson encodes datetimes and UUIDs itself; Decimal and the rest go through _default
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    
+    def encode(value: Any) -> bytes:
+        try:
+            return orjson.dumps(value, default=_default, option=options)
+        except TypeError:
+            # Integers beyond 64 bits (token amounts, custom code results) never reach default
+            return _json_encode(value)
+    return Serializer("orjson", encode)
+
+def _msgspec_serializer() -> Optional[Serializer]:
+    try:
+        import msgspec
+    except ImportError:
+        return None
+    # msgspec encodes datetimes, UUIDs and Decimals (as strings) itself
+    encoder = msgspec.json.Encoder(enc_hook=_default)
+    
+    def encode(value: Any) -> bytes:
+        try:
+            return encoder.encode(value)
+        except (TypeError, OverflowError):
+            # Integers beyond 64 bits never reach enc_hook
+            return _json_encode(value)
+    return Serializer("msgspec", encode)
+
+_BACKENDS: Dict[str, Callable[[], Optional[Serializer]]] = {
+    "orjson": _orjson_serializer,
+    "msgspec": _msgspec_serializer,
+    "json": _json_serializer
+}
+
+_serializer: Optional[Serializer] = None
+
+def get_serializer(preference: Optional[str] = None) -> Serializer:
+    """
+    Get the process-wide event serializer.
+    
+    Args:
+        preference: "auto", "orjson", "msgspec" or "json" (defaults to settings)
+    
+    Returns:
+        The preferred backend if it is installed, otherwise the fastest available one
+    """
+    global _serializer
+    if _serializer is not None and preference is None:
+        return _serializer
+    
+    if preference is None:
+        from config import settings
+        preference = settings.stream_serializer
+    
+    candidates = ["orjson", "msgspec", "json"]
+    if preference in _BACKENDS:
+        candidates.remove(preference)
+        candidates.insert(0, preference)
+    elif preference != "auto":
+        logger.warning(f"Unknown serializer '{preference}', choosing automatically")
+    
+    for name in candidates:
+        serializer = _BACKENDS[name]()
+        if serializer is not None:
+            break
+    if preference in _BACKENDS and name != preference:
+        logger.warning(f"Serializer '{preference}' is not installed, using '{name}'")
+    
+    _serializer = serializer
+    logger.info(f"Using '{serializer.name}' for stream event serialization")
+    return serializer
+
+def dumps(value: Any) -> str:
+    """Encode a value as a JSON string with the configured serializer."""
+    return get_serializer().dumps(value)
+
+def dumps_bytes(value: Any) -> bytes:
+    """Encode a value as UTF-8 JSON bytes with the configured serializer."""
+    return get_serializer().dumps_bytes(value)
+
+def as_text(message: Union[str, bytes]) -> str:
+    """Return a text frame for a message that may already be encoded."""
+    return message.decode() if isinstance(message, (bytes, bytearray)) else message
@@ -7,6 +7,10 @@ import yaml
 import os
 from application.routes import router as api_router
 from application.routes.chat import cors_wrapped_payment_middleware
+from application.modules.chat.hpc_channel import close_hpc_channel_pools
+from application.modules.database.postgresconn import close_postgres_pools
+from application.modules.database.redis import close_redis_client
+from application.modules.authentication import revocation_listener
 
 # Load configuration
 def load_config():
@@ -68,6 +72,35 @@ app.middleware("http")(
 # Include API routes
 app.include_router(api_router, prefix="/api")
 
+@app.on_event("startup")
+async def start_token_revocation_listener():
+    """
+    Subscribe to JWT revocations so validated tokens can be cached in-process
+    """
+    revocation_listener.start()
+
+@app.on_event("shutdown")
+async def stop_token_revocation_listener():
+    """
+    Stop the JWT revocation listener
+    """
+    await revocation_listener.stop()
+
+@app.on_event("shutdown")
+async def close_hpc_channels():
+    """
+    Close the pooled WebSocket channels to HPC nodes
+    """
+    await close_hpc_channel_pools()
+
+@app.on_event("shutdown")
+async def close_database_pools():
+    """
+    Close the shared PostgreSQL and Redis connection pools
+    """
+    await close_postgres_pools()
+    await close_redis_client()
+
 @app.get("/", tags=["Health"])
 async def health_check():
     """
@@ -6,6 +6,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional, Dict, Any
 from .jwt.token import JWTHandler
 from .jwt.redis_storage import RedisJWTStorage
+from .jwt.token_cache import TokenValidationCache, RevocationListener
 from ...modules.database.postgresconn import PostgresConnection
 # Create security scheme for JWT authentication
 security = HTTPBearer()
@@ -14,6 +15,13 @@ security = HTTPBearer()
 jwt_handler = JWTHandler()
 redis_jwt_storage = RedisJWTStorage()
 
+# Recently validated tokens, kept consistent with logouts on every replica by the revocation listener
+token_cache = TokenValidationCache(
+    ttl_seconds=jwt_handler.config.get("jwt", {}).get("validation_cache_ttl_seconds", 30),
+    max_size=jwt_handler.config.get("jwt", {}).get("validation_cache_size", 10000)
+)
+revocation_listener = RevocationListener(token_cache)
+
 
 async def get_current_user_from_header(x_public_key: Optional[str] = Header(None)):
     """
@@ -62,7 +70,7 @@ async def get_current_user_from_header(x_public_key: Optional[str] = Header(None
 #     token = credentials.credentials
     
 #     # First, check if token exists in Redis (high speed check)
-#     token_data = redis_jwt_storage.validate_token(token)
+#     token_data = await redis_jwt_storage.validate_token(token)
 #     if not token_data:
 #         # If not in Redis, try to decode and validate the token
 #         payload = jwt_handler.verify_token(token)
@@ -108,8 +116,14 @@ async def get_current_user(
     """
     token = credentials.credentials
     
-    # First, check if token exists in Redis (high speed check)
-    token_data = redis_jwt_storage.validate_token(token)
+    # Tokens validated in the last few seconds and not revoked since are trusted as-is
+    token_data = token_cache.get(token)
+    if token_data:
+        return token_data.get("user_id")
+    
+    # Otherwise check if token exists in Redis (high speed check)
+    revocations = token_cache.revocations
+    token_data = await redis_jwt_storage.validate_token(token)
     if not token_data:
         # If token is not in Redis, it's considered invalid
         # This prevents users from using tokens after logout
@@ -120,6 +134,7 @@ async def get_current_user(
         )
     
     # If token exists in Redis, return the user_id
+    token_cache.put(token, token_data, revocations)
     return token_data.get("user_id")
 
 # Optional: Flexible authentication that tries JWT first, then falls back to header
@@ -1,12 +1,13 @@
 """
 Redis operations for JWT token storage and validation
 """
-import redis
 import yaml
 import os
 import json
 from typing import Dict, Optional, Any
 from pathlib import Path
+from ...database.redis import get_redis_client
+from .token_cache import REVOCATION_CHANNEL, revocation_message, revoke_in_process
 
 
 class RedisJWTStorage:
@@ -15,10 +16,10 @@ class RedisJWTStorage:
     """
     def __init__(self):
         """
-        Initialize Redis connection for JWT operations
+        Initialize JWT storage on the shared Redis connection pool
         """
         self.config = self._load_config()
-        self.redis_client = self._get_redis_client()
+        self.redis_client = get_redis_client()
         self.token_ttl = self.config.get("jwt", {}).get("access_token_expire_minutes", 1440) * 60  # Convert to seconds
     
     def _load_config(self) -> Dict:
@@ -32,23 +33,7 @@ class RedisJWTStorage:
         with open(config_path, "r") as file:
             return yaml.safe_load(file)
     
-    def _get_redis_client(self) -> redis.Redis:
-        """
-        Create Redis client from configuration
-        
-        Returns:
-            Redis client instance
-        """
-        redis_config = self.config.get("database", {}).get("redis", {})
-        return redis.Redis(
-            host=redis_config.get("host", "localhost"),
-            port=redis_config.get("port", 6379),
-            db=redis_config.get("db", 0),
-            password=redis_config.get("password"),
-            decode_responses=True
-        )
-    
-    def store_token(self, token: str, user_id: str, session_id: str) -> bool:
+    async def store_token(self, token: str, user_id: str, session_id: str) -> bool:
         """
         Store JWT token in Redis
         
@@ -67,21 +52,22 @@ class RedisJWTStorage:
                 "session_id": session_id
             }
             
-            # Store token data in Redis with TTL
-            self.redis_client.hmset(key, session_data)
-            self.redis_client.expire(key, self.token_ttl)
-            
-            # Also store a reference by user_id for faster lookups
+            # Store token data with TTL, plus a reference by user_id for faster lookups,
+            # in a single round trip
             user_key = f"user_sessions:{user_id}"
-            self.redis_client.sadd(user_key, token)
-            self.redis_client.expire(user_key, self.token_ttl)
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping=session_data)
+                pipe.expire(key, self.token_ttl)
+                pipe.sadd(user_key, token)
+                pipe.expire(user_key, self.token_ttl)
+                await pipe.execute()
             
             return True
         except Exception as e:
             print(f"Error storing token: {e}")
             return False
     
-    def validate_token(self, token: str) -> Optional[Dict[str, Any]]:
+    async def validate_token(self, token: str) -> Optional[Dict[str, Any]]:
         """
         Validate if token exists in Redis and return its data
         
@@ -93,11 +79,13 @@ class RedisJWTStorage:
         """
         try:
             key = f"user_session:jwt:{token}"
-            token_data = self.redis_client.hgetall(key)
+            # Read the token and refresh its TTL in one round trip; expiring a missing key is a no-op
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hgetall(key)
+                pipe.expire(key, self.token_ttl)
+                token_data, _ = await pipe.execute()
             
             if token_data:
-                # Refresh token TTL on successful validation
-                self.redis_client.expire(key, self.token_ttl)
                 return token_data
             
             return None
@@ -105,7 +93,7 @@ class RedisJWTStorage:
             print(f"Error validating token: {e}")
             return None
     
-    def invalidate_token(self, token: str) -> bool:
+    async def invalidate_token(self, token: str) -> bool:
         """
         Remove token from Redis (logout)
         
@@ -117,20 +105,19 @@ class RedisJWTStorage:
         """
         try:
             key = f"user_session:jwt:{token}"
-            # Get user_id first for cleanup
-            user_id = self.redis_client.hget(key, "user_id")
-            
-            # Delete the token entry
-            result = self.redis_client.delete(key)
-            
-            if user_id:
-                # Convert bytes to string if necessary
-                if isinstance(user_id, bytes):
-                    user_id = user_id.decode('utf-8')
-                
-                # Remove from user's sessions
-                user_key = f"user_sessions:{user_id}"
-                self.redis_client.srem(user_key, token)
+            # Get user_id for cleanup and delete the token entry in one round trip
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.hget(key, "user_id")
+                pipe.delete(key)
+                user_id, result = await pipe.execute()
+            
+            # Remove from user's sessions and evict the token from every replica's cache
+            revoke_in_process([token])
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                if user_id:
+                    pipe.srem(f"user_sessions:{user_id}", token)
+                pipe.publish(REVOCATION_CHANNEL, revocation_message([token]))
+                await pipe.execute()
             
             # For debugging
             print(f"Token invalidation result: {result}")
@@ -140,7 +127,7 @@ class RedisJWTStorage:
             print(f"Error invalidating token: {e}")
             return False
     
-    def invalidate_all_user_tokens(self, user_id: str) -> bool:
+    async def invalidate_all_user_tokens(self, user_id: str) -> bool:
         """
         Remove all tokens for a user (logout from all devices)
         
@@ -152,14 +139,14 @@ class RedisJWTStorage:
         """
         try:
             user_key = f"user_sessions:{user_id}"
-            tokens = self.redis_client.smembers(user_key)
-            
-            # Delete each token
-            for token in tokens:
-                self.redis_client.delete(f"user_session:jwt:{token}")
-            
-            # Delete the set of user tokens
-            self.redis_client.delete(user_key)
+            tokens = await self.redis_client.smembers(user_key)
+            
+            # Delete every token and the set of user tokens, then evict them from every replica's cache
+            revoke_in_process(tokens, user_id)
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.delete(*[f"user_session:jwt:{token}" for token in tokens], user_key)
+                pipe.publish(REVOCATION_CHANNEL, revocation_message(tokens, user_id))
+                await pipe.execute()
             
             return True
         except Exception as e:
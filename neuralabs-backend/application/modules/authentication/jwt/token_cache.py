@@ -0,0 +1,230 @@
+"""
+In-process cache of validated JWT tokens with Redis pub/sub revocation
+"""
+import asyncio
+import json
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional, Any, Iterable, Set
+
+from ...database.redis import get_redis_client
+
+# Channel on which every API replica hears about logged-out tokens
+REVOCATION_CHANNEL = "user_session:jwt:revocations"
+
+# Every cache in this process, so revocations can be applied locally before they are published
+_caches: "weakref.WeakSet[TokenValidationCache]" = weakref.WeakSet()
+
+
+class TokenValidationCache:
+    """
+    Bounded, short-lived cache of tokens already validated against Redis
+    
+    The cache only answers while the revocation listener is subscribed; if the
+    subscription is lost, revocations could be missed, so it is cleared and
+    bypassed until the listener reconnects.
+    """
+    def __init__(self, ttl_seconds: float = 30, max_size: int = 10000):
+        """
+        Initialize the cache
+        
+        Args:
+            ttl_seconds: How long a validated token is trusted without asking Redis
+            max_size: Maximum number of cached tokens
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, max_size)
+        self.active = False
+        # token -> (expires_at, token data)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # user_id -> cached tokens of that user
+        self._user_tokens: Dict[str, Set[str]] = {}
+        # Incremented on every revocation; see put()
+        self.revocations = 0
+        self.hits = 0
+        self.misses = 0
+        _caches.add(self)
+    
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached data of a validated token
+        
+        Args:
+            token: JWT token string
+        
+        Returns:
+            Token data if the token was validated recently, None otherwise
+        """
+        entry = self._entries.get(token) if self.active else None
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(token)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+    
+    def put(self, token: str, token_data: Dict[str, Any], revocations: int):
+        """
+        Cache a token that Redis has just validated
+        
+        Args:
+            token: JWT token string
+            token_data: Token data returned by Redis
+            revocations: Value of ``self.revocations`` read before asking Redis; if a
+                         revocation arrived meanwhile the token is not cached
+        """
+        if not self.active or revocations != self.revocations:
+            return
+        self._remove(token)
+        self._entries[token] = (time.monotonic() + self.ttl_seconds, token_data)
+        user_id = token_data.get("user_id")
+        if user_id:
+            self._user_tokens.setdefault(user_id, set()).add(token)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+    
+    def revoke(self, tokens: Iterable[str] = (), user_id: Optional[str] = None):
+        """
+        Evict revoked tokens
+        
+        Args:
+            tokens: Tokens to evict
+            user_id: Evict every cached token of this user as well
+        """
+        self.revocations += 1
+        for token in tokens:
+            self._remove(token)
+        if user_id:
+            for token in list(self._user_tokens.get(user_id, ())):
+                self._remove(token)
+    
+    def deactivate(self):
+        """
+        Clear the cache and stop answering from it
+        """
+        self.active = False
+        self.revocations += 1
+        self._entries.clear()
+        self._user_tokens.clear()
+    
+    def _remove(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        user_id = entry[1].get("user_id")
+        user_tokens = self._user_tokens.get(user_id)
+        if user_tokens is not None:
+            user_tokens.discard(token)
+            if not user_tokens:
+                del self._user_tokens[user_id]
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+def revocation_message(tokens: Iterable[str] = (), user_id: Optional[str] = None) -> str:
+    """
+    Build the message published on the revocation channel
+    
+    Args:
+        tokens: Revoked tokens
+        user_id: User whose tokens are all revoked
+    
+    Returns:
+        JSON message
+    """
+    return json.dumps({"tokens": list(tokens), "user_id": user_id})
+
+
+def revoke_in_process(tokens: Iterable[str] = (), user_id: Optional[str] = None):
+    """
+    Evict revoked tokens from every cache of this process
+    
+    Args:
+        tokens: Revoked tokens
+        user_id: User whose tokens are all revoked
+    """
+    tokens = list(tokens)
+    for cache in list(_caches):
+        cache.revoke(tokens, user_id)
+
+
+class RevocationListener:
+    """
+    Background task that applies revocations published by any replica to a local cache
+    """
+    def __init__(self, cache: TokenValidationCache, retry_delay: float = 1.0):
+        """
+        Initialize the listener
+        
+        Args:
+            cache: Cache to keep consistent
+            retry_delay: Seconds to wait before resubscribing after a failure
+        """
+        self.cache = cache
+        self.retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """
+        Start listening, unless already started
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+    
+    async def stop(self):
+        """
+        Stop listening and deactivate the cache
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.cache.deactivate()
+    
+    async def _listen(self):
+        while True:
+            pubsub = get_redis_client().pubsub()
+            try:
+                await pubsub.subscribe(REVOCATION_CHANNEL)
+                while True:
+                    # Poll with a timeout so an idle channel never trips the socket timeout
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    if message["type"] == "subscribe":
+                        # Revocations published from now on are seen, so the cache can answer
+                        self.cache.active = True
+                    elif message["type"] == "message":
+                        self._apply(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Token revocation listener error: {e}")
+            finally:
+                self.cache.deactivate()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(self.retry_delay)
+    
+    def _apply(self, data: str):
+        try:
+            revocation = json.loads(data)
+        except ValueError:
+            print(f"Ignoring malformed token revocation: {data}")
+            return
+        self.cache.revoke(revocation.get("tokens", ()), revocation.get("user_id"))
@@ -1,12 +1,10 @@
 """
 Redis operations for payment session storage and validation
 """
-import redis
-import yaml
 import json
 from typing import Dict, Optional, Any
-from pathlib import Path
 from datetime import datetime
+from ..database.redis import get_redis_client
 
 
 class PaymentSessionStorage:
@@ -15,40 +13,12 @@ class PaymentSessionStorage:
     """
     def __init__(self):
         """
-        Initialize Redis connection for payment session operations
+        Initialize payment session storage on the shared Redis connection pool
         """
-        self.config = self._load_config()
-        self.redis_client = self._get_redis_client()
+        self.redis_client = get_redis_client()
         self.session_ttl = 300  # 5 minutes in seconds
     
-    def _load_config(self) -> Dict:
-        """
-        Load configuration from config.yaml
-        
-        Returns:
-            Configuration dictionary
-        """
-        config_path = Path(__file__).parent.parent.parent.parent / "config.yaml"
-        with open(config_path, "r") as file:
-            return yaml.safe_load(file)
-    
-    def _get_redis_client(self) -> redis.Redis:
-        """
-        Create Redis client from configuration
-        
-        Returns:
-            Redis client instance
-        """
-        redis_config = self.config.get("database", {}).get("redis", {})
-        return redis.Redis(
-            host=redis_config.get("host", "localhost"),
-            port=redis_config.get("port", 6379),
-            db=redis_config.get("db", 0),
-            password=redis_config.get("password"),
-            decode_responses=True
-        )
-    
-    def store_payment_session(self, session_id: str, payment_data: Dict[str, Any]) -> bool:
+    async def store_payment_session(self, session_id: str, payment_data: Dict[str, Any]) -> bool:
         """
         Store payment session in Redis
         
@@ -71,16 +41,18 @@ class PaymentSessionStorage:
                 "created_at": payment_data.get("created_at", datetime.utcnow()).isoformat()
             }
             
-            # Store session data in Redis with TTL
-            self.redis_client.hmset(key, session_data)
-            self.redis_client.expire(key, self.session_ttl)
+            # Store session data in Redis with TTL in one round trip
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping=session_data)
+                pipe.expire(key, self.session_ttl)
+                await pipe.execute()
             
             return True
         except Exception as e:
             print(f"Error storing payment session: {e}")
             return False
     
-    def get_payment_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+    async def get_payment_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve payment session from Redis
         
@@ -92,7 +64,11 @@ class PaymentSessionStorage:
         """
         try:
             key = f"payment_session:{session_id}"
-            session_data = self.redis_client.hgetall(key)
+            # Read the session and refresh its TTL in one round trip; expiring a missing key is a no-op
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hgetall(key)
+                pipe.expire(key, self.session_ttl)
+                session_data, _ = await pipe.execute()
             
             if session_data:
                 # Parse JSON fields
@@ -103,9 +79,6 @@ class PaymentSessionStorage:
                 if 'created_at' in session_data:
                     session_data['created_at'] = datetime.fromisoformat(session_data['created_at'])
                 
-                # Refresh TTL on successful retrieval
-                self.redis_client.expire(key, self.session_ttl)
-                
                 return session_data
             
             return None
@@ -113,7 +86,7 @@ class PaymentSessionStorage:
             print(f"Error retrieving payment session: {e}")
             return None
     
-    def delete_payment_session(self, session_id: str) -> bool:
+    async def delete_payment_session(self, session_id: str) -> bool:
         """
         Remove payment session from Redis
         
@@ -125,7 +98,7 @@ class PaymentSessionStorage:
         """
         try:
             key = f"payment_session:{session_id}"
-            result = self.redis_client.delete(key)
+            result = await self.redis_client.delete(key)
             
             # For debugging
             print(f"Payment session deletion result: {result}")
@@ -135,7 +108,7 @@ class PaymentSessionStorage:
             print(f"Error deleting payment session: {e}")
             return False
     
-    def get_all_user_sessions(self, user_id: str) -> list:
+    async def get_all_user_sessions(self, user_id: str) -> list:
         """
         Get all payment sessions for a user (for debugging/admin purposes)
         
@@ -146,18 +119,22 @@ class PaymentSessionStorage:
             List of session IDs for the user
         """
         try:
-            # Scan for all payment session keys
+            # Scan for all payment session keys, reading each batch's owners in one round trip
             sessions = []
             cursor = 0
             pattern = "payment_session:*"
             
             while True:
-                cursor, keys = self.redis_client.scan(cursor, match=pattern)
-                for key in keys:
-                    session_data = self.redis_client.hget(key, "user_id")
-                    if session_data == user_id:
-                        session_id = key.split(":")[-1]
-                        sessions.append(session_id)
+                cursor, keys = await self.redis_client.scan(cursor, match=pattern)
+                if keys:
+                    async with self.redis_client.pipeline(transaction=False) as pipe:
+                        for key in keys:
+                            pipe.hget(key, "user_id")
+                        owners = await pipe.execute()
+                    for key, owner in zip(keys, owners):
+                        if owner == user_id:
+                            session_id = key.split(":")[-1]
+                            sessions.append(session_id)
                 
                 if cursor == 0:
                     break
@@ -0,0 +1,153 @@
+"""
+Per-conversation cache of recent messages used as flow context
+
+Chat turns reference their conversation instead of uploading its history. The
+last messages of each conversation are kept in memory, and every turn only reads
+the messages appended since the previous one, so the work per turn does not grow
+with the length of the conversation.
+"""
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, List
+
+from ..database.postgresconn import PostgresConnection
+
+logger = logging.getLogger(__name__)
+
+
+class _CachedConversation:
+    def __init__(self, user_id: str, window_size: int):
+        self.user_id = user_id
+        self.last_seq = 0
+        # (seq, message document), oldest first
+        self.messages: deque = deque(maxlen=window_size)
+
+
+class ConversationContextCache:
+    """
+    Bounded LRU cache of the most recent messages of each conversation
+    """
+    def __init__(self, window_size: int = 100, max_conversations: int = 512):
+        """
+        Initialize the cache
+        
+        Args:
+            window_size: Messages kept per conversation, the most any context can use
+            max_conversations: Maximum number of cached conversations
+        """
+        self.window_size = max(1, window_size)
+        self.max_conversations = max(1, max_conversations)
+        self._entries: "OrderedDict[str, _CachedConversation]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    async def get_recent(self, conversation_id: str, user_id: str, limit: int,
+                         before_message_id: Optional[str] = None,
+                         role: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the most recent messages of a conversation, in context history format
+        
+        Args:
+            conversation_id: ID of the conversation
+            user_id: User the conversation must belong to
+            limit: Maximum number of messages to return
+            before_message_id: Only use messages older than this one (the message being answered)
+            role: Only return messages with this role
+        
+        Returns:
+            Messages oldest first, or None if the conversation does not exist for this user
+        """
+        entry = await self._refresh(conversation_id, user_id)
+        if entry is None:
+            return None
+        
+        messages = [message for _, message in entry.messages]
+        if before_message_id:
+            for index, message in enumerate(messages):
+                if message.get("id") == before_message_id:
+                    messages = messages[:index]
+                    break
+        if role:
+            messages = [message for message in messages if message.get("role") == role]
+        messages = messages[-limit:] if limit > 0 else []
+        
+        return [
+            {
+                "role": message.get("role"),
+                "content": message.get("content"),
+                "timestamp": message.get("timestamp"),
+                "metadata": {
+                    "message_id": message.get("id"),
+                    "model": message.get("model")
+                }
+            }
+            for message in messages
+        ]
+    
+    async def _refresh(self, conversation_id: str, user_id: str) -> Optional[_CachedConversation]:
+        """
+        Append the messages stored since the entry was last refreshed
+        """
+        entry = self._entries.get(conversation_id)
+        if entry is not None and entry.user_id != user_id:
+            entry = None
+        last_seq = entry.last_seq if entry is not None else 0
+        
+        # Ownership check and new messages in one round trip; a single row with a NULL seq if there are none
+        pg_conn = PostgresConnection()
+        query = """
+            SELECT c.message_count, cm.seq, cm.message
+            FROM conversations c
+            LEFT JOIN LATERAL (
+                SELECT seq, message
+                FROM conversation_messages
+                WHERE conversation_id = c.conversation_id
+                AND seq > %s
+                ORDER BY seq DESC
+                LIMIT %s
+            ) cm ON TRUE
+            WHERE c.conversation_id = %s AND c.user_id = %s
+        """
+        result = await pg_conn.execute_query(query, (last_seq, self.window_size, conversation_id, user_id))
+        if not result:
+            logger.warning(f"No conversation {conversation_id} found for user {user_id}")
+            if entry is not None:
+                self._entries.pop(conversation_id, None)
+            return None
+        
+        rows = sorted((row for row in result if row["seq"] is not None), key=lambda row: row["seq"])
+        if entry is not None and not rows and result[0]["message_count"] == last_seq:
+            self.hits += 1
+        else:
+            self.misses += 1
+        
+        # Re-read the entry: another turn of the same conversation may have refreshed it meanwhile
+        current = self._entries.get(conversation_id)
+        if current is None or current.user_id != user_id:
+            current = _CachedConversation(user_id, self.window_size)
+            self._entries[conversation_id] = current
+        rows = [row for row in rows if row["seq"] > current.last_seq]
+        if rows and rows[0]["seq"] != current.last_seq + 1:
+            # More new messages than the window holds; the cached ones are no longer the most recent
+            current.messages.clear()
+        for row in rows:
+            current.messages.append((row["seq"], row["message"]))
+            current.last_seq = row["seq"]
+        
+        self._entries.move_to_end(conversation_id)
+        while len(self._entries) > self.max_conversations:
+            self._entries.popitem(last=False)
+        return current
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_conversations": self.max_conversations,
+            "window_size": self.window_size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Shared by every chat execution of this process
+conversation_context_cache = ConversationContextCache()
@@ -0,0 +1,303 @@
+"""
+Multiplexed WebSocket channels to HPC execution nodes
+
+Chat turns share a few long-lived connections per HPC node instead of opening a
+new connection and walking through the ready/flow/inputs/config handshake every
+time. A flow is started with a single framed message, and every frame the node
+sends back is tagged with the flow_id it belongs to. Flows a node has already
+compiled are referenced by hash instead of being uploaded again.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import websockets
+from collections import OrderedDict
+from typing import Dict, Any, Optional, AsyncGenerator, List
+
+logger = logging.getLogger(__name__)
+
+# Event types after which a flow sends nothing more
+TERMINAL_EVENTS = ("flow_completed", "flow_error")
+
+# Flow hashes remembered per node; older ones are simply uploaded again
+MAX_KNOWN_FLOWS = 1024
+
+
+def compute_flow_hash(flow_definition: Dict[str, Any]) -> str:
+    """
+    Compute the content hash the execution engine uses as a flow's compile cache key
+    
+    The encoding is a protocol contract with the execution engine, defined under
+    "Flow Hash" in hpc-execution-node-backend/Doc/code_executor.md; flow_hash
+    references only work while both sides produce identical digests.
+    
+    Args:
+        flow_definition: Flow definition to execute
+    
+    Returns:
+        Hex md5 digest of the canonical JSON encoding
+    """
+    canonical = json.dumps(flow_definition, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.md5(canonical.encode()).hexdigest()
+
+
+class HPCChannelError(Exception):
+    """
+    Raised when a flow cannot be sent over an HPC channel
+    """
+    pass
+
+
+class HPCChannel:
+    """
+    One long-lived WebSocket connection to an HPC node, shared by many flows
+    """
+    def __init__(self, url: str, connect_timeout: float = 10.0,
+                 known_flows: Optional["OrderedDict[str, None]"] = None):
+        """
+        Initialize the channel; the connection is opened on first use
+        
+        Args:
+            url: WebSocket URL of the node's multiplexed channel endpoint
+            connect_timeout: Seconds to wait for the connection to open
+            known_flows: Hashes of flows the node has compiled, shared by its channels
+        """
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.known_flows = known_flows if known_flows is not None else OrderedDict()
+        self.websocket = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+        # flow_id -> queue of events received for that flow
+        self._flows: Dict[str, asyncio.Queue] = {}
+    
+    @property
+    def is_open(self) -> bool:
+        return self._reader_task is not None and not self._reader_task.done()
+    
+    @property
+    def active_flows(self) -> int:
+        return len(self._flows)
+    
+    async def connect(self):
+        """
+        Open the connection and start the reader task, unless already open
+        
+        Raises:
+            HPCChannelError: If the node cannot be reached
+        """
+        async with self._connect_lock:
+            if self.is_open:
+                return
+            try:
+                # Frames of all flows share this connection, so don't cap their size
+                self.websocket = await asyncio.wait_for(
+                    websockets.connect(self.url, max_size=None),
+                    timeout=self.connect_timeout
+                )
+            except Exception as e:
+                raise HPCChannelError(f"Could not connect to execution engine at {self.url}: {e}")
+            self._reader_task = asyncio.create_task(self._read())
+            logger.info(f"Opened HPC channel to {self.url}")
+    
+    async def _read(self):
+        """
+        Reader task: route incoming frames to the queue of the flow they are tagged with
+        """
+        try:
+            async for message in self.websocket:
+                try:
+                    frame = json.loads(message)
+                except json.JSONDecodeError as e:
+                    logger.error(f"Error parsing HPC channel frame: {e}")
+                    continue
+                queue = self._flows.get(frame.get("flow_id"))
+                if queue is not None:
+                    queue.put_nowait(frame.get("event"))
+        except websockets.exceptions.ConnectionClosed as e:
+            logger.warning(f"HPC channel to {self.url} closed: {e}")
+        except Exception as e:
+            logger.error(f"HPC channel reader for {self.url} failed: {e}")
+        finally:
+            # Flows still running on this channel will never receive their remaining events
+            for queue in self._flows.values():
+                queue.put_nowait({
+                    "type": "flow_error",
+                    "data": {"error": "Connection to execution engine lost"}
+                })
+    
+    async def execute(self, flow_id: str, flow_definition: Dict[str, Any],
+                      initial_inputs: Dict[str, Any],
+                      config: Optional[Dict[str, Any]] = None,
+                      flow_hash: Optional[str] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Start a flow on the node and yield its events
+        
+        The generator ends after flow_completed or flow_error. Closing it earlier
+        cancels the flow on the node.
+        
+        Args:
+            flow_id: ID used to tag the flow's frames; unique per channel
+            flow_definition: Flow definition to execute
+            initial_inputs: Inputs for the start element
+            config: Optional executor configuration
+            flow_hash: compute_flow_hash(flow_definition), if the caller already has it
+        
+        Yields:
+            Flow events as sent by the execution engine
+        
+        Raises:
+            HPCChannelError: If the request cannot be sent
+        """
+        if flow_id in self._flows:
+            raise HPCChannelError(f"Flow {flow_id} is already running on this channel")
+        
+        queue: asyncio.Queue = asyncio.Queue()
+        self._flows[flow_id] = queue
+        flow_hash = flow_hash or compute_flow_hash(flow_definition)
+        finished = False
+        try:
+            await self._send_execute(flow_id, flow_hash, flow_definition, initial_inputs, config,
+                                     inline=flow_hash not in self.known_flows)
+            
+            while not finished:
+                event = await queue.get()
+                event_type = event.get("type")
+                if event_type == "unknown_flow":
+                    # The node never compiled the flow or has evicted it; upload it in full
+                    self.known_flows.pop(flow_hash, None)
+                    await self._send_execute(flow_id, flow_hash, flow_definition, initial_inputs, config,
+                                             inline=True)
+                    continue
+                if event_type != "flow_error":
+                    self._remember_flow(flow_hash)
+                finished = event_type in TERMINAL_EVENTS
+                yield event
+        finally:
+            self._flows.pop(flow_id, None)
+            if not finished and self.is_open:
+                # The consumer stopped early; stop the flow on the node as well
+                try:
+                    await self.websocket.send(json.dumps({"type": "cancel", "flow_id": flow_id}))
+                except Exception:
+                    pass
+    
+    async def _send_execute(self, flow_id: str, flow_hash: str, flow_definition: Dict[str, Any],
+                            initial_inputs: Dict[str, Any], config: Optional[Dict[str, Any]],
+                            inline: bool):
+        """
+        Send an execute frame carrying the flow inline or referencing it by hash
+        """
+        frame = {
+            "type": "execute",
+            "flow_id": flow_id,
+            "initial_inputs": initial_inputs,
+            "config": config
+        }
+        if inline:
+            frame["flow_definition"] = flow_definition
+        else:
+            frame["flow_hash"] = flow_hash
+        try:
+            await self.websocket.send(json.dumps(frame))
+        except Exception as e:
+            raise HPCChannelError(f"Could not send flow to execution engine: {e}")
+    
+    def _remember_flow(self, flow_hash: str):
+        """
+        Record that the node has compiled a flow
+        """
+        self.known_flows[flow_hash] = None
+        self.known_flows.move_to_end(flow_hash)
+        while len(self.known_flows) > MAX_KNOWN_FLOWS:
+            self.known_flows.popitem(last=False)
+    
+    async def close(self):
+        """
+        Close the connection; running flows receive a flow_error event
+        """
+        if self.websocket is not None:
+            await self.websocket.close()
+        if self._reader_task is not None:
+            await self._reader_task
+
+
+class HPCChannelPool:
+    """
+    Fixed set of multiplexed channels to one HPC node
+    """
+    def __init__(self, url: str, size: int = 2):
+        """
+        Initialize the pool; channels connect lazily
+        
+        Args:
+            url: WebSocket URL of the node's multiplexed channel endpoint
+            size: Number of channels to the node
+        """
+        self.url = url
+        # Channels to the same node share its compile cache, so they share the known hashes
+        self.known_flows: "OrderedDict[str, None]" = OrderedDict()
+        self.channels: List[HPCChannel] = [
+            HPCChannel(url, known_flows=self.known_flows) for _ in range(max(1, size))
+        ]
+    
+    async def acquire(self) -> HPCChannel:
+        """
+        Get the least busy channel, connecting it if needed
+        
+        Returns:
+            An open channel
+        
+        Raises:
+            HPCChannelError: If the node cannot be reached
+        """
+        # Among equally busy channels prefer one that is already open
+        channel = min(self.channels, key=lambda c: (c.active_flows, not c.is_open))
+        await channel.connect()
+        return channel
+    
+    async def close(self):
+        """
+        Close all channels of the pool
+        """
+        for channel in self.channels:
+            await channel.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "channels": len(self.channels),
+            "open_channels": sum(1 for c in self.channels if c.is_open),
+            "active_flows": sum(c.active_flows for c in self.channels),
+            "known_flows": len(self.known_flows)
+        }
+
+
+_pools: Dict[str, HPCChannelPool] = {}
+
+
+def get_hpc_channel_pool(url: str, size: int = 2) -> HPCChannelPool:
+    """
+    Get the process-wide channel pool for an HPC node, creating it on first use
+    
+    Args:
+        url: WebSocket URL of the node's multiplexed channel endpoint
+        size: Number of channels to the node (used when the pool is created)
+    
+    Returns:
+        The node's channel pool
+    """
+    pool = _pools.get(url)
+    if pool is None:
+        pool = _pools[url] = HPCChannelPool(url, size)
+    return pool
+
+
+async def close_hpc_channel_pools():
+    """
+    Close the channels of every pool (application shutdown)
+    """
+    for pool in list(_pools.values()):
+        await pool.close()
+    _pools.clear()
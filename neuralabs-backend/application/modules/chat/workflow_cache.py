@@ -0,0 +1,146 @@
+"""
+Read-through cache of agent workflows used by chat execution
+
+Every chat turn needs the agent's current workflow. A hit costs one small query
+that returns the agent status and the workflow md5. The workflow JSONB is only
+fetched and parsed again when either of them has changed, and values derived
+from it, such as the HPC flow definition, are computed once per version.
+"""
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable
+
+from ..database.postgresconn import PostgresConnection
+
+logger = logging.getLogger(__name__)
+
+
+class CachedWorkflow:
+    """
+    One version of an agent's workflow plus values derived from it
+    """
+    def __init__(self, agent_id: str, status: str, md5: Optional[str], workflow: Dict[str, Any]):
+        self.agent_id = agent_id
+        self.status = status
+        self.md5 = md5
+        self.workflow = workflow
+        self._derived: Dict[str, Any] = {}
+    
+    def derive(self, key: str, build: Callable[[Dict[str, Any]], Any]) -> Any:
+        """
+        Get a value computed from the workflow, computing it on first use
+        
+        Derived values are shared by every caller of this version, so they must be
+        treated as read-only.
+        
+        Args:
+            key: Name of the derived value
+            build: Function computing the value from the workflow
+        
+        Returns:
+            The derived value
+        """
+        if key not in self._derived:
+            self._derived[key] = build(self.workflow)
+        return self._derived[key]
+
+
+class WorkflowCache:
+    """
+    Bounded LRU cache of agent workflows, validated by agent status and workflow md5
+    """
+    def __init__(self, max_size: int = 512):
+        """
+        Initialize the cache
+        
+        Args:
+            max_size: Maximum number of cached agents
+        """
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[str, CachedWorkflow]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    async def get(self, agent_id: str) -> Optional[CachedWorkflow]:
+        """
+        Get the current workflow of an agent
+        
+        Published agents ('Active' status) use the published workflow, all others
+        the unpublished one.
+        
+        Args:
+            agent_id: ID of the agent
+        
+        Returns:
+            The cached workflow, or None if the agent or its workflow does not exist
+        """
+        pg_conn = PostgresConnection()
+        
+        version_query = """
+            SELECT a.status, pa.md5 AS published_md5, ua.md5 AS unpublished_md5
+            FROM agent a
+            LEFT JOIN published_agent pa ON pa.agent_id = a.agent_id
+            LEFT JOIN unpublished_agent ua ON ua.agent_id = a.agent_id
+            WHERE a.agent_id = %s
+        """
+        version_result = await pg_conn.execute_query(version_query, (agent_id,))
+        if not version_result:
+            logger.warning(f"No agent found for agent_id {agent_id}")
+            self.invalidate(agent_id)
+            return None
+        
+        status = version_result[0].get('status') or 'Not Published'
+        is_published = status == 'Active'
+        md5 = version_result[0].get('published_md5' if is_published else 'unpublished_md5')
+        
+        entry = self._entries.get(agent_id)
+        # Rows without an md5 cannot be validated, so they are never served from cache
+        if entry is not None and md5 is not None and entry.status == status and entry.md5 == md5:
+            self._entries.move_to_end(agent_id)
+            self.hits += 1
+            return entry
+        
+        self.misses += 1
+        table_name = 'published_agent' if is_published else 'unpublished_agent'
+        logger.info(f"Loading workflow for agent {agent_id} from {table_name} (status: {status})")
+        workflow_query = f"""
+            SELECT workflow, md5
+            FROM {table_name}
+            WHERE agent_id = %s
+        """
+        workflow_result = await pg_conn.execute_query(workflow_query, (agent_id,))
+        workflow = workflow_result[0].get('workflow') if workflow_result else None
+        if not workflow:
+            logger.warning(f"No workflow found for agent {agent_id} in {table_name} table")
+            self.invalidate(agent_id)
+            return None
+        
+        # Use the md5 read with the workflow, so a save between the two queries is not cached as stale
+        entry = CachedWorkflow(agent_id, status, workflow_result[0].get('md5'), workflow)
+        if entry.md5 is not None:
+            self._entries[agent_id] = entry
+            self._entries.move_to_end(agent_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+    
+    def invalidate(self, agent_id: str):
+        """
+        Drop the cached workflow of an agent
+        
+        Args:
+            agent_id: ID of the agent
+        """
+        self._entries.pop(agent_id, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Shared by chat execution and the workflow save/publish paths that invalidate it
+workflow_cache = WorkflowCache()
@@ -2,11 +2,28 @@
 PostgreSQL database connection manager
 """
 import os
+import asyncio
 import yaml
-import psycopg2
-import psycopg2.extras
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg.types.string import TextLoader
+from psycopg_pool import AsyncConnectionPool
 from typing import List, Dict, Any, Optional, Tuple
 
+# Process-wide connection pools, keyed by connection string
+_pools: Dict[str, AsyncConnectionPool] = {}
+_pools_lock = asyncio.Lock()
+
+# config.yaml is read once per process; connections are created on every query path
+_config: Optional[Dict[str, Any]] = None
+
+async def _configure_connection(conn):
+    """
+    Make a pooled connection return values the way psycopg2 did
+    """
+    # psycopg2 returned UUID columns as strings; callers compare and serialize them as such
+    conn.adapters.register_loader("uuid", TextLoader)
+
 class PostgresConnection:
     """
     Class to manage connections to the PostgreSQL database
@@ -17,6 +34,7 @@ class PostgresConnection:
         """
         self.config = self._load_config()
         self.connection_params = self._get_connection_params()
+        self.pool_settings = self._get_pool_settings()
     
     def _load_config(self) -> Dict[str, Any]:
         """
@@ -25,10 +43,13 @@ class PostgresConnection:
         Returns:
             Configuration dictionary
         """
-        config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 
-                                  "config.yaml")
-        with open(config_path, "r") as file:
-            return yaml.safe_load(file)
+        global _config
+        if _config is None:
+            config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 
+                                      "config.yaml")
+            with open(config_path, "r") as file:
+                _config = yaml.safe_load(file)
+        return _config
     
     def _get_connection_params(self) -> Dict[str, Any]:
         """
@@ -46,59 +67,124 @@ class PostgresConnection:
             "dbname": db_config.get("dbname", "neuralabs"),
         }
     
-    async def execute_query(self, query: str, params: Optional[Tuple] = None) -> List[Dict[str, Any]]:
+    def _get_pool_settings(self) -> Dict[str, Any]:
+        """
+        Get connection pool settings from config
+        
+        Returns:
+            Dictionary of pool settings
+        """
+        db_config = self.config.get("database", {}).get("postgres", {})
+        return {
+            "min_size": db_config.get("pool_min_size", 2),
+            "max_size": db_config.get("pool_max_size", 10),
+            # Seconds to wait for a free connection
+            "timeout": db_config.get("pool_timeout", 30),
+            # Server-side limit for every statement, 0 disables it
+            "statement_timeout_ms": db_config.get("statement_timeout_ms", 30000),
+            # Executions after which a statement is prepared server-side, None disables it
+            "prepare_threshold": db_config.get("prepare_threshold", 5),
+        }
+    
+    async def get_pool(self) -> AsyncConnectionPool:
+        """
+        Get the shared connection pool for this database, opening it on first use
+        
+        Returns:
+            Open connection pool
+        """
+        conninfo = make_conninfo(**self.connection_params)
+        pool = _pools.get(conninfo)
+        if pool is not None:
+            return pool
+        
+        async with _pools_lock:
+            pool = _pools.get(conninfo)
+            if pool is None:
+                settings = self.pool_settings
+                pool = AsyncConnectionPool(
+                    conninfo,
+                    min_size=settings["min_size"],
+                    max_size=settings["max_size"],
+                    timeout=settings["timeout"],
+                    kwargs={
+                        "row_factory": dict_row,
+                        "prepare_threshold": settings["prepare_threshold"],
+                        "options": f"-c statement_timeout={settings['statement_timeout_ms']}",
+                    },
+                    configure=_configure_connection,
+                    open=False,
+                )
+                await pool.open()
+                _pools[conninfo] = pool
+        return pool
+    
+    async def execute_query(self, query: str, params: Optional[Tuple] = None,
+                            timeout: Optional[float] = None) -> List[Dict[str, Any]]:
         """
         Execute a SQL query and return the results as a list of dictionaries
         
         Args:
             query: SQL query to execute
             params: Query parameters
-            
+            timeout: Optional limit in seconds for this query, on top of the statement timeout
+        
         Returns:
             Query results as a list of dictionaries
         """
-        conn = None
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-                cursor.execute(query, params)
-                if cursor.description:
-                    return cursor.fetchall()
-                return []
+            pool = await self.get_pool()
+            # The connection commits on success and rolls back on error
+            async with pool.connection() as conn:
+                async with conn.cursor() as cursor:
+                    await asyncio.wait_for(cursor.execute(query, params), timeout)
+                    if cursor.description:
+                        return await cursor.fetchall()
+                    return []
+        except asyncio.TimeoutError:
+            print(f"Database error: query timed out after {timeout}s")
+            return []
         except Exception as e:
             print(f"Database error: {e}")
             # In a production environment, you would want to log this error
             # and possibly raise a custom exception
             return []
-        finally:
-            if conn:
-                conn.commit()
-                conn.close()
     
-    async def execute_transaction(self, queries: List[Tuple[str, Optional[Tuple]]]) -> bool:
+    async def execute_transaction(self, queries: List[Tuple[str, Optional[Tuple]]],
+                                  timeout: Optional[float] = None) -> bool:
         """
         Execute multiple queries in a transaction
         
         Args:
             queries: List of tuples containing (query, params)
-            
+            timeout: Optional limit in seconds for the whole transaction
+        
         Returns:
             True if the transaction was successful, False otherwise
         """
-        conn = None
+        async def run_transaction():
+            pool = await self.get_pool()
+            # The connection commits on success and rolls back on error
+            async with pool.connection() as conn:
+                async with conn.cursor() as cursor:
+                    for query, params in queries:
+                        await cursor.execute(query, params)
+        
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            with conn.cursor() as cursor:
-                for query, params in queries:
-                    cursor.execute(query, params)
-            conn.commit()
+            await asyncio.wait_for(run_transaction(), timeout)
             return True
+        except asyncio.TimeoutError:
+            print(f"Transaction error: timed out after {timeout}s")
+            return False
         except Exception as e:
-            if conn:
-                conn.rollback()
             print(f"Transaction error: {e}")
             # In a production environment, you would want to log this error
             return False
-        finally:
-            if conn:
-                conn.close()
\ No newline at end of file
+
+async def close_postgres_pools():
+    """
+    Close every shared connection pool (application shutdown)
+    """
+    for pool in list(_pools.values()):
+        await pool.close()
+    _pools.clear()
@@ -0,0 +1,62 @@
+"""
+Shared asyncio Redis connection pool
+"""
+import yaml
+import redis.asyncio as aioredis
+from typing import Dict, Any, Optional
+from pathlib import Path
+
+# One client (and connection pool) per process, shared by every Redis storage
+_client: Optional[aioredis.Redis] = None
+
+
+def _load_redis_config() -> Dict[str, Any]:
+    """
+    Load the Redis section of config.yaml
+    
+    Returns:
+        Redis configuration dictionary
+    """
+    config_path = Path(__file__).parent.parent.parent.parent / "config.yaml"
+    with open(config_path, "r") as file:
+        config = yaml.safe_load(file)
+    return config.get("database", {}).get("redis", {})
+
+
+def get_redis_client() -> aioredis.Redis:
+    """
+    Get the process-wide asyncio Redis client, creating its connection pool on first use
+    
+    Connections are opened lazily and reused across requests, so callers should
+    not close the client.
+    
+    Returns:
+        Shared Redis client with decoded (str) responses
+    """
+    global _client
+    if _client is None:
+        redis_config = _load_redis_config()
+        # A full pool makes callers wait for a free connection instead of failing at once
+        pool = aioredis.BlockingConnectionPool(
+            host=redis_config.get("host", "localhost"),
+            port=redis_config.get("port", 6379),
+            db=redis_config.get("db", 0),
+            password=redis_config.get("password"),
+            max_connections=redis_config.get("max_connections", 50),
+            timeout=redis_config.get("pool_timeout", 5),
+            socket_timeout=redis_config.get("socket_timeout", 5),
+            health_check_interval=redis_config.get("health_check_interval", 30),
+            decode_responses=True
+        )
+        _client = aioredis.Redis(connection_pool=pool)
+    return _client
+
+
+async def close_redis_client():
+    """
+    Close the shared client and disconnect its pool (application shutdown)
+    """
+    global _client
+    if _client is not None:
+        await _client.connection_pool.disconnect()
+        _client = None
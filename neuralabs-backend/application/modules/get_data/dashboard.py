@@ -248,4 +248,115 @@ async def get_nft_access_list(nft_id: str) -> List[Dict[str, Any]]:
     ORDER BY na.access_level DESC, na.timestamp DESC
     """
     result = await pg_conn.execute_query(query, (nft_id,))
-    return result
\ No newline at end of file
+    return result
+
+# Upper bound of the "Recently opened" section kept by get_dashboard_sections
+RECENT_FLOWS_LIMIT = 50
+
+DASHBOARD_SECTIONS = ("my_flows", "other_flows", "recent", "under_development", "published", "shared")
+
+
+async def get_dashboard_sections(user_pub_key: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Get every dashboard section of a user in a single query
+    
+    Each section matches the result of its get_* function above; "recent" holds up to
+    RECENT_FLOWS_LIMIT flows. Rows also carry the nft_id of the flow, so cached
+    sections can be invalidated when access to the NFT changes.
+    
+    Args:
+        user_pub_key: Public key of the user
+        
+    Returns:
+        Dictionary of flow lists keyed by section name
+    """
+    pg_conn = PostgresConnection()
+    query = """
+    WITH visible AS (
+        SELECT a.agent_id, a.name, a.description, a.status, a.creation_date, a.owner,
+               pa.agent_id IS NOT NULL AS has_published, pa.last_edited_time AS published_time,
+               ua.agent_id IS NOT NULL AS has_unpublished, ua.last_edited_time AS unpublished_time,
+               COALESCE(pa.last_edited_time, ua.last_edited_time) AS last_edited_time,
+               ba.nft_id, na.user_id AS access_user, al.access_level, al.access_level_name
+        FROM AGENT a
+        LEFT JOIN PUBLISHED_AGENT pa ON a.agent_id = pa.agent_id
+        LEFT JOIN UNPUBLISHED_AGENT ua ON a.agent_id = ua.agent_id
+        LEFT JOIN BLOCKCHAIN_AGENT_DATA ba ON a.agent_id = ba.agent_id
+        LEFT JOIN NFT_ACCESS na ON ba.nft_id = na.nft_id AND na.user_id = %(user)s
+        LEFT JOIN ACCESS_LEVEL_TABLE al ON na.access_level = al.access_level
+        WHERE a.owner = %(user)s OR na.user_id IS NOT NULL
+    ),
+    sections AS (
+        SELECT 'my_flows' AS section,
+               ROW_NUMBER() OVER (ORDER BY last_edited_time DESC) AS position,
+               agent_id, name, description, status, creation_date, last_edited_time,
+               access_level, access_level_name, nft_id
+        FROM visible
+        WHERE owner = %(user)s
+        
+        UNION ALL
+        SELECT 'other_flows',
+               ROW_NUMBER() OVER (ORDER BY access_level DESC, last_edited_time DESC),
+               agent_id, name, description, status, creation_date, last_edited_time,
+               access_level, access_level_name, nft_id
+        FROM visible
+        WHERE access_user IS NOT NULL AND access_level IS NOT NULL AND owner != %(user)s
+        
+        UNION ALL
+        SELECT 'recent',
+               ROW_NUMBER() OVER (ORDER BY last_edited_time DESC),
+               agent_id, name, description, status, creation_date, last_edited_time,
+               access_level, access_level_name, nft_id
+        FROM visible
+        
+        UNION ALL
+        SELECT 'under_development',
+               ROW_NUMBER() OVER (ORDER BY unpublished_time DESC),
+               agent_id, name, description, status, creation_date, unpublished_time,
+               access_level, access_level_name, nft_id
+        FROM visible
+        WHERE has_unpublished AND status = 'Not Published'
+        
+        UNION ALL
+        SELECT 'published',
+               ROW_NUMBER() OVER (ORDER BY published_time DESC),
+               agent_id, name, description, status, creation_date, published_time,
+               access_level, access_level_name, nft_id
+        FROM visible
+        WHERE has_published AND status = 'Active'
+        
+        UNION ALL
+        -- Joins every access record of the NFT, like get_shared_flows
+        SELECT 'shared',
+               ROW_NUMBER() OVER (ORDER BY COALESCE(pa.last_edited_time, ua.last_edited_time) DESC),
+               a.agent_id, a.name, a.description, a.status, a.creation_date,
+               COALESCE(pa.last_edited_time, ua.last_edited_time),
+               al.access_level, al.access_level_name, ba.nft_id
+        FROM AGENT a
+        LEFT JOIN PUBLISHED_AGENT pa ON a.agent_id = pa.agent_id
+        LEFT JOIN UNPUBLISHED_AGENT ua ON a.agent_id = ua.agent_id
+        LEFT JOIN BLOCKCHAIN_AGENT_DATA ba ON a.agent_id = ba.agent_id
+        JOIN NFT_ACCESS na ON ba.nft_id = na.nft_id
+        LEFT JOIN ACCESS_LEVEL_TABLE al ON na.access_level = al.access_level
+        WHERE (a.owner = %(user)s OR na.user_id = %(user)s)
+        AND ba.nft_id IN (
+            SELECT nft_id 
+            FROM NFT_ACCESS 
+            GROUP BY nft_id 
+            HAVING COUNT(*) > 1
+        )
+    )
+    SELECT *
+    FROM sections
+    WHERE section != 'recent' OR position <= %(recent_limit)s
+    ORDER BY section, position
+    """
+    result = await pg_conn.execute_query(query, {"user": user_pub_key, "recent_limit": RECENT_FLOWS_LIMIT})
+    
+    sections = {section: [] for section in DASHBOARD_SECTIONS}
+    for row in result:
+        section = row.pop("section")
+        row.pop("position")
+        sections[section].append(row)
+    
+    return sections
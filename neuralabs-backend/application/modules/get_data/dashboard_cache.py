@@ -0,0 +1,120 @@
+"""
+Short-lived per-user cache of dashboard sections
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Iterable, Set
+
+
+class DashboardCache:
+    """
+    Bounded cache of each user's dashboard sections, invalidated by user, agent or NFT
+    
+    Writes in this process invalidate the affected entries at once; the TTL bounds
+    how long other API processes can serve a dashboard from before the write.
+    """
+    def __init__(self, ttl_seconds: float = 15, max_size: int = 2048):
+        """
+        Initialize the cache
+        
+        Args:
+            ttl_seconds: How long a user's sections are served without querying the database
+            max_size: Maximum number of cached users
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, max_size)
+        # user -> (expires_at, sections, agent and NFT tags of the sections)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # agent/NFT tag -> users whose cached sections contain it
+        self._tag_users: Dict[str, Set[str]] = {}
+        # Incremented on every invalidation; see put()
+        self.invalidations = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, user_pub_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached sections of a user
+        
+        Args:
+            user_pub_key: Public key of the user
+        
+        Returns:
+            Sections if they were loaded recently, None otherwise
+        """
+        entry = self._entries.get(user_pub_key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(user_pub_key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_pub_key)
+        self.hits += 1
+        return entry[1]
+    
+    def put(self, user_pub_key: str, sections: Dict[str, Any], invalidations: int):
+        """
+        Cache the sections just loaded for a user
+        
+        Args:
+            user_pub_key: Public key of the user
+            sections: Dashboard sections, as lists of flows with agent_id and nft_id
+            invalidations: Value of ``self.invalidations`` read before loading; if an
+                           invalidation happened meanwhile the sections are not cached
+        """
+        if invalidations != self.invalidations:
+            return
+        tags = set()
+        for flows in sections.values():
+            for flow in flows:
+                tags.add(f"agent:{flow.get('agent_id')}")
+                if flow.get("nft_id"):
+                    tags.add(f"nft:{flow['nft_id']}")
+        
+        self._remove(user_pub_key)
+        self._entries[user_pub_key] = (time.monotonic() + self.ttl_seconds, sections, tags)
+        for tag in tags:
+            self._tag_users.setdefault(tag, set()).add(user_pub_key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+    
+    def invalidate(self, user_ids: Iterable[str] = (), agent_ids: Iterable[str] = (),
+                   nft_ids: Iterable[str] = ()):
+        """
+        Drop the cached sections of the given users and of every user seeing the given agents or NFTs
+        
+        Args:
+            user_ids: Users whose dashboard changed
+            agent_ids: Agents that were created, updated or published
+            nft_ids: NFTs whose access list changed
+        """
+        self.invalidations += 1
+        users = set(user_ids)
+        for tag in [f"agent:{agent_id}" for agent_id in agent_ids] + [f"nft:{nft_id}" for nft_id in nft_ids]:
+            users.update(self._tag_users.get(tag, ()))
+        for user_pub_key in users:
+            self._remove(user_pub_key)
+    
+    def _remove(self, user_pub_key: str):
+        entry = self._entries.pop(user_pub_key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            tag_users = self._tag_users.get(tag)
+            if tag_users is not None:
+                tag_users.discard(user_pub_key)
+                if not tag_users:
+                    del self._tag_users[tag]
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Shared by the dashboard routes and the set_data functions that invalidate it
+dashboard_cache = DashboardCache()
@@ -8,6 +8,8 @@ import time
 from datetime import datetime
 from ...modules.database.postgresconn import PostgresConnection
 from ...modules.set_data.blockchain import create_or_get_contract_details
+from ...modules.chat.workflow_cache import workflow_cache
+from ...modules.get_data.dashboard_cache import dashboard_cache
 
 
 async def create_or_update_agent(
@@ -63,6 +65,7 @@ async def create_or_update_agent(
         )
         
         await pg_conn.execute_query(update_query, params)
+        dashboard_cache.invalidate(user_ids=[user_pub_key], agent_ids=[agent_id])
         return True, agent_id, None
     else:
         # Create new agent
@@ -87,7 +90,8 @@ async def create_or_update_agent(
         )
         
         await pg_conn.execute_query(insert_query, params)
-    
+        dashboard_cache.invalidate(user_ids=[user_pub_key])
+        
         return True, agent_id, None
 
 
@@ -170,6 +174,10 @@ async def save_agent_workflow(
         """
         await pg_conn.execute_query(update_status_query, (agent_id,))
     
+    # Chat execution must pick up the new workflow
+    workflow_cache.invalidate(agent_id)
+    dashboard_cache.invalidate(user_ids=[user_pub_key], agent_ids=[agent_id])
+    
     return True, None
 
 
@@ -285,6 +293,9 @@ async def move_workflow_to_published(pg_conn, agent_id, user_pub_key) -> Tuple[b
     # delete_query = "DELETE FROM UNPUBLISHED_AGENT WHERE agent_id = %s"
     # await pg_conn.execute_query(delete_query, (agent_id,))
     
+    # Chat execution must pick up the published workflow
+    workflow_cache.invalidate(agent_id)
+    
     return True, None
 
 
@@ -441,33 +452,37 @@ async def publish_agent_to_blockchain(
     if result[0]["owner"] != user_pub_key:
         return False, "You don't have permission to publish this agent"
     
-    # Move workflow from unpublished to published
-    workflow_success, workflow_error = await move_workflow_to_published(pg_conn, agent_id, user_pub_key)
-    if not workflow_success:
-        return False, workflow_error
-    
-    # Get the chain_id from the agent or from the blockchain data
-    chain_id = blockchain_data.get("chain_id") or result[0].get("chain_id", 1)
-    
-    # Update blockchain data
-    blockchain_success, blockchain_error, nft_id = await update_blockchain_data(pg_conn, agent_id, blockchain_data, chain_id)
-    if not blockchain_success:
-        return False, blockchain_error
-    
-    # Update agent status to Active
-    update_status_query = """
-    UPDATE AGENT
-    SET status = 'Active'
-    WHERE agent_id = %s
-    """
-    await pg_conn.execute_query(update_status_query, (agent_id,))
-    
-    # Ensure owner has level 6 access to the NFT
-    access_success, access_error = await ensure_owner_access(pg_conn, user_pub_key, nft_id)
-    if not access_success:
-        return False, access_error
-    
-    return True, None
+    try:
+        # Move workflow from unpublished to published
+        workflow_success, workflow_error = await move_workflow_to_published(pg_conn, agent_id, user_pub_key)
+        if not workflow_success:
+            return False, workflow_error
+        
+        # Get the chain_id from the agent or from the blockchain data
+        chain_id = blockchain_data.get("chain_id") or result[0].get("chain_id", 1)
+        
+        # Update blockchain data
+        blockchain_success, blockchain_error, nft_id = await update_blockchain_data(pg_conn, agent_id, blockchain_data, chain_id)
+        if not blockchain_success:
+            return False, blockchain_error
+        
+        # Update agent status to Active
+        update_status_query = """
+        UPDATE AGENT
+        SET status = 'Active'
+        WHERE agent_id = %s
+        """
+        await pg_conn.execute_query(update_status_query, (agent_id,))
+        
+        # Ensure owner has level 6 access to the NFT
+        access_success, access_error = await ensure_owner_access(pg_conn, user_pub_key, nft_id)
+        if not access_success:
+            return False, access_error
+        
+        return True, None
+    finally:
+        # Publishing can fail halfway, after some of the writes
+        dashboard_cache.invalidate(user_ids=[user_pub_key], agent_ids=[agent_id])
 
 async def grant_nft_access(
     nft_id: str,
@@ -573,6 +588,8 @@ async def grant_nft_access(
         
         await pg_conn.execute_query(insert_query, params)
     
+    dashboard_cache.invalidate(user_ids=[target_user_id], nft_ids=[nft_id])
+    
     return True, None
 
 
@@ -654,4 +671,6 @@ async def revoke_nft_access(
     
     await pg_conn.execute_query(delete_query, (target_user_id, nft_id))
     
+    dashboard_cache.invalidate(user_ids=[target_user_id], nft_ids=[nft_id])
+    
     return True, None
\ No newline at end of file
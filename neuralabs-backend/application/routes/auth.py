@@ -96,7 +96,7 @@ async def login(login_data: LoginRequest):
     session_id = payload.get("session_id", "")
     
     # Store token in Redis
-    redis_jwt_storage.store_token(access_token, user_data["user_pub_key"], session_id)
+    await redis_jwt_storage.store_token(access_token, user_data["user_pub_key"], session_id)
     
     # Return the token
     return {
@@ -126,7 +126,7 @@ async def logout(
     token = credentials.credentials
     
     # Invalidate token in Redis
-    success = redis_jwt_storage.invalidate_token(token)
+    success = await redis_jwt_storage.invalidate_token(token)
     
     if not success:
         raise HTTPException(
@@ -151,7 +151,7 @@ async def logout_all_sessions(
         Success message
     """
     # Invalidate all tokens for the user in Redis
-    success = redis_jwt_storage.invalidate_all_user_tokens(current_user)
+    success = await redis_jwt_storage.invalidate_all_user_tokens(current_user)
     
     if not success:
         raise HTTPException(
@@ -2,9 +2,9 @@
 Chat websocket route for streaming flow execution
 Acts as intermediary between frontend and HPC execution engine
 """
+import copy
 import json
 import asyncio
-import websockets
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, status, Depends, Request
 from typing import Dict, Any, Optional, Callable
 import logging
@@ -16,6 +16,9 @@ from ..modules.database.postgresconn import PostgresConnection
 from ..modules.authentication.jwt.token import JWTHandler
 from ..modules.authentication import get_current_user
 from ..modules.authentication.payment_session_storage import PaymentSessionStorage
+from ..modules.chat.hpc_channel import get_hpc_channel_pool, compute_flow_hash, HPCChannelError
+from ..modules.chat.workflow_cache import workflow_cache
+from ..modules.chat.conversation_context import conversation_context_cache
 from x402.fastapi.middleware import require_payment
 
 router = APIRouter()
@@ -34,7 +37,9 @@ def load_config():
 config = load_config()
 
 # Configuration for HPC execution engine
-HPC_WEBSOCKET_URL = config.get("hpc", {}).get("websocket_url", "ws://localhost:8000") + "/ws/execute/{flow_id}"
+# Multiplexed channel endpoint shared by all flows sent to the node
+HPC_CHANNEL_URL = config.get("hpc", {}).get("websocket_url", "ws://localhost:8000") + "/ws/channel"
+HPC_CHANNELS_PER_NODE = config.get("hpc", {}).get("channels_per_node", 2)
 
 # Get payment address from environment
 PAYMENT_ADDRESS = config.get('PAYMENT_ADDRESS', '0x7efD1aae7Ff2203eFa02D44c492f9ab95d1feD4e')
@@ -82,55 +87,8 @@ async def get_workflow_from_db(agent_id: str) -> Optional[Dict[str, Any]]:
     Checks both unpublished and published tables based on publication status
     """
     try:
-        pg_conn = PostgresConnection()
-        
-        # First, get the agent info to check publication status
-        agent_query = """
-            SELECT agent_id, owner, status
-            FROM agent
-            WHERE agent_id = %s
-        """
-        
-        agent_result = await pg_conn.execute_query(agent_query, (agent_id,))
-        
-        if not agent_result or len(agent_result) == 0:
-            logger.warning(f"No agent found for agent_id {agent_id}")
-            return None
-        
-        agent_info = agent_result[0]
-        agent_status = agent_info.get('status', 'Not Published')
-        is_published = agent_status == 'Active'
-        
-        logger.info(f"Agent {agent_id} status: {agent_status}, is_published: {is_published}")
-        
-        # Query the appropriate table based on publication status
-        if is_published:
-            # Query published_agent table
-            workflow_query = """
-                SELECT workflow
-                FROM published_agent 
-                WHERE agent_id = %s
-            """
-            logger.info(f"Querying published_agent table for agent {agent_id}")
-        else:
-            # Query unpublished_agent table
-            workflow_query = """
-                SELECT workflow
-                FROM unpublished_agent 
-                WHERE agent_id = %s
-            """
-            logger.info(f"Querying unpublished_agent table for agent {agent_id}")
-        
-        workflow_result = await pg_conn.execute_query(workflow_query, (agent_id,))
-        
-        if workflow_result and len(workflow_result) > 0:
-            workflow_data = workflow_result[0].get('workflow')
-            if workflow_data:
-                logger.info(f"Found workflow for agent {agent_id} in {'published_agent' if is_published else 'unpublished_agent'} table")
-                return workflow_data
-        
-        logger.warning(f"No workflow found for agent {agent_id} in {'published_agent' if is_published else 'unpublished_agent'} table")
-        return None
+        cached_workflow = await workflow_cache.get(agent_id)
+        return cached_workflow.workflow if cached_workflow else None
         
     except Exception as e:
         logger.error(f"Error retrieving workflow: {e}")
@@ -236,6 +194,75 @@ def convert_frontend_workflow_to_hpc_format(workflow_data: Dict[str, Any]) -> Di
         logger.error(f"Error converting workflow format: {e}")
         raise
 
+def build_hpc_flow_definition(workflow_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Build the flow definition sent to the HPC executor from a stored workflow
+    The workflow itself is not modified
+    
+    Returns:
+        HPC flow definition, or None if the workflow format is unknown
+    """
+    # Send the workflow data directly to HPC executor (it now handles frontend format)
+    if 'flow_definition' in workflow_data:
+        hpc_flow_definition = copy.deepcopy(workflow_data['flow_definition'])
+        logger.info("✅ Using flow_definition from workflow data")
+        
+        # Fix node types in flow_definition format
+        if 'nodes' in hpc_flow_definition:
+            for node_id, node_data in hpc_flow_definition['nodes'].items():
+                if 'type' in node_data:
+                    frontend_type = node_data['type']
+                    hpc_type = map_node_type_to_element_type(frontend_type)
+                    node_data['type'] = hpc_type
+                    logger.info(f"🔄 Converted node type: {frontend_type} -> {hpc_type}")
+        return hpc_flow_definition
+    
+    if 'nodes' in workflow_data and 'edges' in workflow_data:
+        # Frontend format: convert to expected structure
+        nodes_dict = {}
+        start_element = None
+        
+        # Convert nodes list to dict and fix parameters format
+        for node in workflow_data.get('nodes', []):
+            node_id = node.get('id', '')
+            node_copy = node.copy()
+            
+            # Convert node type to HPC format (lowercase)
+            frontend_type = node_copy.get('type', '')
+            hpc_type = map_node_type_to_element_type(frontend_type)
+            node_copy['type'] = hpc_type
+            
+            # Convert parameters from list to dict if needed
+            if 'parametersObject' in node_copy and node_copy['parametersObject']:
+                # Use parametersObject which is already in the correct format
+                node_copy['parameters'] = node_copy['parametersObject']
+            elif 'parameters' in node_copy and isinstance(node_copy['parameters'], list):
+                # Convert parameters list to dict
+                params_dict = {}
+                for param in node_copy['parameters']:
+                    if param.get('name') and 'value' in param:
+                        params_dict[param['name']] = param['value']
+                node_copy['parameters'] = params_dict
+            elif not isinstance(node_copy.get('parameters'), dict):
+                # Ensure parameters is always a dict
+                node_copy['parameters'] = {}
+            
+            nodes_dict[node_id] = node_copy
+            
+            # Find start node
+            if node.get('type', '').lower() in ['start'] and not start_element:
+                start_element = node_id
+        
+        hpc_flow_definition = {
+            'nodes': nodes_dict,
+            'connections': workflow_data.get('edges', []),
+            'start_element': start_element or (list(nodes_dict.keys())[0] if nodes_dict else '')
+        }
+        logger.info("✅ Converted frontend workflow format")
+        return hpc_flow_definition
+    
+    return None
+
 def map_node_type_to_element_type(node_type: str) -> str:
     """Map frontend node types to HPC element types"""
     type_map = {
@@ -283,66 +310,48 @@ def convert_outputs_to_schema(outputs: list) -> dict:
         }
     return schema
 
-async def connect_to_hpc_engine(flow_id: str, flow_definition: Dict[str, Any], initial_inputs: Dict[str, Any]):
+async def connect_to_hpc_engine(flow_id: str, flow_definition: Dict[str, Any], initial_inputs: Dict[str, Any],
+                                flow_hash: Optional[str] = None, config: Optional[Dict[str, Any]] = None):
     """
-    Connect to HPC execution engine WebSocket and handle streaming
+    Execute a flow over a pooled HPC channel and stream its events to the frontend
     """
-    hpc_url = HPC_WEBSOCKET_URL.format(flow_id=flow_id)
-    logger.info(f"🔗 Connecting to HPC engine at: {hpc_url}")
+    hpc_channel_pool = get_hpc_channel_pool(HPC_CHANNEL_URL, HPC_CHANNELS_PER_NODE)
+    logger.info(f"🔗 Executing flow {flow_id} over HPC channel at: {hpc_channel_pool.url}")
     logger.info(f"📋 Flow definition being sent: {json.dumps(flow_definition, indent=2)}")
     logger.info(f"📥 Initial inputs: {json.dumps(initial_inputs, indent=2)}")
     
+    events = None
     try:
-        async with websockets.connect(hpc_url) as hpc_websocket:
-            manager.hpc_connections[flow_id] = hpc_websocket
-            
-            # HPC WebSocket handshake
-            ready_msg = await hpc_websocket.recv()
-            logger.info(f"✅ HPC ready: {ready_msg}")
-            
-            # Send flow definition
-            logger.info("📤 Sending flow definition to HPC...")
-            await hpc_websocket.send(json.dumps(flow_definition))
-            ack1 = await hpc_websocket.recv()
-            logger.info(f"📨 HPC flow definition ack: {ack1}")
-            
-            # Send initial inputs
-            logger.info("📤 Sending initial inputs to HPC...")
-            await hpc_websocket.send(json.dumps(initial_inputs))
-            ack2 = await hpc_websocket.recv()
-            logger.info(f"📨 HPC initial inputs ack: {ack2}")
-            
-            # Send config (null for now)
-            logger.info("📤 Sending config to HPC...")
-            await hpc_websocket.send("null")
-            ack3 = await hpc_websocket.recv()
-            logger.info(f"📨 HPC config ack: {ack3}")
-            
-            logger.info("🚀 Starting to stream events from HPC...")
-            
-            # Stream events from HPC to frontend
-            async for message in hpc_websocket:
-                try:
-                    event = json.loads(message)
-                    logger.info(f"📨 HPC event: {event.get('type', 'unknown')} - {event}")
-                    
-                    # Forward the event to frontend
-                    await manager.send_to_frontend(flow_id, event)
-                    
-                    # Check if flow is complete
-                    if event.get('type') in ['flow_completed', 'flow_error']:
-                        logger.info(f"🏁 Flow {flow_id} finished with type: {event.get('type')}")
-                        if event.get('type') == 'flow_error':
-                            logger.error(f"❌ HPC Flow Error: {event.get('data', {}).get('error', 'Unknown error')}")
-                        break
-                        
-                except json.JSONDecodeError as e:
-                    logger.error(f"❌ Error parsing HPC message: {e} - Raw message: {message}")
-                except Exception as e:
-                    logger.error(f"❌ Error forwarding message: {e}")
+        channel = await hpc_channel_pool.acquire()
+        manager.hpc_connections[flow_id] = channel
+        
+        # The whole request goes in one frame; execution starts on receipt
+        logger.info("🚀 Starting to stream events from HPC...")
+        events = channel.execute(flow_id, flow_definition, initial_inputs, config=config, flow_hash=flow_hash)
+        async for event in events:
+            try:
+                logger.info(f"📨 HPC event: {event.get('type', 'unknown')} - {event}")
+                
+                # Forward the event to frontend
+                await manager.send_to_frontend(flow_id, event)
+                
+                # Check if flow is complete
+                if event.get('type') in ['flow_completed', 'flow_error']:
+                    logger.info(f"🏁 Flow {flow_id} finished with type: {event.get('type')}")
+                    if event.get('type') == 'flow_error':
+                        logger.error(f"❌ HPC Flow Error: {event.get('data', {}).get('error', 'Unknown error')}")
+                    break
+                
+                # Stop the flow on the node once nobody is listening
+                if flow_id not in manager.active_connections:
+                    logger.info(f"🔌 Frontend for flow {flow_id} is gone, cancelling execution")
+                    break
                     
-    except websockets.exceptions.ConnectionClosed as e:
-        logger.error(f"🔌 HPC connection closed for flow {flow_id}: {e}")
+            except Exception as e:
+                logger.error(f"❌ Error forwarding message: {e}")
+                
+    except HPCChannelError as e:
+        logger.error(f"🔌 HPC channel error for flow {flow_id}: {e}")
         await manager.send_to_frontend(flow_id, {
             'type': 'flow_error',
             'data': {'error': 'Connection to execution engine lost'}
@@ -356,6 +365,8 @@ async def connect_to_hpc_engine(flow_id: str, flow_definition: Dict[str, Any], i
             'data': {'error': f'Execution engine error: {str(e)}'}
         })
     finally:
+        if events is not None:
+            await events.aclose()
         manager.disconnect(flow_id)
 
 def cors_wrapped_payment_middleware(
@@ -472,7 +483,7 @@ async def initiate_chat(
             "payment_headers": payment_headers,
             "created_at": datetime.utcnow()
         }
-        payment_storage.store_payment_session(session_id, payment_data)
+        await payment_storage.store_payment_session(session_id, payment_data)
         
         # Store payment transaction in database
         if transaction_hash:
@@ -528,7 +539,7 @@ async def websocket_execute_flow(websocket: WebSocket, agent_id: str, token: Opt
     5. Connect to HPC execution engine
     6. Stream results back to frontend
     """
-    flow_id = f"flow_{agent_id}_{int(asyncio.get_event_loop().time() * 1000)}"
+    flow_id = f"flow_{agent_id}_{uuid.uuid4().hex}"
     
     logger.info(f"🌐 NEW WEBSOCKET CONNECTION: agent_id={agent_id}, flow_id={flow_id}")
     logger.info(f"🔑 Authentication token present: {bool(token)}")
@@ -538,12 +549,15 @@ async def websocket_execute_flow(websocket: WebSocket, agent_id: str, token: Opt
     try:
         # Verify authentication (extract from query param or wait for message)
         user_id = None
+        # Only a JWT or a payment session proves who the user is; a user_id in the message does not
+        user_verified = False
         if token:
             try:
                 jwt_handler = JWTHandler()
                 payload = jwt_handler.verify_token(token)
                 if payload:
                     user_id = payload.get('user_id')
+                    user_verified = bool(user_id)
                 else:
                     await websocket.send_text(json.dumps({
                         'type': 'error',
@@ -572,7 +586,7 @@ async def websocket_execute_flow(websocket: WebSocket, agent_id: str, token: Opt
             
             if session_id:
                 # Validate session
-                session_info = payment_storage.get_payment_session(session_id)
+                session_info = await payment_storage.get_payment_session(session_id)
                 if not session_info:
                     logger.error("❌ Invalid payment session")
                     await websocket.send_text(json.dumps({
@@ -583,6 +597,7 @@ async def websocket_execute_flow(websocket: WebSocket, agent_id: str, token: Opt
                 
                 # Use user_id from session
                 user_id = session_info['user_id']
+                user_verified = True
                 transaction_hash = session_info.get('transaction_hash')
                 logger.info(f"✅ Valid payment session for user {user_id}, tx: {transaction_hash}")
                 
@@ -607,9 +622,14 @@ async def websocket_execute_flow(websocket: WebSocket, agent_id: str, token: Opt
                     }))
                     return
             
-            # Extract conversation history if provided
+            # Conversations saved on the server are referenced by ID; others may still send their history
+            conversation_id = initial_data.get('conversation_id')
             conversation_history = initial_data.get('conversation_history', [])
-            logger.info(f"💬 Received conversation history with {len(conversation_history)} messages")
+            if conversation_id and not user_verified and user_id != 'anonymous':
+                # Anyone can claim a wallet address, so an unauthenticated client only reaches anonymous conversations
+                logger.warning(f"Ignoring conversation {conversation_id} for unauthenticated user {user_id}")
+                conversation_id = None
+            logger.info(f"💬 Conversation: {conversation_id}, received history with {len(conversation_history)} messages")
             
             # Log the agent_id from the URL and message for debugging
             logger.info(f"🤖 Agent ID from URL: {agent_id}")
@@ -624,8 +644,12 @@ async def websocket_execute_flow(websocket: WebSocket, agent_id: str, token: Opt
                 'data': {'message': 'Retrieving workflow...'}
             }))
             
-            workflow_data = await get_workflow_from_db(agent_id)
-            if not workflow_data:
+            try:
+                cached_workflow = await workflow_cache.get(agent_id)
+            except Exception as e:
+                logger.error(f"Error retrieving workflow: {e}")
+                cached_workflow = None
+            if not cached_workflow:
                 await websocket.send_text(json.dumps({
                     'type': 'error',
                     'data': {'error': f'Workflow not found for agent {agent_id}'}
@@ -638,68 +662,16 @@ async def websocket_execute_flow(websocket: WebSocket, agent_id: str, token: Opt
                 'data': {'message': 'Preparing workflow for execution...'}
             }))
             
-            # Send the workflow data directly to HPC executor (it now handles frontend format)
-            if 'flow_definition' in workflow_data:
-                hpc_flow_definition = workflow_data['flow_definition']
-                logger.info("✅ Using flow_definition from workflow data")
-                
-                # Fix node types in flow_definition format
-                if 'nodes' in hpc_flow_definition:
-                    for node_id, node_data in hpc_flow_definition['nodes'].items():
-                        if 'type' in node_data:
-                            frontend_type = node_data['type']
-                            hpc_type = map_node_type_to_element_type(frontend_type)
-                            node_data['type'] = hpc_type
-                            logger.info(f"🔄 Converted node type: {frontend_type} -> {hpc_type}")
-            elif 'nodes' in workflow_data and 'edges' in workflow_data:
-                # Frontend format: convert to expected structure
-                nodes_dict = {}
-                start_element = None
-                
-                # Convert nodes list to dict and fix parameters format
-                for node in workflow_data.get('nodes', []):
-                    node_id = node.get('id', '')
-                    node_copy = node.copy()
-                    
-                    # Convert node type to HPC format (lowercase)
-                    frontend_type = node_copy.get('type', '')
-                    hpc_type = map_node_type_to_element_type(frontend_type)
-                    node_copy['type'] = hpc_type
-                    
-                    # Convert parameters from list to dict if needed
-                    if 'parametersObject' in node_copy and node_copy['parametersObject']:
-                        # Use parametersObject which is already in the correct format
-                        node_copy['parameters'] = node_copy['parametersObject']
-                    elif 'parameters' in node_copy and isinstance(node_copy['parameters'], list):
-                        # Convert parameters list to dict
-                        params_dict = {}
-                        for param in node_copy['parameters']:
-                            if param.get('name') and 'value' in param:
-                                params_dict[param['name']] = param['value']
-                        node_copy['parameters'] = params_dict
-                    elif not isinstance(node_copy.get('parameters'), dict):
-                        # Ensure parameters is always a dict
-                        node_copy['parameters'] = {}
-                    
-                    nodes_dict[node_id] = node_copy
-                    
-                    # Find start node
-                    if node.get('type', '').lower() in ['start'] and not start_element:
-                        start_element = node_id
-                
-                hpc_flow_definition = {
-                    'nodes': nodes_dict,
-                    'connections': workflow_data.get('edges', []),
-                    'start_element': start_element or (list(nodes_dict.keys())[0] if nodes_dict else '')
-                }
-                logger.info("✅ Converted frontend workflow format")
-            else:
+            # Conversion and hashing run once per workflow version; the results are shared, never modify them
+            hpc_flow_definition = cached_workflow.derive('hpc_flow_definition', build_hpc_flow_definition)
+            if hpc_flow_definition is None:
                 logger.error("❌ Unknown workflow format")
                 await websocket.send_text(json.dumps({
                     'type': 'error',
                     'data': {'error': 'Invalid workflow format'}
                 }))
                 return
+            flow_hash = cached_workflow.derive('flow_hash', lambda _: compute_flow_hash(hpc_flow_definition))
             
             # Extract initial inputs from message or use default for chat_input
             initial_inputs = initial_data.get('initial_inputs', {})
@@ -721,6 +693,23 @@ async def websocket_execute_flow(websocket: WebSocket, agent_id: str, token: Opt
                 for node_id, node in hpc_flow_definition.get('nodes', {}).items():
                     node_type = node.get('type', '').lower()
                     if node_type in ['context_history', 'contexthistory']:
+                        if conversation_id:
+                            # Load only what the node keeps, from the cached tail of the conversation
+                            parameters = node.get('parameters') or {}
+                            filter_by_role = parameters.get('filter_by_role', 'all')
+                            limit = int(parameters.get('max_messages', 10))
+                            if int(parameters.get('token_budget') or 0) > 0 and parameters.get('summarize_overflow', True):
+                                # Messages beyond max_messages are folded into the node's rolling summary
+                                limit = conversation_context_cache.window_size
+                            recent_messages = await conversation_context_cache.get_recent(
+                                conversation_id,
+                                user_id,
+                                limit=limit,
+                                before_message_id=initial_data.get('message_id'),
+                                role=None if filter_by_role == 'all' else filter_by_role
+                            )
+                            if recent_messages is not None:
+                                conversation_history = recent_messages
                         initial_inputs[node_id] = {'context_history': conversation_history}
                         logger.info(f"📚 Created initial input for context_history node {node_id}: {len(conversation_history)} messages")
                         break
@@ -747,7 +736,10 @@ async def websocket_execute_flow(websocket: WebSocket, agent_id: str, token: Opt
             }))
             
             # Run HPC connection in background task
-            await connect_to_hpc_engine(flow_id, hpc_flow_definition, initial_inputs)
+            # Vector indexes on the node are private to the agent and the authenticated user
+            index_owner = user_id if user_verified else 'anonymous'
+            hpc_config = {'index_namespace': f"agent_{agent_id}_user_{index_owner}"}
+            await connect_to_hpc_engine(flow_id, hpc_flow_definition, initial_inputs, flow_hash, hpc_config)
             
         except json.JSONDecodeError:
             await websocket.send_text(json.dumps({
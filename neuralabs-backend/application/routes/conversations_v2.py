@@ -1,7 +1,7 @@
 """
-Conversations API routes v2 - Using single JSON document for conversation content
+Conversations API routes v2 - One JSON document per message, stored as rows of conversation_messages
 """
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
@@ -51,6 +51,51 @@ class AddMessageRequest(BaseModel):
 class UpdateThinkingStateRequest(BaseModel):
     thinking_state: Dict[str, Any]
 
+def format_message(msg: Dict[str, Any], seq: int) -> Dict[str, Any]:
+    """
+    Transform a stored message document to match frontend format
+    """
+    message_data = {
+        "id": msg.get("id"),
+        "seq": seq,
+        "role": msg.get("role"),
+        "content": msg.get("content"),
+        "timestamp": msg.get("timestamp"),
+        "model": msg.get("model"),
+        "parentMessageId": msg.get("parentMessageId")
+    }
+    
+    # Add optional fields if they exist
+    if msg.get("metadata"):
+        message_data["metadata"] = msg["metadata"]
+    if msg.get("thinkingState"):
+        message_data["thinkingState"] = msg["thinkingState"]
+    if msg.get("transaction"):
+        message_data["transaction"] = msg["transaction"]
+    
+    return message_data
+
+def format_conversation_summary(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Transform a conversation list row to match frontend format
+    """
+    last_msg = None
+    if row["last_message"]:
+        last_msg = {
+            'content': row["last_message"].get('content'),
+            'role': row["last_message"].get('role'),
+            'timestamp': row["last_message"].get('timestamp')
+        }
+    
+    return {
+        "id": row["conversation_id"],
+        "title": row["title"],
+        "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+        "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None,
+        "agent_id": row["agent_id"],
+        "last_message": last_msg
+    }
+
 @router.get("/conversations")
 async def get_conversations(
     user_id: Optional[str] = Depends(get_optional_current_user),
@@ -75,15 +120,10 @@ async def get_conversations(
                     c.created_at,
                     c.updated_at,
                     c.agent_id,
-                    c.conversation_content,
-                    CASE 
-                        WHEN jsonb_array_length(c.conversation_content->'messages') > 0 
-                        THEN c.conversation_content->'messages'->-1
-                        ELSE NULL
-                    END as last_message
+                    c.last_message
                 FROM conversations c
                 WHERE c.user_id = %s AND c.agent_id = %s
-                ORDER BY c.updated_at DESC
+                ORDER BY c.updated_at DESC, c.conversation_id DESC
             """
             result = await pg_conn.execute_query(query, (user_id, agent_id))
         else:
@@ -94,43 +134,87 @@ async def get_conversations(
                     c.created_at,
                     c.updated_at,
                     c.agent_id,
-                    c.conversation_content,
-                    CASE 
-                        WHEN jsonb_array_length(c.conversation_content->'messages') > 0 
-                        THEN c.conversation_content->'messages'->-1
-                        ELSE NULL
-                    END as last_message
+                    c.last_message
                 FROM conversations c
                 WHERE c.user_id = %s
-                ORDER BY c.updated_at DESC
+                ORDER BY c.updated_at DESC, c.conversation_id DESC
             """
             result = await pg_conn.execute_query(query, (user_id,))
         
-        conversations = []
-        for row in result:
-            last_msg = None
-            if row["last_message"]:
-                last_msg = {
-                    'content': row["last_message"].get('content'),
-                    'role': row["last_message"].get('role'),
-                    'timestamp': row["last_message"].get('timestamp')
-                }
-            
-            conversations.append({
-                "id": row["conversation_id"],
-                "title": row["title"],
-                "created_at": row["created_at"].isoformat() if row["created_at"] else None,
-                "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None,
-                "agent_id": row["agent_id"],
-                "last_message": last_msg
-            })
-        
-        return conversations
+        return [format_conversation_summary(row) for row in result]
         
     except Exception as e:
         logger.error(f"Error fetching conversations: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch conversations")
 
+@router.get("/conversations/list")
+async def list_conversations(
+    user_id: Optional[str] = Depends(get_optional_current_user),
+    agent_id: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(50, description="Number of conversations to return", ge=1, le=200)
+) -> Dict[str, Any]:
+    """
+    Get a page of a user's conversations, most recently updated first, optionally filtered by agent
+    
+    Pages are keyed on (updated_at, conversation_id), so they stay consistent while
+    conversations are created or updated.
+    """
+    if not user_id:
+        # Return empty page for anonymous users
+        return {"conversations": [], "next_cursor": None}
+    
+    conditions = ["c.user_id = %s"]
+    params = [user_id]
+    
+    if agent_id:
+        conditions.append("c.agent_id = %s")
+        params.append(agent_id)
+    
+    if cursor:
+        try:
+            updated_at, conversation_id = cursor.split("|", 1)
+            params.extend([datetime.fromisoformat(updated_at), str(uuid.UUID(conversation_id))])
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        conditions.append("(c.updated_at, c.conversation_id) < (%s, %s::uuid)")
+    
+    # Fetch one extra row to know whether another page exists
+    params.append(limit + 1)
+    
+    try:
+        pg_conn = PostgresConnection()
+        
+        query = f"""
+            SELECT 
+                c.conversation_id,
+                c.title,
+                c.created_at,
+                c.updated_at,
+                c.agent_id,
+                c.last_message
+            FROM conversations c
+            WHERE {' AND '.join(conditions)}
+            ORDER BY c.updated_at DESC, c.conversation_id DESC
+            LIMIT %s
+        """
+        result = await pg_conn.execute_query(query, tuple(params))
+        
+        rows = result[:limit]
+        next_cursor = None
+        if len(result) > limit:
+            last = rows[-1]
+            next_cursor = f"{last['updated_at'].isoformat()}|{last['conversation_id']}"
+        
+        return {
+            "conversations": [format_conversation_summary(row) for row in rows],
+            "next_cursor": next_cursor
+        }
+        
+    except Exception as e:
+        logger.error(f"Error listing conversations: {e}")
+        raise HTTPException(status_code=500, detail="Failed to list conversations")
+
 @router.post("/conversations")
 async def create_conversation(
     request: CreateConversationRequest,
@@ -190,7 +274,7 @@ async def get_conversation(
     user_id: Optional[str] = Depends(get_optional_current_user)
 ) -> Dict[str, Any]:
     """
-    Get a specific conversation with all messages from JSON content
+    Get a specific conversation with all of its messages
     """
     try:
         pg_conn = PostgresConnection()
@@ -198,8 +282,7 @@ async def get_conversation(
         # First verify the conversation belongs to the user
         if user_id:
             conv_query = """
-                SELECT conversation_id, title, created_at, updated_at, 
-                       agent_id, conversation_content
+                SELECT conversation_id, title, created_at, updated_at, agent_id
                 FROM conversations
                 WHERE conversation_id = %s AND user_id = %s
             """
@@ -207,8 +290,7 @@ async def get_conversation(
         else:
             # For anonymous users, only allow access to anonymous conversations
             conv_query = """
-                SELECT conversation_id, title, created_at, updated_at, 
-                       agent_id, conversation_content
+                SELECT conversation_id, title, created_at, updated_at, agent_id
                 FROM conversations
                 WHERE conversation_id = %s AND user_id = 'anonymous'
             """
@@ -219,31 +301,14 @@ async def get_conversation(
         
         conversation = conv_result[0]
         
-        # Extract messages from the JSON content
-        content = conversation["conversation_content"] or {"messages": []}
-        messages = content.get("messages", [])
-        
-        # Transform messages to match frontend format
-        formatted_messages = []
-        for msg in messages:
-            message_data = {
-                "id": msg.get("id"),
-                "role": msg.get("role"),
-                "content": msg.get("content"),
-                "timestamp": msg.get("timestamp"),
-                "model": msg.get("model"),
-                "parentMessageId": msg.get("parentMessageId")
-            }
-            
-            # Add optional fields if they exist
-            if msg.get("metadata"):
-                message_data["metadata"] = msg["metadata"]
-            if msg.get("thinkingState"):
-                message_data["thinkingState"] = msg["thinkingState"]
-            if msg.get("transaction"):
-                message_data["transaction"] = msg["transaction"]
-                
-            formatted_messages.append(message_data)
+        messages_query = """
+            SELECT seq, message
+            FROM conversation_messages
+            WHERE conversation_id = %s
+            ORDER BY seq
+        """
+        messages = await pg_conn.execute_query(messages_query, (conversation_id,))
+        formatted_messages = [format_message(row["message"], row["seq"]) for row in messages]
         
         return {
             "id": conversation["conversation_id"],
@@ -260,6 +325,60 @@ async def get_conversation(
         logger.error(f"Error fetching conversation: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch conversation")
 
+@router.get("/conversations/{conversation_id}/messages")
+async def get_messages(
+    conversation_id: str,
+    before: Optional[int] = Query(None, description="Only return messages with a seq lower than this", ge=1),
+    limit: int = Query(50, description="Number of messages to return", ge=1, le=200),
+    user_id: Optional[str] = Depends(get_optional_current_user)
+) -> Dict[str, Any]:
+    """
+    Get a page of messages, newest first across pages and in chronological order within one
+    
+    Pass the returned next_before as before to get the previous page; it is None on the first message.
+    """
+    try:
+        pg_conn = PostgresConnection()
+        
+        # One row per message, or a single row with a NULL seq if the page is empty
+        query = """
+            SELECT cm.seq, cm.message
+            FROM conversations c
+            LEFT JOIN LATERAL (
+                SELECT seq, message
+                FROM conversation_messages
+                WHERE conversation_id = c.conversation_id
+                AND seq < COALESCE(%s, c.message_count + 1)
+                ORDER BY seq DESC
+                LIMIT %s
+            ) cm ON TRUE
+            WHERE c.conversation_id = %s AND c.user_id = %s
+        """
+        result = await pg_conn.execute_query(
+            query,
+            (before, limit, conversation_id, user_id or 'anonymous')
+        )
+        
+        if not result or len(result) == 0:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        
+        rows = sorted((row for row in result if row["seq"] is not None), key=lambda row: row["seq"])
+        messages = [format_message(row["message"], row["seq"]) for row in rows]
+        
+        # Sequence numbers have no gaps, so older messages exist unless seq 1 was reached
+        next_before = rows[0]["seq"] if rows and rows[0]["seq"] > 1 else None
+        
+        return {
+            "messages": messages,
+            "next_before": next_before
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching messages: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch messages")
+
 @router.post("/conversations/{conversation_id}/messages")
 async def add_message(
     conversation_id: str,
@@ -267,7 +386,7 @@ async def add_message(
     user_id: Optional[str] = Depends(get_optional_current_user)
 ) -> Dict[str, Any]:
     """
-    Add a message to the conversation's JSON content
+    Append a message to the conversation
     """
     try:
         pg_conn = PostgresConnection()
@@ -296,40 +415,31 @@ async def add_message(
         if request.transaction_data:
             new_message["transaction"] = request.transaction_data
         
-        # Update the conversation content by appending the message
-        if user_id:
-            update_query = """
+        # Only the new row is written; the conversation row keeps the count and last message summary
+        last_message = {
+            "content": request.content,
+            "role": request.role,
+            "timestamp": timestamp
+        }
+        insert_query = """
+            WITH conversation AS (
                 UPDATE conversations
-                SET conversation_content = jsonb_set(
-                    COALESCE(conversation_content, '{"messages": []}'::jsonb),
-                    '{messages}',
-                    COALESCE(conversation_content->'messages', '[]'::jsonb) || %s::jsonb
-                ),
-                updated_at = %s
+                SET message_count = message_count + 1,
+                    last_message = %s::jsonb,
+                    updated_at = %s
                 WHERE conversation_id = %s AND user_id = %s
-                RETURNING conversation_id
-            """
-            result = await pg_conn.execute_query(
-                update_query,
-                (json.dumps(new_message), datetime.now(timezone.utc), conversation_id, user_id)
-            )
-        else:
-            # For anonymous users
-            update_query = """
-                UPDATE conversations
-                SET conversation_content = jsonb_set(
-                    COALESCE(conversation_content, '{"messages": []}'::jsonb),
-                    '{messages}',
-                    COALESCE(conversation_content->'messages', '[]'::jsonb) || %s::jsonb
-                ),
-                updated_at = %s
-                WHERE conversation_id = %s AND user_id = 'anonymous'
-                RETURNING conversation_id
-            """
-            result = await pg_conn.execute_query(
-                update_query,
-                (json.dumps(new_message), datetime.now(timezone.utc), conversation_id)
+                RETURNING conversation_id, message_count
             )
+            INSERT INTO conversation_messages (conversation_id, seq, message_id, message)
+            SELECT conversation_id, message_count, %s, %s::jsonb
+            FROM conversation
+            RETURNING seq
+        """
+        result = await pg_conn.execute_query(
+            insert_query,
+            (json.dumps(last_message), datetime.now(timezone.utc), conversation_id, user_id or 'anonymous',
+             message_id, json.dumps(new_message))
+        )
         
         if not result or len(result) == 0:
             raise HTTPException(status_code=404, detail="Conversation not found")
@@ -337,6 +447,7 @@ async def add_message(
         # Return the created message
         response = {
             "id": message_id,
+            "seq": result[0]["seq"],
             "role": request.role,
             "content": request.content,
             "timestamp": timestamp,
@@ -468,63 +579,28 @@ async def update_message_thinking_state(
     try:
         pg_conn = PostgresConnection()
         
-        # Build the JSONB path to update the specific message
-        # We need to find the index of the message in the array and update it
-        if user_id:
-            query = """
-                WITH message_index AS (
-                    SELECT ordinality - 1 as idx
-                    FROM conversations,
-                    jsonb_array_elements(conversation_content->'messages') WITH ORDINALITY
-                    WHERE conversation_id = %s 
-                    AND user_id = %s
-                    AND value->>'id' = %s
-                )
-                UPDATE conversations
-                SET conversation_content = jsonb_set(
-                    conversation_content,
-                    array['messages', message_index.idx::text, 'thinkingState']::text[],
-                    %s::jsonb
-                ),
-                updated_at = %s
-                FROM message_index
-                WHERE conversations.conversation_id = %s 
-                AND conversations.user_id = %s
-                RETURNING conversation_id
-            """
-            result = await pg_conn.execute_query(
-                query,
-                (conversation_id, user_id, message_id, json.dumps(request.thinking_state), 
-                 datetime.now(timezone.utc), conversation_id, user_id)
-            )
-        else:
-            # For anonymous users
-            query = """
-                WITH message_index AS (
-                    SELECT ordinality - 1 as idx
-                    FROM conversations,
-                    jsonb_array_elements(conversation_content->'messages') WITH ORDINALITY
-                    WHERE conversation_id = %s 
-                    AND user_id = 'anonymous'
-                    AND value->>'id' = %s
-                )
-                UPDATE conversations
-                SET conversation_content = jsonb_set(
-                    conversation_content,
-                    array['messages', message_index.idx::text, 'thinkingState']::text[],
-                    %s::jsonb
-                ),
-                updated_at = %s
-                FROM message_index
-                WHERE conversations.conversation_id = %s 
-                AND conversations.user_id = 'anonymous'
-                RETURNING conversation_id
-            """
-            result = await pg_conn.execute_query(
-                query,
-                (conversation_id, message_id, json.dumps(request.thinking_state), 
-                 datetime.now(timezone.utc), conversation_id)
+        # Only the row of the message is rewritten
+        query = """
+            WITH message AS (
+                UPDATE conversation_messages cm
+                SET message = jsonb_set(cm.message, '{thinkingState}', %s::jsonb)
+                FROM conversations c
+                WHERE cm.conversation_id = c.conversation_id
+                AND c.conversation_id = %s
+                AND c.user_id = %s
+                AND cm.message_id = %s
+                RETURNING cm.conversation_id
             )
+            UPDATE conversations
+            SET updated_at = %s
+            WHERE conversation_id IN (SELECT conversation_id FROM message)
+            RETURNING conversation_id
+        """
+        result = await pg_conn.execute_query(
+            query,
+            (json.dumps(request.thinking_state), conversation_id, user_id or 'anonymous', message_id,
+             datetime.now(timezone.utc))
+        )
         
         if not result or len(result) == 0:
             raise HTTPException(status_code=404, detail="Message not found in conversation")
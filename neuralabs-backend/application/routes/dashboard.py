@@ -14,8 +14,10 @@ from ..modules.get_data.dashboard import (
     get_published_flows,
     get_shared_flows,
     get_flow_details,
-    get_nft_access_list
+    get_nft_access_list,
+    get_dashboard_sections
 )
+from ..modules.get_data.dashboard_cache import dashboard_cache
 from ..modules.authentication import get_current_user, verify_access_permission
 from ..modules.database.postgresconn import PostgresConnection
 
@@ -90,6 +92,18 @@ def sanitize_data(flow_data):
     return result
 
 
+async def load_dashboard_sections(user_pub_key: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Get the sanitized dashboard sections of a user, from the cache when possible"""
+    sections = dashboard_cache.get(user_pub_key)
+    if sections is None:
+        invalidations = dashboard_cache.invalidations
+        sections = sanitize_data(await get_dashboard_sections(user_pub_key))
+        # A failed query also comes back empty, so empty dashboards are not cached
+        if any(sections.values()):
+            dashboard_cache.put(user_pub_key, sections, invalidations)
+    return sections
+
+
 # Define response models
 class FlowBase(BaseModel):
     agent_id: str
@@ -144,18 +158,15 @@ async def get_dashboard_data(request: Request, current_user: str = Depends(get_c
     """
     Get all dashboard data, including My Flows and Other Flows categorized by access level
     """
-    my_flows = await get_user_created_flows(current_user)
-    other_flows_by_level = await get_user_accessed_flows(current_user)
-    
-    # Sanitize data to ensure correct types
-    my_flows = sanitize_data(my_flows)
-    other_flows_by_level = sanitize_data(other_flows_by_level)
+    sections = await load_dashboard_sections(current_user)
     
-    # Convert numeric keys to strings for the response
-    other_flows = {f"Access Level {k}": v for k, v in other_flows_by_level.items()}
+    # Group flows by access level, with string keys for the response
+    other_flows = {}
+    for flow in sections["other_flows"]:
+        other_flows.setdefault(f"Access Level {flow['access_level']}", []).append(flow)
     
     return {
-        "my_flows": my_flows,
+        "my_flows": sections["my_flows"],
         "other_flows": other_flows
     }
 
@@ -169,10 +180,8 @@ async def get_recent_flows(
     """
     Get recently opened flows for the dashboard's "Recently opened" section
     """
-    flows = await get_recently_opened_flows(current_user, limit)
-    # Sanitize data to ensure correct types
-    flows = sanitize_data(flows)
-    return flows
+    sections = await load_dashboard_sections(current_user)
+    return sections["recent"][:limit]
 
 
 @router.get("/flows/underdevelopment", response_model=List[FlowBase])
@@ -180,10 +189,8 @@ async def get_underdevelopment_flows(request: Request, current_user: str = Depen
     """
     Get flows under development (from UNPUBLISHED_AGENT table)
     """
-    flows = await get_under_development_flows(current_user)
-    # Sanitize data to ensure correct types
-    flows = sanitize_data(flows)
-    return flows
+    sections = await load_dashboard_sections(current_user)
+    return sections["under_development"]
 
 
 @router.get("/flows/published", response_model=List[FlowBase])
@@ -191,10 +198,8 @@ async def get_active_flows(request: Request, current_user: str = Depends(get_cur
     """
     Get published flows (from PUBLISHED_AGENT table)
     """
-    flows = await get_published_flows(current_user)
-    # Sanitize data to ensure correct types
-    flows = sanitize_data(flows)
-    return flows
+    sections = await load_dashboard_sections(current_user)
+    return sections["published"]
 
 
 @router.get("/flows/shared", response_model=List[FlowBase])
@@ -202,10 +207,8 @@ async def get_user_shared_flows(request: Request, current_user: str = Depends(ge
     """
     Get shared flows (flows that have more than one user with access)
     """
-    flows = await get_shared_flows(current_user)
-    # Sanitize data to ensure correct types
-    flows = sanitize_data(flows)
-    return flows
+    sections = await load_dashboard_sections(current_user)
+    return sections["shared"]
 
 
 @router.get("/flows/{agent_id}", response_model=FlowDetailResponse)
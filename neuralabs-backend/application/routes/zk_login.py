@@ -167,7 +167,7 @@ async def verify_zklogin_signature_and_authenticate(
         session_id = payload.get("session_id", "")
         
         # Store token in Redis for session management
-        success = redis_jwt_storage.store_token(access_token, user_data["user_pub_key"], session_id)
+        success = await redis_jwt_storage.store_token(access_token, user_data["user_pub_key"], session_id)
         
         if not success:
             raise HTTPException(
@@ -307,7 +307,7 @@ async def zklogin_logout(
     """
     try:
         # Invalidate all tokens for the user in Redis
-        success = redis_jwt_storage.invalidate_all_user_tokens(current_user)
+        success = await redis_jwt_storage.invalidate_all_user_tokens(current_user)
         
         if not success:
             raise HTTPException(
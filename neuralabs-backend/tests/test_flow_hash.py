@@ -0,0 +1,24 @@
+"""The flow hash must match the reference in hpc-execution-node-backend/Doc/code_executor.md ("Flow Hash")."""
+from application.modules.chat.hpc_channel import compute_flow_hash
+
+REFERENCE_FLOW = {
+    "nodes": {
+        "start": {
+            "type": "start",
+            "parameters": {"greeting": "héllo", "limit": 3, "ratio": 0.5, "enabled": True, "model": None}
+        },
+        "end": {"type": "end"}
+    },
+    "connections": [{"from_id": "start", "to_id": "end"}],
+    "start_element_id": "start"
+}
+REFERENCE_HASH = "f85307b1c4291da66d2a948f7e535954"
+
+
+def test_reference_flow_hash():
+    assert compute_flow_hash(REFERENCE_FLOW) == REFERENCE_HASH
+
+
+def test_flow_hash_ignores_key_order():
+    reordered = dict(reversed(list(REFERENCE_FLOW.items())))
+    assert compute_flow_hash(reordered) == REFERENCE_HASH